@@ -8,6 +8,9 @@ DELETE_USER_SUCCESS = "User deleted successfully."
 GET_USER_SUCCESS = "User retrieved successfully."
 USER_DOES_NOT_EXIST = "User does not exist."
 CHANGE_PASSWORD_SUCCESS = "Change password successfully."
+REVOKE_TOKEN_SUCCESS = "Token revoked successfully."
+TOKEN_REVOKED = "Token is revoked."
+INVALID_REFRESH_TOKEN = "Invalid refresh token."
 
 # Wall
 CREATE_WALL_SUCCESS = "Wall created successfully."
@@ -16,6 +19,17 @@ UPDATE_WALL_SUCCESS = "Wall updated successfully."
 DELETE_WALL_SUCCESS = "Wall deleted successfully."
 GET_WALL_SUCCESS = "Wall retrieved successfully."
 WALL_DOES_NOT_EXIST = "Wall does not exist."
+INVALID_CURSOR = "Invalid cursor."
+INVALID_SORT_FIELD = "Invalid sort field."
+
+# Batch
+BATCH_SUCCESS = "Batch applied successfully."
+BATCH_FAILED = "Batch was not applied, see the result of every item."
+INVALID_BATCH = "Batch must contain create, update or delete lists."
+BATCH_TOO_LARGE = "Batch can not contain more than %s items."
+BATCH_CONFLICT = "Batch conflicts with existing data."
+ID_REQUIRED = "Id is required."
+DUPLICATE_BATCH_ITEM = "Item appears more than once in the batch."
 
 # Comments
 CREATE_COMMENT_SUCCESS = "Comment created successfully."
@@ -29,4 +43,8 @@ COMMENT_DOES_NOT_EXIST = "Comment does not exist."
 GET_LIKE_SUCCESS = "Like updated successfully."
 GET_DISLIKE_SUCCESS = "Dislike updated successfully."
 
+# Database
+POOL_STATS_SUCCESS = "Database pool statistics retrieved successfully."
 
+# Fieldsets
+INVALID_FIELDSET = "Invalid fields."
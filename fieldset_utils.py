@@ -0,0 +1,114 @@
+import hashlib
+
+"""
+    This module contains helpers for the ?fields= and ?expand= query parameters, which let a client ask for
+    part of a payload and make the query load only what that part needs.
+"""
+
+
+class InvalidFieldset(ValueError):
+    """
+    Raised when a client asks for a field the serializer does not have.
+    """
+
+
+def parse_names(value):
+    """
+    Function is used to split a comma separated query parameter into field names.
+    :param value: value of the query parameter.
+    :return: list of field names, empty if the parameter is missing.
+    """
+    return [name.strip() for name in (value or '').split(',') if name.strip()]
+
+
+class SparseFieldsetMixin:
+    """
+    Mixin for a ModelSerializer which accepts a `fields` argument and drops every other field.
+
+    Serializers using it describe what each field reads, so Fieldset can shape the queryset:
+    expandable_fields are the heavy fields a view may leave out unless they are asked for with ?expand=,
+    and field_sources maps a field to the lookups passed to only(). A field missing from field_sources
+    reads the model column with the same name, and a field mapped to () reads nothing from the row,
+    like a prefetched relation.
+    """
+    expandable_fields = ()
+    field_sources = {}
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class Fieldset:
+    """
+    Fields of a serializer picked by a client with the ?fields= and ?expand= query parameters.
+    """
+
+    def __init__(self, serializer_class, fields=None, expand=None, expand_by_default=True):
+        """
+        :param serializer_class: serializer class using SparseFieldsetMixin.
+        :param fields: names of the fields asked for, empty for the default fields.
+        :param expand: names of the expandable fields asked for.
+        :param expand_by_default: False to leave the expandable fields out of the default fields.
+        """
+        fields = fields or []
+        expand = expand or []
+        readable = [name for name, field in serializer_class().fields.items() if not field.write_only]
+        expandable = serializer_class.expandable_fields
+        unknown = [name for name in fields if name not in readable]
+        unknown += [name for name in expand if name not in expandable]
+        if unknown:
+            raise InvalidFieldset(', '.join(unknown))
+
+        if fields:
+            self.names = tuple(name for name in readable if name in fields or name in expand)
+        else:
+            self.names = tuple(name for name in readable
+                               if expand_by_default or name not in expandable or name in expand)
+        self.serializer_class = serializer_class
+
+    @classmethod
+    def from_query(cls, serializer_class, query_params, expand_by_default=True):
+        """
+        Function is used to read the fieldset of a request.
+        :param serializer_class: serializer class using SparseFieldsetMixin.
+        :param query_params: query parameters of the request.
+        :param expand_by_default: False to leave the expandable fields out of the default fields.
+        :return: Fieldset object.
+        """
+        return cls(serializer_class, parse_names(query_params.get('fields')),
+                   parse_names(query_params.get('expand')), expand_by_default=expand_by_default)
+
+    def __contains__(self, name):
+        return name in self.names
+
+    @property
+    def digest(self):
+        """
+        Short stable name of the fieldset, used in cache keys.
+        """
+        return hashlib.sha1(','.join(self.names).encode()).hexdigest()[:16]
+
+    def serializer(self, *args, **kwargs):
+        """
+        Function is used to build a serializer which outputs only the fields of the fieldset.
+        :return: serializer object.
+        """
+        return self.serializer_class(*args, fields=self.names, **kwargs)
+
+    def shape(self, queryset, always=()):
+        """
+        Function is used to limit a queryset to the columns and joins the fieldset reads.
+        :param queryset: queryset to shape.
+        :param always: columns loaded whatever the fieldset, like the ones used for sorting or ETags.
+        :return: queryset using only() and select_related().
+        """
+        lookups = list(always)
+        for name in self.names:
+            lookups.extend(self.serializer_class.field_sources.get(name, (name,)))
+        related = sorted({lookup.split('__')[0] for lookup in lookups if '__' in lookup})
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*dict.fromkeys(lookups))
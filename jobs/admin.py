@@ -0,0 +1,15 @@
+from django.contrib import admin
+
+from jobs.models import Job
+from jobs.queue import requeue
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'run_at', 'modified_on')
+    list_filter = ('status', 'name')
+    actions = ['requeue_jobs']
+
+    def requeue_jobs(self, request, queryset):
+        requeue(queryset)
+    requeue_jobs.short_description = "Requeue selected jobs"
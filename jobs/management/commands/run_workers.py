@@ -0,0 +1,58 @@
+import multiprocessing
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs.queue import Worker
+
+
+def run_worker(stop, poll_interval, batch_size, drain):
+    Worker(poll_interval=poll_interval, batch_size=batch_size).run(stop, drain=drain)
+
+
+class Command(BaseCommand):
+    """
+    Command is used to run the workers of the job queue until it is stopped with SIGINT or SIGTERM.
+    """
+    help = "Run job queue workers in threads or processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help="Number of workers.")
+        parser.add_argument('--mode', choices=('thread', 'process'), default='thread',
+                            help="Run the workers in threads of this process or in child processes.")
+        parser.add_argument('--poll-interval', type=float, default=None,
+                            help="Seconds a worker waits when no job is due, JOB_POLL_INTERVAL by default.")
+        parser.add_argument('--batch-size', type=int, default=1, help="Number of jobs claimed at once.")
+        parser.add_argument('--drain', action='store_true',
+                            help="Stop every worker as soon as no job is due, instead of polling forever.")
+
+    def handle(self, *args, **options):
+        if options['mode'] == 'process':
+            stop = multiprocessing.Event()
+            # Children must open their own database connections.
+            connections.close_all()
+            workers = [multiprocessing.Process(target=run_worker, name='job-worker-%s' % index, args=(
+                stop, options['poll_interval'], options['batch_size'], options['drain']))
+                for index in range(options['workers'])]
+        else:
+            stop = threading.Event()
+            workers = [threading.Thread(target=run_worker, name='job-worker-%s' % index, args=(
+                stop, options['poll_interval'], options['batch_size'], options['drain']))
+                for index in range(options['workers'])]
+
+        handlers = {}
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                handlers[signum] = signal.signal(signum, lambda *args: stop.set())
+        try:
+            for worker in workers:
+                worker.start()
+            self.stdout.write("Started %s %s workers." % (len(workers), options['mode']))
+            for worker in workers:
+                worker.join()
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+        self.stdout.write(self.style.SUCCESS("Workers stopped."))
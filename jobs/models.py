@@ -0,0 +1,41 @@
+import jsonfield
+from django.db import models
+from django.utils import timezone
+
+from users.models import BaseModel
+
+
+class Job(BaseModel):
+    """
+    Job class is define for the keep a unit of background work, run by the run_workers command.
+    :param BaseModel: Base class which has common attribute for the
+    application.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    DEAD = 'dead'
+    STATUS_CHOICES = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (DEAD, 'Dead'),
+    )
+
+    name = models.CharField(max_length=100)
+    payload = jsonfield.JSONField(default=dict)
+    status = models.CharField(max_length=7, choices=STATUS_CHOICES, default=QUEUED)
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField()
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self):
+        return "%s %s" % (self.name, self.status)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at'),
+        ]
@@ -0,0 +1,177 @@
+import datetime
+import logging
+import os
+import random
+import socket
+import threading
+import traceback
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from jobs.models import Job
+
+logger = logging.getLogger('django')
+
+"""
+    This module contains the database backed job queue.
+
+    Functions decorated with @job are registered by name and enqueue() stores a call to one of them as a Job row.
+    Workers claim due jobs with a conditional UPDATE, so a job is run by one worker even when many poll the
+    table. A failed job is retried with exponential backoff until it has used its attempts, then it is kept
+    as a dead job for inspection and requeue().
+"""
+
+# Job name -> registered function
+registry = {}
+
+
+class UnknownJob(LookupError):
+    """
+    Raised when a job names a function which is not registered.
+    """
+
+
+def job(name=None, max_attempts=None):
+    """
+    Decorator registering a function as a job. Its arguments must be JSON serializable.
+    :param name: name of the job, the dotted path of the function by default.
+    :param max_attempts: number of runs before the job is dead, JOB_MAX_ATTEMPTS by default.
+    :return: decorator.
+    """
+    def register(func):
+        func.job_name = name or '%s.%s' % (func.__module__, func.__name__)
+        func.max_attempts = max_attempts
+        registry[func.job_name] = func
+        return func
+    return register
+
+
+def enqueue(func, delay=0, **kwargs):
+    """
+    Function is used to queue a call of a job function.
+    :param func: function registered with @job, or its name.
+    :param delay: seconds to wait before the job can run.
+    :param kwargs: arguments of the call.
+    :return: Job object.
+    """
+    name = getattr(func, 'job_name', func)
+    if name not in registry:
+        raise UnknownJob(name)
+    max_attempts = registry[name].max_attempts or settings.JOB_MAX_ATTEMPTS
+    return Job.objects.create(name=name, payload=kwargs, max_attempts=max_attempts,
+                              run_at=timezone.now() + datetime.timedelta(seconds=delay))
+
+
+def backoff(attempts):
+    """
+    Function is used to get the delay before the next run of a failed job, doubling at every attempt
+    with up to 10% of jitter so jobs failing together do not retry together.
+    :param attempts: number of runs the job already had.
+    :return: delay in seconds.
+    """
+    delay = min(settings.JOB_RETRY_BACKOFF * 2 ** (attempts - 1), settings.JOB_RETRY_BACKOFF_MAX)
+    return delay + random.uniform(0, delay / 10)
+
+
+def claim(worker, limit=1):
+    """
+    Function is used to take due jobs for a worker. Jobs left running by a worker which died for longer than
+    JOB_LOCK_TIMEOUT are due again.
+    :param worker: name of the worker.
+    :param limit: largest number of jobs taken.
+    :return: list of claimed Job objects.
+    """
+    now = timezone.now()
+    stale = now - datetime.timedelta(seconds=settings.JOB_LOCK_TIMEOUT)
+    due = Q(status=Job.QUEUED, run_at__lte=now) | Q(status=Job.RUNNING, locked_at__lt=stale)
+    candidates = list(Job.objects.filter(due).order_by('run_at', 'id').values_list('id', 'status', 'locked_at')[:limit])
+    claimed = []
+    for job_id, job_status, locked_at in candidates:
+        # Only one worker can move the row away from the state it read.
+        if Job.objects.filter(id=job_id, status=job_status, locked_at=locked_at).update(
+                status=Job.RUNNING, locked_by=worker, locked_at=now, attempts=F('attempts') + 1):
+            claimed.append(job_id)
+    return list(Job.objects.filter(id__in=claimed).order_by('run_at', 'id'))
+
+
+def run_job(instance):
+    """
+    Function is used to run a claimed job and record its outcome.
+    :param instance: Job object claimed by this worker.
+    :return: True if the job succeeded.
+    """
+    try:
+        if instance.name not in registry:
+            raise UnknownJob(instance.name)
+        registry[instance.name](**instance.payload)
+    except Exception as e:
+        logger.exception(e)
+        error = traceback.format_exc()
+        if instance.attempts >= instance.max_attempts:
+            Job.objects.filter(id=instance.id, locked_by=instance.locked_by).update(
+                status=Job.DEAD, last_error=error, locked_at=None, modified_on=timezone.now())
+        else:
+            run_at = timezone.now() + datetime.timedelta(seconds=backoff(instance.attempts))
+            Job.objects.filter(id=instance.id, locked_by=instance.locked_by).update(
+                status=Job.QUEUED, run_at=run_at, last_error=error, locked_at=None, modified_on=timezone.now())
+        return False
+    Job.objects.filter(id=instance.id, locked_by=instance.locked_by).update(
+        status=Job.DONE, locked_at=None, modified_on=timezone.now())
+    return True
+
+
+def requeue(queryset):
+    """
+    Function is used to give dead or done jobs a new set of attempts.
+    :param queryset: queryset of Job objects.
+    :return: number of requeued jobs.
+    """
+    return queryset.exclude(status=Job.RUNNING).update(status=Job.QUEUED, attempts=0, run_at=timezone.now(),
+                                                       locked_by='', locked_at=None, modified_on=timezone.now())
+
+
+class Worker:
+    """
+    Worker polling the job table and running due jobs one at a time.
+    """
+
+    def __init__(self, name=None, poll_interval=None, batch_size=1):
+        """
+        :param name: name of the worker stored on the jobs it claims, unique per process and thread by default.
+        :param poll_interval: seconds to wait when no job is due, JOB_POLL_INTERVAL by default.
+        :param batch_size: largest number of jobs claimed at once.
+        """
+        self.name = name or '%s:%s:%s' % (socket.gethostname(), os.getpid(), threading.get_ident())
+        self.poll_interval = settings.JOB_POLL_INTERVAL if poll_interval is None else poll_interval
+        self.batch_size = batch_size
+        self.succeeded = self.failed = 0
+
+    def run_once(self):
+        """
+        Function is used to claim and run one batch of due jobs.
+        :return: number of jobs run.
+        """
+        jobs = claim(self.name, self.batch_size)
+        for claimed in jobs:
+            if run_job(claimed):
+                self.succeeded += 1
+            else:
+                self.failed += 1
+        return len(jobs)
+
+    def run(self, stop, drain=False):
+        """
+        Function is used to run jobs until stop is set.
+        :param stop: threading or multiprocessing Event.
+        :param drain: True to return as soon as no job is due.
+        """
+        while not stop.is_set():
+            close_old_connections()
+            if not self.run_once():
+                if drain:
+                    break
+                stop.wait(self.poll_interval)
+        connection.close()
@@ -0,0 +1,103 @@
+import datetime
+import os
+import subprocess
+import sys
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+import jobs
+from jobs.models import Job
+from jobs.queue import UnknownJob, Worker, claim, enqueue, job, requeue
+
+calls = []
+
+
+@job('tests.record')
+def record(value, fail=False):
+    calls.append(value)
+    if fail:
+        raise RuntimeError("failed %s" % value)
+
+
+@override_settings(JOB_MAX_ATTEMPTS=2, JOB_RETRY_BACKOFF=10, JOB_RETRY_BACKOFF_MAX=60)
+class TestQueue(TestCase):
+
+    def setUp(self):
+        calls.clear()
+        self.worker = Worker(name="worker", poll_interval=0)
+
+    def test_jobs_run_once_in_order(self):
+        first = enqueue(record, value=1)
+        enqueue('tests.record', value=2)
+        later = enqueue(record, delay=60, value=3)
+        self.assertEqual(self.worker.run_once(), 1)
+        self.assertEqual(self.worker.run_once(), 1)
+        self.assertEqual(self.worker.run_once(), 0)
+        self.assertEqual(calls, [1, 2])
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.attempts, first.locked_by), (Job.DONE, 1, "worker"))
+        self.assertEqual(Job.objects.get(id=later.id).status, Job.QUEUED)
+        with self.assertRaises(UnknownJob):
+            enqueue('tests.missing')
+
+    def test_claim_is_exclusive(self):
+        enqueue(record, value=1)
+        self.assertEqual(len(claim("first")), 1)
+        self.assertEqual(claim("second"), [])
+
+        # A job left running by a dead worker is claimed again once its lock is stale.
+        Job.objects.update(locked_at=timezone.now() - datetime.timedelta(hours=1))
+        claimed = claim("second")
+        self.assertEqual([(item.locked_by, item.attempts) for item in claimed], [("second", 2)])
+
+    def test_failed_jobs_retry_then_die(self):
+        failing = enqueue(record, value=1, fail=True)
+        self.worker.run_once()
+        failing.refresh_from_db()
+        self.assertEqual((failing.status, failing.attempts), (Job.QUEUED, 1))
+        self.assertGreaterEqual(failing.run_at, timezone.now() + datetime.timedelta(seconds=9))
+        self.assertIn("failed 1", failing.last_error)
+
+        Job.objects.update(run_at=timezone.now())
+        self.worker.run_once()
+        failing.refresh_from_db()
+        self.assertEqual((failing.status, failing.attempts), (Job.DEAD, 2))
+        self.assertEqual((self.worker.succeeded, self.worker.failed), (0, 2))
+
+        self.assertEqual(requeue(Job.objects.filter(status=Job.DEAD)), 1)
+        failing.refresh_from_db()
+        self.assertEqual((failing.status, failing.attempts), (Job.QUEUED, 0))
+
+    def test_unknown_jobs_die(self):
+        unknown = Job.objects.create(name="tests.missing", max_attempts=1)
+        self.worker.run_once()
+        unknown.refresh_from_db()
+        self.assertEqual(unknown.status, Job.DEAD)
+        self.assertIn("UnknownJob", unknown.last_error)
+
+
+class TestRunWorkers(TransactionTestCase):
+
+    def test_workers_drain_the_queue(self):
+        calls.clear()
+        for value in range(6):
+            enqueue(record, value=value)
+        out = StringIO()
+        call_command('run_workers', workers=3, mode='thread', drain=True, stdout=out)
+        self.assertIn("Started 3 thread workers.", out.getvalue())
+        self.assertEqual(sorted(calls), list(range(6)))
+        self.assertEqual(Job.objects.filter(status=Job.DONE).count(), 6)
+
+
+class TestRegistry(SimpleTestCase):
+
+    def test_tasks_modules_are_discovered(self):
+        # A new interpreter, as the tests already imported the tasks modules.
+        script = "import django; django.setup(); from jobs.queue import registry; print(sorted(registry))"
+        root = os.path.dirname(os.path.dirname(jobs.__file__))
+        output = subprocess.run([sys.executable, '-c', script], cwd=root, check=True, stdout=subprocess.PIPE,
+                                universal_newlines=True).stdout
+        self.assertIn('mailer.send_outbox', output)
@@ -0,0 +1,16 @@
+from django.contrib import admin
+
+from mailer.models import OutboxEmail
+from mailer.outbox import resend
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ('id', 'subject', 'status', 'attempts', 'send_at', 'sent_on')
+    list_filter = ('status',)
+    search_fields = ('subject',)
+    actions = ['resend_emails']
+
+    def resend_emails(self, request, queryset):
+        resend(queryset)
+    resend_emails.short_description = "Send selected emails again"
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from mailer.outbox import send_outbox
+
+
+class Command(BaseCommand):
+    """
+    Command is used to send the due emails of the outbox, without waiting for the mailer.send_outbox job.
+    """
+    help = "Send the due emails of the outbox in batches over one SMTP connection per batch."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Emails sent over one connection, MAILER_BATCH_SIZE by default.")
+        parser.add_argument('--limit', type=int, default=None, help="Largest number of emails sent.")
+
+    def handle(self, *args, **options):
+        sent, failed = send_outbox(options['batch_size'], options['limit'])
+        self.stdout.write(self.style.SUCCESS("Sent %s emails, %s failed." % (sent, failed)))
@@ -0,0 +1,43 @@
+import jsonfield
+from django.db import models
+from django.utils import timezone
+
+from users.models import BaseModel
+
+
+class OutboxEmail(BaseModel):
+    """
+    OutboxEmail class is define for the keep an email until the outbox sender delivers it.
+    :param BaseModel: Base class which has common attribute for the
+    application.
+    """
+    QUEUED = 'queued'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'Queued'),
+        (SENDING, 'Sending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    )
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField(blank=True)
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=254)
+    recipients = jsonfield.JSONField(default=list)
+    status = models.CharField(max_length=7, choices=STATUS_CHOICES, default=QUEUED)
+    send_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    sent_on = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self):
+        return "%s %s" % (self.subject, self.status)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'send_at'], name='outbox_status_send_at'),
+        ]
@@ -0,0 +1,205 @@
+import datetime
+import logging
+import smtplib
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F, Q
+from django.template.loader import get_template
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import backoff, enqueue
+from mailer.models import OutboxEmail
+
+logger = logging.getLogger('django')
+
+"""
+    This module contains the email outbox, which sends emails in batches instead of opening an SMTP connection
+    for every email in the request or job which wrote it.
+
+    queue_email() stores an OutboxEmail row in the transaction of the caller, so an email is only sent when the
+    data it talks about was saved, and makes sure a mailer.send_outbox job is queued. The job claims a batch of
+    due emails with a conditional UPDATE, like the job queue claims jobs, and sends the whole batch over one
+    SMTP connection. An email refused by the server is retried with the backoff of the job queue until it has
+    used MAILER_MAX_ATTEMPTS attempts.
+"""
+
+# Exceptions which only concern the email being sent; anything else ends the batch.
+MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError,
+                  UnicodeError, ValueError)
+
+
+@lru_cache(maxsize=None)
+def compiled_template(name):
+    """
+    Function is used to get a template compiled once per process. The template engine compiles a template at
+    every get_template() call unless its cached loader is configured, which it is not with DEBUG on.
+    :param name: name of the template.
+    :return: Template object.
+    """
+    return get_template(name)
+
+
+def render_email(name, context):
+    """
+    Function is used to render an email body from a compiled template.
+    :param name: name of the template.
+    :param context: dict of the template context.
+    :return: rendered html.
+    """
+    return compiled_template(name).render(context)
+
+
+def queue_email(subject, recipients, html_body='', body='', from_email=None):
+    """
+    Function is used to store an email in the outbox and queue the job sending it.
+    :param subject: subject of the email.
+    :param recipients: list of recipient addresses.
+    :param html_body: html alternative of the email.
+    :param body: plain text of the email.
+    :param from_email: sender, EMAIL_HOST_USER by default.
+    :return: OutboxEmail object.
+    """
+    email = OutboxEmail.objects.create(subject=subject, recipients=list(recipients), html_body=html_body or '',
+                                       body=body or '', from_email=from_email or settings.EMAIL_HOST_USER)
+    schedule_sender()
+    return email
+
+
+def schedule_sender(delay=0, **kwargs):
+    """
+    Function is used to make sure the mailer.send_outbox job runs within delay seconds, which sends every email
+    due when it runs. A queued job due by then is enough, a later one, like the run waiting for the retry of
+    a refused email, is brought forward, and a job is queued only if none is waiting.
+    :param delay: seconds to wait before the job can run.
+    :param kwargs: arguments of the job.
+    """
+    run_at = timezone.now() + datetime.timedelta(seconds=delay)
+    queued = Job.objects.filter(name='mailer.send_outbox', status=Job.QUEUED)
+    if queued.filter(run_at__lte=run_at).exists():
+        return
+    if not queued.update(run_at=run_at, modified_on=timezone.now()):
+        enqueue('mailer.send_outbox', delay=delay, **kwargs)
+
+
+def resend(queryset):
+    """
+    Function is used to give failed or sent emails a new set of attempts.
+    :param queryset: queryset of OutboxEmail objects.
+    :return: number of queued emails.
+    """
+    count = queryset.exclude(status=OutboxEmail.SENDING).update(
+        status=OutboxEmail.QUEUED, attempts=0, send_at=timezone.now(), locked_at=None, modified_on=timezone.now())
+    if count:
+        schedule_sender()
+    return count
+
+
+def claim_emails(limit):
+    """
+    Function is used to take due emails for a sender. Emails left sending by a sender which died for longer
+    than MAILER_LOCK_TIMEOUT are due again.
+    :param limit: largest number of emails taken.
+    :return: list of claimed OutboxEmail objects.
+    """
+    now = timezone.now()
+    stale = now - datetime.timedelta(seconds=settings.MAILER_LOCK_TIMEOUT)
+    due = Q(status=OutboxEmail.QUEUED, send_at__lte=now) | Q(status=OutboxEmail.SENDING, locked_at__lt=stale)
+    candidates = list(OutboxEmail.objects.filter(due).order_by('send_at', 'id')
+                      .values_list('id', 'status', 'locked_at')[:limit])
+    claimed = []
+    for email_id, email_status, locked_at in candidates:
+        # Only one sender can move the row away from the state it read.
+        if OutboxEmail.objects.filter(id=email_id, status=email_status, locked_at=locked_at).update(
+                status=OutboxEmail.SENDING, locked_at=now, attempts=F('attempts') + 1):
+            claimed.append(email_id)
+    return list(OutboxEmail.objects.filter(id__in=claimed).order_by('send_at', 'id'))
+
+
+def build_message(email, connection):
+    message = EmailMultiAlternatives(subject=email.subject, body=email.body, from_email=email.from_email,
+                                     to=email.recipients, connection=connection)
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+def release(email, error):
+    """
+    Function is used to give a claimed email back to the outbox after a failed attempt.
+    :param email: OutboxEmail object claimed by this sender.
+    :param error: description of the failure.
+    """
+    if email.attempts >= settings.MAILER_MAX_ATTEMPTS:
+        OutboxEmail.objects.filter(id=email.id).update(
+            status=OutboxEmail.FAILED, last_error=error, locked_at=None, modified_on=timezone.now())
+    else:
+        send_at = timezone.now() + datetime.timedelta(seconds=backoff(email.attempts))
+        OutboxEmail.objects.filter(id=email.id).update(
+            status=OutboxEmail.QUEUED, send_at=send_at, last_error=error, locked_at=None,
+            modified_on=timezone.now())
+
+
+def send_batch(batch_size=None):
+    """
+    Function is used to send one batch of due emails over a single SMTP connection. Emails the server refuses
+    are retried later; if the connection fails, the unsent emails of the batch are retried and the error is
+    raised.
+    :param batch_size: largest number of emails sent, MAILER_BATCH_SIZE by default.
+    :return: tuple of (number of sent emails, number of failed emails).
+    """
+    emails = claim_emails(batch_size or settings.MAILER_BATCH_SIZE)
+    if not emails:
+        return 0, 0
+    sent, failed = [], []
+    connection = get_connection()
+    try:
+        connection.open()
+        for email in emails:
+            try:
+                # send_messages() would stop the batch at the first refused email.
+                connection.send_messages([build_message(email, connection)])
+            except MESSAGE_ERRORS as e:
+                logger.warning("Outbox email %s was not sent: %s", email.id, e)
+                failed.append((email, repr(e)))
+            else:
+                sent.append(email.id)
+    except Exception as e:
+        logger.exception(e)
+        done = set(sent) | {email.id for email, error in failed}
+        failed.extend((email, repr(e)) for email in emails if email.id not in done)
+        raise
+    finally:
+        try:
+            connection.close()
+        except Exception as e:
+            logger.exception(e)
+        with transaction.atomic():
+            OutboxEmail.objects.filter(id__in=sent).update(status=OutboxEmail.SENT, sent_on=timezone.now(),
+                                                           locked_at=None, last_error='',
+                                                           modified_on=timezone.now())
+            for email, error in failed:
+                release(email, error)
+    return len(sent), len(failed)
+
+
+def send_outbox(batch_size=None, limit=None):
+    """
+    Function is used to send due emails batch by batch until none is due.
+    :param batch_size: largest number of emails sent over one connection, MAILER_BATCH_SIZE by default.
+    :param limit: largest number of emails claimed in total, no limit by default.
+    :return: tuple of (number of sent emails, number of failed emails).
+    """
+    batch_size = batch_size or settings.MAILER_BATCH_SIZE
+    sent = failed = 0
+    while limit is None or sent + failed < limit:
+        size = batch_size if limit is None else min(batch_size, limit - sent - failed)
+        batch_sent, batch_failed = send_batch(size)
+        if not batch_sent + batch_failed:
+            break
+        sent += batch_sent
+        failed += batch_failed
+    return sent, failed
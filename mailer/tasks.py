@@ -0,0 +1,23 @@
+from django.db.models import Min
+from django.utils import timezone
+
+from jobs.queue import job
+from mailer.models import OutboxEmail
+from mailer.outbox import schedule_sender, send_outbox
+
+"""
+    This module contains the background job sending the email outbox.
+"""
+
+
+@job('mailer.send_outbox')
+def send_outbox_job(batch_size=None):
+    """
+    Function is used to send the due emails of the outbox, and to queue the next run when emails are waiting
+    for a retry.
+    :param batch_size: largest number of emails sent over one connection, MAILER_BATCH_SIZE by default.
+    """
+    send_outbox(batch_size)
+    retry_at = OutboxEmail.objects.filter(status=OutboxEmail.QUEUED).aggregate(retry_at=Min('send_at'))['retry_at']
+    if retry_at:
+        schedule_sender(delay=max((retry_at - timezone.now()).total_seconds(), 0), batch_size=batch_size)
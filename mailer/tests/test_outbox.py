@@ -0,0 +1,170 @@
+import socketserver
+import threading
+from email import message_from_bytes
+from io import StringIO
+
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django_rest_passwordreset.models import ResetPasswordToken
+from django_rest_passwordreset.signals import reset_password_token_created
+
+from jobs.models import Job
+from jobs.queue import Worker
+from mailer.models import OutboxEmail
+from mailer.outbox import compiled_template, queue_email, resend, send_outbox
+from users.emails import send_welcome_email
+from users.models import User
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """
+    Local SMTP server keeping the messages it receives, refusing the recipients in refused.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.connections = 0
+        self.messages = []
+        self.refused = set()
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply('220 sink')
+        recipients = []
+        while True:
+            line = self.rfile.readline().decode().strip()
+            command = line[:4].upper()
+            if not line or command == 'QUIT':
+                self.reply('221 bye')
+                return
+            if command == 'RCPT':
+                address = line.split(':', 1)[1].strip().strip('<>')
+                if address in self.server.refused:
+                    self.reply('550 refused')
+                    continue
+                recipients.append(address)
+            elif command == 'DATA':
+                self.reply('354 go ahead')
+                data = b''
+                for chunk in iter(self.rfile.readline, b''):
+                    if chunk == b'.\r\n':
+                        break
+                    data += chunk
+                self.server.messages.append((recipients, message_from_bytes(data)))
+                recipients = []
+            elif command in ('MAIL', 'RSET'):
+                recipients = []
+            self.reply('250 ok')
+
+
+class TestOutbox(TestCase):
+
+    def setUp(self):
+        self.sink = SMTPSink()
+        threading.Thread(target=self.sink.serve_forever, daemon=True).start()
+        smtp = override_settings(EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                                 EMAIL_HOST='127.0.0.1', EMAIL_PORT=self.sink.server_address[1],
+                                 EMAIL_USE_TLS=False, EMAIL_HOST_PASSWORD='')
+        smtp.enable()
+        self.addCleanup(smtp.disable)
+        self.user = User.objects.create(username="mailed", first_name="mailed", email="mailed@gmail.com")
+
+    def tearDown(self):
+        self.sink.shutdown()
+        self.sink.server_close()
+
+    def test_batch_uses_one_connection(self):
+        for index in range(5):
+            queue_email("Subject %s" % index, ["user%s@gmail.com" % index], html_body="<p>%s</p>" % index)
+        self.assertEqual(Job.objects.filter(name='mailer.send_outbox').count(), 1)
+        self.assertEqual(len(self.sink.messages), 0)
+
+        self.assertEqual(send_outbox(batch_size=3), (5, 0))
+        self.assertEqual(self.sink.connections, 2)
+        self.assertEqual([recipients for recipients, message in self.sink.messages],
+                         [["user%s@gmail.com" % index] for index in range(5)])
+        self.assertEqual(self.sink.messages[0][1]['Subject'], "Subject 0")
+        self.assertEqual(set(OutboxEmail.objects.values_list('status', flat=True)), {OutboxEmail.SENT})
+        self.assertEqual(send_outbox(), (0, 0))
+        self.assertEqual(self.sink.connections, 2)
+
+    def test_refused_email_is_retried(self):
+        self.sink.refused.add("bounce@gmail.com")
+        refused = queue_email("Refused", ["bounce@gmail.com"], html_body="<p>refused</p>")
+        queue_email("Accepted", ["mailed@gmail.com"], html_body="<p>accepted</p>")
+
+        with self.settings(MAILER_MAX_ATTEMPTS=2):
+            self.assertEqual(send_outbox(), (1, 1))
+            refused.refresh_from_db()
+            self.assertEqual((refused.status, refused.attempts), (OutboxEmail.QUEUED, 1))
+            self.assertIn("SMTPRecipientsRefused", refused.last_error)
+            self.assertGreater(refused.send_at, timezone.now())
+            self.assertEqual(send_outbox(), (0, 0))
+
+            OutboxEmail.objects.filter(id=refused.id).update(send_at=timezone.now())
+            self.assertEqual(send_outbox(), (0, 1))
+            refused.refresh_from_db()
+            self.assertEqual(refused.status, OutboxEmail.FAILED)
+
+        self.sink.refused.clear()
+        self.assertEqual(resend(OutboxEmail.objects.filter(id=refused.id)), 1)
+        self.assertEqual(send_outbox(), (1, 0))
+        self.assertEqual(self.sink.connections, 3)
+
+    def test_new_email_brings_a_delayed_sender_forward(self):
+        self.sink.refused.add("bounce@gmail.com")
+        queue_email("Refused", ["bounce@gmail.com"], body="refused")
+        worker = Worker(name="worker", poll_interval=0)
+        self.assertEqual(worker.run_once(), 1)
+        # The job runs again when the refused email is due.
+        retry = Job.objects.get(status=Job.QUEUED)
+        self.assertGreater(retry.run_at, timezone.now())
+
+        queue_email("Accepted", ["mailed@gmail.com"], body="accepted")
+        self.assertEqual(Job.objects.filter(status=Job.QUEUED).count(), 1)
+        self.assertEqual(worker.run_once(), 1)
+        self.assertEqual([message['Subject'] for recipients, message in self.sink.messages], ["Accepted"])
+        self.assertEqual(Job.objects.filter(status=Job.QUEUED).count(), 1)
+
+    def test_connection_failure_requeues_batch(self):
+        queue_email("Subject", ["mailed@gmail.com"], html_body="<p>body</p>")
+        with self.settings(EMAIL_PORT=1):
+            with self.assertRaises(OSError):
+                send_outbox()
+        email = OutboxEmail.objects.get()
+        self.assertEqual((email.status, email.attempts), (OutboxEmail.QUEUED, 1))
+
+    def test_job_sends_welcome_and_reset_emails(self):
+        compiled_template.cache_clear()
+        send_welcome_email(self.user)
+        token = ResetPasswordToken.objects.create(user=self.user)
+        reset_password_token_created.send(sender=self.__class__, instance=self, reset_password_token=token)
+        self.assertEqual(compiled_template.cache_info().misses, 2)
+        send_welcome_email(self.user)
+        self.assertEqual(compiled_template.cache_info().hits, 1)
+
+        Worker(name="worker", poll_interval=0).run_once()
+        self.assertEqual(Job.objects.get().status, Job.DONE)
+        self.assertEqual(self.sink.connections, 1)
+        subjects = [message['Subject'] for recipients, message in self.sink.messages]
+        self.assertEqual(subjects, ["WELCOME!", "Password Reset for WallApp", "WELCOME!"])
+        html = self.sink.messages[1][1].get_payload()[-1].get_payload(decode=True).decode()
+        self.assertIn(token.key, html)
+
+    def test_command(self):
+        queue_email("Subject", ["mailed@gmail.com"], body="plain")
+        out = StringIO()
+        call_command('send_outbox', '--batch-size', '10', stdout=out)
+        self.assertIn("Sent 1 emails, 0 failed.", out.getvalue())
+        self.assertEqual(self.sink.messages[0][1].get_payload().strip(), "plain")
+        self.assertEqual(len(mail.outbox), 0)
@@ -0,0 +1,161 @@
+import base64
+import datetime
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+"""
+    This module contains helpers for paginating querysets, including keyset (cursor) pagination.
+"""
+
+
+class InvalidCursor(ValueError):
+    """
+    Raised when a cursor token sent by a client can not be decoded.
+    """
+
+
+def get_page_size(value, default=None, maximum=None):
+    """
+    Function is used to convert the requested page size into a safe integer.
+    :param value: page size sent by the client.
+    :param default: page size used when value is missing or invalid.
+    :param maximum: largest page size the server allows.
+    :return: page size between 1 and maximum.
+    """
+    default = default or settings.DEFAULT_PAGE_SIZE
+    maximum = maximum or settings.MAX_PAGE_SIZE
+    try:
+        page_size = int(value)
+    except (TypeError, ValueError):
+        return default
+    if page_size < 1:
+        return default
+    return min(page_size, maximum)
+
+
+def encode_cursor(value, pk, reverse=False):
+    """
+    Function is used to build an opaque cursor token from a row position.
+    :param value: value of the sort field for the row.
+    :param pk: primary key of the row, used as tie breaker.
+    :param reverse: True if the cursor points backwards.
+    :return: url safe cursor token.
+    """
+    if isinstance(value, datetime.datetime):
+        value = value.isoformat()
+    payload = json.dumps([value, pk, int(reverse)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    Function is used to read the row position back out of a cursor token.
+    :param token: cursor token sent by the client.
+    :return: tuple of (value, pk, reverse).
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        value, pk, reverse = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        return value, int(pk), bool(reverse)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise InvalidCursor(token)
+
+
+class CursorPage:
+    """
+    A single page of results produced by the CursorPaginator.
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class CursorPaginator:
+    """
+    Keyset paginator which seeks to a page with a WHERE clause on (sort field, id) instead of OFFSET,
+    so every page costs a single indexed query no matter how deep it is.
+    """
+
+    def __init__(self, queryset, sort_field, descending=True, page_size=None):
+        """
+        :param queryset: queryset to paginate, without ordering.
+        :param sort_field: name of the field used for sorting.
+        :param descending: True to sort from the highest value to the lowest.
+        :param page_size: number of rows in a page.
+        """
+        self.queryset = queryset
+        self.sort_field = sort_field
+        self.descending = descending
+        self.page_size = page_size or settings.DEFAULT_PAGE_SIZE
+
+    def _cursor_value(self, value, cursor):
+        """
+        Function is used to convert the sort value of a cursor to the type of the sort field.
+        :param value: sort value read from the cursor.
+        :param cursor: cursor token sent by the client.
+        :return: value to filter the sort field with.
+        """
+        if value is None:
+            raise InvalidCursor(cursor)
+        try:
+            return self.queryset.model._meta.get_field(self.sort_field).to_python(value)
+        except (ValidationError, TypeError, ValueError):
+            raise InvalidCursor(cursor)
+
+    def _ordering(self, reverse):
+        descending = self.descending != reverse
+        prefix = '-' if descending else ''
+        return prefix + self.sort_field, prefix + 'id'
+
+    def _seek(self, value, pk, reverse):
+        lookup = 'lt' if self.descending != reverse else 'gt'
+        return (Q(**{'%s__%s' % (self.sort_field, lookup): value}) |
+                Q(**{self.sort_field: value, 'id__%s' % lookup: pk}))
+
+    def _position(self, row):
+        if isinstance(row, dict):
+            return row[self.sort_field], row['id']
+        return getattr(row, self.sort_field), row.pk
+
+    def page(self, cursor=None):
+        """
+        Function is used to fetch the page that starts after the given cursor.
+        :param cursor: cursor token sent by the client, None for the first page.
+        :return: CursorPage object.
+        """
+        reverse = False
+        queryset = self.queryset
+        if cursor:
+            value, pk, reverse = decode_cursor(cursor)
+            value = self._cursor_value(value, cursor)
+            queryset = queryset.filter(self._seek(value, pk, reverse))
+        rows = list(queryset.order_by(*self._ordering(reverse))[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or reverse:
+                next_cursor = encode_cursor(*self._position(rows[-1]))
+            if cursor and (has_more or not reverse):
+                previous_cursor = encode_cursor(*self._position(rows[0]), reverse=True)
+        return CursorPage(rows, next_cursor=next_cursor, previous_cursor=previous_cursor)
@@ -0,0 +1,89 @@
+from django.utils.cache import patch_vary_headers
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+"""
+    This module contains the renderers used for every ApiResponse: a fast JSON renderer and a MessagePack
+    renderer picked with the Accept header.
+"""
+
+# Characters escaped by the DRF JSONRenderer so the output stays a strict javascript subset.
+LINE_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+# Datetimes are passed to encode_default so they are formatted exactly like the DRF encoder does.
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME if orjson is not None else 0
+
+
+def vary_on_accept(renderer_context):
+    """
+    Function is used to tell the caches that the body of a response depends on its Accept header.
+    :param renderer_context: context passed to the renderer, with the response being rendered.
+    """
+    response = (renderer_context or {}).get('response')
+    if response is not None:
+        patch_vary_headers(response, ['Accept'])
+
+
+def encode_default(obj):
+    """
+    Function is used to encode the values the fast encoders do not know, the way DRF does.
+    :param obj: value to encode, like a datetime, a Decimal or a lazy translation.
+    :return: value the encoders know.
+    """
+    return encoders.JSONEncoder().default(obj)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer which encodes with orjson when it is installed. The output is the same as the DRF renderer:
+    datetimes and the other extra types go through the DRF encoder, dicts from jsonfield columns and the
+    serializers are encoded natively. Indented output, asked for with `Accept: application/json; indent=4`
+    or by the browsable API, is left to the DRF renderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """
+        Render `data` into JSON, returning a bytestring.
+        """
+        vary_on_accept(renderer_context)
+        if orjson is None or self.ensure_ascii or not self.compact or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=encode_default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        for separator, escaped in LINE_SEPARATORS:
+            if separator in ret:
+                ret = ret.replace(separator, escaped)
+        return ret
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Renderer which serializes to MessagePack, for clients sending `Accept: application/msgpack`.
+    Values are encoded as in the JSON output, so datetimes are ISO 8601 strings.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """
+        Render `data` into MessagePack, returning a bytestring.
+        """
+        vary_on_accept(renderer_context)
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=encode_default, use_bin_type=True)
@@ -1,3 +1,7 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
 from rest_framework.response import Response
 
 """
@@ -18,13 +22,18 @@ class ApiResponse:
         """
 
     def __init__(self, status: int, message: str, data: dict = None, http_status=None, length=None,
-                 count=None, total_page=None, next=None, previous=None):
+                 count=None, total_page=None, next=None, previous=None, next_cursor=None, previous_cursor=None,
+                 etag=None, last_modified=None):
         """
 
         :param status:  Status to be sent in response.
         :param message: message to be sent with response.
         :param data:Data to be sent in api, if not specified returns empty dict
         :param http_status: HTTP_STATUS of api, if not specified explicitly then handled by restframework
+        :param next_cursor: cursor token of the next page when cursor pagination is used.
+        :param previous_cursor: cursor token of the previous page when cursor pagination is used.
+        :param etag: ETag header sent with the response.
+        :param last_modified: datetime sent in the Last-Modified header.
         """
         self.response = {}
 
@@ -36,6 +45,10 @@ class ApiResponse:
         self.total_page = total_page
         self.next = next
         self.previous = previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.etag = etag
+        self.last_modified = last_modified
 
         self.data = data if data else dict()
 
@@ -54,6 +67,10 @@ class ApiResponse:
             self.response['next'] = self.next
         if self.previous is not None:
             self.response['previous'] = self.previous
+        if self.next_cursor is not None:
+            self.response['next_cursor'] = self.next_cursor
+        if self.previous_cursor is not None:
+            self.response['previous_cursor'] = self.previous_cursor
         self.response['status'] = self.status
         self.response['message'] = self.message
         if self.length:
@@ -61,9 +78,67 @@ class ApiResponse:
         self.response['data'] = self.data
 
         if self.http_status:
-            return Response(self.response, status=self.http_status)
+            response = Response(self.response, status=self.http_status)
         else:
-            return Response(self.response)
+            response = Response(self.response)
+        return set_validators(response, self.etag, self.last_modified)
+
+
+def set_validators(response, etag=None, last_modified=None):
+    """
+    Function is used to add the ETag and Last-Modified headers to a response.
+    :param response: response object.
+    :param etag: quoted ETag value.
+    :param last_modified: datetime of the last change.
+    :return: the same response.
+    """
+    if etag:
+        response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    if etag or last_modified:
+        # The body, and so its validators, depend on the media type picked with the Accept header.
+        patch_vary_headers(response, ['Accept'])
+    return response
+
+
+def make_etag(*validators, media_type=None):
+    """
+    Function is used to build a strong ETag from the values a response body depends on.
+    :param validators: values which change whenever the body changes.
+    :param media_type: media type the body is rendered in, None for an ETag shared by every representation.
+    :return: quoted ETag value.
+    """
+    etag = '"%s"' % hashlib.sha1(repr(validators).encode()).hexdigest()
+    if media_type is None:
+        return etag
+    return media_type_etag(etag, media_type)
+
+
+def media_type_etag(etag, media_type):
+    """
+    Function is used to give every representation of a resource its own ETag, as a strong ETag
+    validates the bytes of the body.
+    :param etag: ETag shared by every representation, built with make_etag.
+    :param media_type: media type the body is rendered in, like request.accepted_media_type.
+    :return: quoted ETag value.
+    """
+    return make_etag(etag, media_type)
+
+
+def not_modified_response(request, etag=None, last_modified=None):
+    """
+    Function is used to answer a conditional GET before the body is built.
+    :param request: request with the If-None-Match / If-Modified-Since headers.
+    :param etag: current ETag of the resource.
+    :param last_modified: datetime of the last change of the resource.
+    :return: 304 response if the client copy is still fresh, otherwise None.
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        return None
+    return set_validators(response, etag, last_modified)
 
 
 def get_error_message(serializer):
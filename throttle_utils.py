@@ -0,0 +1,223 @@
+import logging
+import math
+import re
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+from users.geolocation import client_ip
+
+logger = logging.getLogger('django')
+
+"""
+    This module contains the rate limiting of the API.
+
+    A view names its bucket with throttle_scope, and THROTTLE_BUCKETS gives the rate, the burst, the methods
+    and whether the bucket is kept per client IP or per user. A bucket is counted with a sliding window: a
+    counter in the shared cache per window of burst * period / rate seconds, incremented atomically with
+    cache.incr(), and the count of the previous window weighted by the share of it still inside the sliding
+    window. This allows burst requests at once and then rate requests per period on average, and stays
+    correct when many processes count the same bucket. It stands in for a token bucket, whose tokens and refill
+    time can not be updated atomically in a Django cache.
+
+    A request the cache can not count, e.g. while memcached is unreachable, is logged and allowed, so a cache
+    outage does not reject every request; THROTTLE_FAIL_CLOSED rejects it instead.
+
+    A rejected client is remembered by the process until its bucket has room again, so its next requests are
+    answered with 429 and Retry-After without touching the shared cache.
+"""
+
+PERIODS = {'s': 1, 'sec': 1, 'second': 1, 'm': 60, 'min': 60, 'minute': 60, 'h': 3600, 'hour': 3600,
+           'd': 86400, 'day': 86400}
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """
+    Function is used to read a rate written like 10/min or 100/5m.
+    :param rate: rate string.
+    :return: number of seconds between two requests of a full bucket.
+    """
+    match = re.match(r'^\s*(\d+)\s*/\s*(\d*)\s*([a-z]+)\s*$', rate)
+    if not match or match.group(3) not in PERIODS or not int(match.group(1)):
+        raise ValueError("Invalid throttle rate %r." % rate)
+    return int(match.group(2) or 1) * PERIODS[match.group(3)] / int(match.group(1))
+
+
+class BucketMetrics:
+    """
+    Per-process counters of every bucket.
+    """
+
+    FIELDS = ('allowed', 'throttled', 'fast_throttled', 'store_failures')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+
+    def count(self, scope, field):
+        with self.lock:
+            counters = self.counters.get(scope)
+            if counters is None:
+                counters = self.counters[scope] = dict.fromkeys(self.FIELDS, 0)
+            counters[field] += 1
+
+    def stats(self):
+        with self.lock:
+            return {scope: dict(counters) for scope, counters in self.counters.items()}
+
+    def clear(self):
+        with self.lock:
+            self.counters.clear()
+
+
+metrics = BucketMetrics()
+
+
+class SlidingWindowStore:
+    """
+    Sliding window buckets in a Django cache, with the per-process memory of the rejected clients.
+    """
+
+    def __init__(self, alias=None):
+        """
+        :param alias: name of the Django cache holding the buckets, THROTTLE_CACHE by default.
+        """
+        self.alias = alias
+        self.blocked = {}
+        self.lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias or settings.THROTTLE_CACHE]
+
+    def blocked_for(self, key, now):
+        """
+        Function is used to check the memory of the rejected clients.
+        :param key: key of the bucket.
+        :param now: current timestamp.
+        :return: seconds before the bucket has room, 0 if it is not known to be full.
+        """
+        with self.lock:
+            until = self.blocked.get(key)
+            if until is None:
+                return 0
+            if until <= now:
+                del self.blocked[key]
+                return 0
+            return until - now
+
+    def block(self, key, until):
+        with self.lock:
+            self.blocked[key] = until
+            # Forget the clients whose buckets have room again, so the memory stays small.
+            if len(self.blocked) > settings.THROTTLE_BLOCKED_ENTRIES:
+                now = time.time()
+                for blocked_key in [k for k, v in self.blocked.items() if v <= now]:
+                    del self.blocked[blocked_key]
+
+    def consume(self, key, interval, burst, now=None):
+        """
+        Function is used to take one request from a bucket.
+        :param key: key of the bucket.
+        :param interval: seconds between two requests once the burst is used.
+        :param burst: number of requests allowed at once.
+        :param now: current timestamp, time.time() by default.
+        :return: tuple of (allowed, seconds to wait), seconds to wait is None if the cache could not count the
+        request.
+        """
+        now = time.time() if now is None else now
+        window = burst * interval
+        index = int(now // window)
+        elapsed = now - index * window
+        counter_key = '%s:%s' % (key, index)
+        # The counter of a window is read as the previous one during the next window.
+        self.cache.add(counter_key, 0, timeout=math.ceil(2 * window))
+        try:
+            count = self.cache.incr(counter_key)
+        except ValueError:
+            # The counter was evicted right after it was added.
+            return False, None
+        previous = self.cache.get('%s:%s' % (key, index - 1)) or 0
+        if previous * (1 - elapsed / window) + count <= burst:
+            return True, 0
+        # Rejected requests do not count, so a client retrying too early is not delayed further.
+        try:
+            self.cache.decr(counter_key)
+        except ValueError:
+            pass
+        count -= 1
+        if count < burst and previous:
+            # The previous window has to slide out far enough.
+            return False, window * (1 - (burst - 1 - count) / previous) - elapsed
+        # The requests of this window have to slide out far enough in the next one.
+        return False, window - elapsed + window * (1 - (burst - 1) / count)
+
+    def clear(self):
+        with self.lock:
+            self.blocked.clear()
+
+
+bucket_store = SlidingWindowStore()
+
+
+class BucketThrottle(BaseThrottle):
+    """
+    Throttle taking one request from the THROTTLE_BUCKETS bucket named by the throttle_scope of the view.
+    """
+
+    def get_bucket(self, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if scope is None:
+            return None, None
+        return scope, settings.THROTTLE_BUCKETS[scope]
+
+    def get_ident_key(self, request, bucket):
+        """
+        Function is used to get who the bucket is kept for: the user if the bucket is per user and the request is
+        authenticated, the client IP otherwise.
+        :param request: request of the client.
+        :param bucket: settings of the bucket.
+        :return: string identifying the client.
+        """
+        if bucket.get('key', 'ip') == 'user' and request.user and request.user.is_authenticated:
+            return 'user:%s' % request.user.pk
+        return 'ip:%s' % (client_ip(request) or self.get_ident(request))
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        scope, bucket = self.get_bucket(view)
+        if not settings.THROTTLE_ENABLED or bucket is None:
+            return True
+        methods = bucket.get('methods')
+        if methods and request.method not in methods:
+            return True
+        key = 'throttle:%s:%s' % (scope, self.get_ident_key(request, bucket))
+        now = time.time()
+        wait = bucket_store.blocked_for(key, now)
+        if wait:
+            metrics.count(scope, 'fast_throttled')
+            self.wait_seconds = wait
+            return False
+        interval = parse_rate(bucket['rate'])
+        allowed, wait = bucket_store.consume(key, interval, bucket.get('burst', 1), now)
+        if wait is None:
+            metrics.count(scope, 'store_failures')
+            logger.warning("Throttle cache could not count a request of %s.", key)
+            if not settings.THROTTLE_FAIL_CLOSED:
+                return True
+            wait = interval
+        if allowed:
+            metrics.count(scope, 'allowed')
+            return True
+        bucket_store.block(key, now + wait)
+        metrics.count(scope, 'throttled')
+        self.wait_seconds = wait
+        return False
+
+    def wait(self):
+        return self.wait_seconds
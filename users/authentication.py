@@ -0,0 +1,201 @@
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+import constants
+from users.models import User
+from users.revocation import is_revoked
+
+"""
+    This module contains the JWT authentication with a per-process cache of verified tokens.
+
+    JWTAuthentication verifies the signature of the token, decodes its claims and selects the user on every
+    request. CachedJWTAuthentication keeps the outcome in a bounded LRU keyed by the digest of the raw token,
+    for AUTH_CACHE_TIMEOUT seconds and never past the expiry of the token.
+
+    Every user has a generation number in the shared Django cache, stored with the cached entries. Changing
+    or deleting an account increments it, so the entries of the account become stale in every process.
+    This needs a default cache shared by the processes, like the Memcached of the production settings: with
+    the process-local cache of the local settings, the other processes keep using an entry until it expires.
+"""
+
+
+class TokenCache:
+    """
+    Bounded LRU of verified tokens and the users they resolve to.
+    """
+
+    def __init__(self, alias='default', timeout=None, max_entries=None):
+        """
+        :param alias: name of the Django cache holding the user generations.
+        :param timeout: seconds an entry is used, AUTH_CACHE_TIMEOUT by default.
+        :param max_entries: number of tokens kept, AUTH_CACHE_MAX_ENTRIES by default.
+        """
+        self.alias = alias
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self.local = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def generation_key(self, user_id):
+        return 'user:auth:generation:%s' % user_id
+
+    def get_generation(self, user_id):
+        """
+        Function is used to get the current generation of a user. A missing generation starts from the current
+        time, so a generation lost by eviction can never match an entry stored before it.
+        :param user_id: id of the user.
+        :return: generation number.
+        """
+        key = self.generation_key(user_id)
+        generation = self.cache.get(key)
+        if generation is None:
+            self.cache.add(key, time.time_ns(), timeout=None)
+            generation = self.cache.get(key)
+        return generation
+
+    @staticmethod
+    def digest(raw_token):
+        if isinstance(raw_token, str):
+            raw_token = raw_token.encode()
+        return hashlib.sha256(raw_token).digest()
+
+    def get(self, raw_token):
+        """
+        Function is used to read the cached outcome of a token.
+        :param raw_token: token as sent by the client.
+        :return: tuple of (user, validated token) with a private copy of the user, or None.
+        """
+        key = self.digest(raw_token)
+        with self.lock:
+            entry = self.local.get(key)
+            if entry is not None:
+                self.local.move_to_end(key)
+        if entry is not None:
+            user_id, generation, expires_at, user, validated_token = entry
+            if expires_at > time.time() and generation == self.get_generation(user_id):
+                with self.lock:
+                    self.hits += 1
+                # Views may change request.user, so every request gets its own instance.
+                return pickle.loads(user), validated_token
+            with self.lock:
+                if self.local.get(key) is entry:
+                    del self.local[key]
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def set(self, raw_token, user, validated_token, generation):
+        """
+        Function is used to store the outcome of a verified token.
+        :param raw_token: token as sent by the client.
+        :param user: User object the token resolves to.
+        :param validated_token: validated token object.
+        :param generation: generation of the user read before the user was selected.
+        """
+        expires_at = time.time() + (self.timeout if self.timeout is not None else settings.AUTH_CACHE_TIMEOUT)
+        if 'exp' in validated_token:
+            expires_at = min(expires_at, validated_token['exp'])
+        entry = (user.pk, generation, expires_at, pickle.dumps(user, pickle.HIGHEST_PROTOCOL), validated_token)
+        key = self.digest(raw_token)
+        with self.lock:
+            self.local[key] = entry
+            self.local.move_to_end(key)
+            while len(self.local) > (self.max_entries or settings.AUTH_CACHE_MAX_ENTRIES):
+                self.local.popitem(last=False)
+
+    def invalidate(self, user_id):
+        """
+        Function is used to make every cached token of a user stale.
+        :param user_id: id of the user.
+        """
+        key = self.generation_key(user_id)
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            self.cache.add(key, time.time_ns(), timeout=None)
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.local), 'hits': self.hits, 'misses': self.misses}
+
+    def clear(self):
+        with self.lock:
+            self.local.clear()
+            self.hits = self.misses = 0
+
+
+token_cache = TokenCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication verifying a token and selecting its user once per AUTH_CACHE_TIMEOUT seconds, and
+    refusing revoked tokens.
+    """
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        cached = token_cache.get(raw_token)
+        if cached is not None:
+            user, validated_token = cached
+        else:
+            validated_token = self.get_validated_token(raw_token)
+            user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+            # Read before the user, so a change committed meanwhile makes the entry stale.
+            generation = token_cache.get_generation(user_id) if user_id is not None else None
+            user = self.get_user(validated_token)
+            token_cache.set(raw_token, user, validated_token, generation)
+        # Revoked tokens stay in the cache, the revocation filter answers in memory.
+        if is_revoked(validated_token, user):
+            raise AuthenticationFailed(constants.TOKEN_REVOKED, code='token_revoked')
+        return user, validated_token
+
+    def get_user(self, validated_token):
+        """
+        Function is used to select the user of a token from the primary database, since a replica lagging
+        behind could hold a cutoff older than the revocation of the token.
+        :param validated_token: validated token object.
+        :return: User object.
+        """
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Token contained no recognizable user identification')
+        try:
+            user = User.objects.using(DEFAULT_DB_ALIAS).get(**{api_settings.USER_ID_FIELD: user_id})
+        except User.DoesNotExist:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        if not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        return user
+
+
+def invalidate_user(user_id):
+    """
+    Function is used to drop the cached authentication of a user after the account changed.
+    :param user_id: id of the user.
+    """
+    token_cache.invalidate(user_id)
@@ -0,0 +1,22 @@
+import constants
+import utils
+from mailer.outbox import render_email
+
+"""
+    This module contains the emails sent to the users, rendered from compiled templates and sent by the outbox.
+"""
+
+
+def send_welcome_email(user):
+    """
+    Function is used to send the welcome email of a new user.
+    :param user: User object.
+    :return: OutboxEmail object.
+    """
+    context = {
+        'username': user.username,
+        'site_url': constants.SITE_URL + constants.LOGIN
+    }
+    # render email html
+    email_html_message = render_email('email_templates/register_success.html', context)
+    return utils.send_email(subject="WELCOME!", recipient=[user.email], body=email_html_message)
@@ -0,0 +1,245 @@
+import csv
+import ipaddress
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+
+logger = logging.getLogger('django')
+
+"""
+    This module contains the local IP geolocation, which finds the location of a client address in a sorted
+    table of IP ranges instead of calling a geolocation API.
+
+    The table is a binary file built from a CSV import and memory-mapped read only, so every process shares the
+    pages of the file and a lookup is a binary search without parsing anything:
+
+        header     MAGIC, then the number of IPv4 ranges, of IPv6 ranges, the offset and length of the locations
+        IPv4 rows  start and end address as 4 big-endian bytes each, index of the location as 2 bytes
+        IPv6 rows  start and end address as 16 big-endian bytes each, index of the location as 2 bytes
+        locations  JSON list of the distinct locations
+
+    Big-endian addresses of one width compare like their bytes, so rows are compared without decoding them.
+"""
+
+MAGIC = b'IPGEO\x00\x01\x00'
+HEADER = struct.Struct('<8sIIII')
+LOCATION_INDEX = struct.Struct('>H')
+# Address width in bytes of the IPv4 and IPv6 rows.
+WIDTHS = {4: 4, 6: 16}
+# Columns of a location, as the geolocation API named them.
+LOCATION_FIELDS = ('country_code', 'country', 'region', 'city')
+
+
+class InvalidTable(ValueError):
+    """
+    Raised when a geolocation file or CSV import can not be read.
+    """
+
+
+def parse_range(row, number):
+    """
+    Function is used to read the address range of a CSV row, either a network or a start_ip and end_ip.
+    :param row: dict of the CSV row.
+    :param number: line number of the row, used in errors.
+    :return: tuple of (version, start, end) with the addresses as integers.
+    """
+    try:
+        if row.get('network'):
+            network = ipaddress.ip_network(row['network'].strip(), strict=False)
+            start, end = network.network_address, network.broadcast_address
+        else:
+            start = ipaddress.ip_address(row['start_ip'].strip())
+            end = ipaddress.ip_address(row['end_ip'].strip())
+    except (KeyError, AttributeError, ValueError):
+        raise InvalidTable("Line %s has an invalid address range." % number)
+    if start.version != end.version or int(start) > int(end):
+        raise InvalidTable("Line %s has an invalid address range." % number)
+    return start.version, int(start), int(end)
+
+
+def build_table(stream, path):
+    """
+    Function is used to build a geolocation file from a CSV file with a network column, or start_ip and end_ip
+    columns, and the country_code, country, region and city columns. The file is written next to path and
+    moved over it, so running processes keep reading the old file until they reopen it.
+    :param stream: text file object of the CSV file.
+    :param path: path of the geolocation file.
+    :return: dict with the number of IPv4 ranges, IPv6 ranges and locations.
+    """
+    locations, indexes = [], {}
+    ranges = {4: [], 6: []}
+    for number, row in enumerate(csv.DictReader(stream), start=2):
+        version, start, end = parse_range(row, number)
+        location = tuple((row.get(field) or '').strip() for field in LOCATION_FIELDS)
+        if len(location[0]) != 2:
+            raise InvalidTable("Line %s has an invalid country code." % number)
+        location = (location[0].upper(),) + location[1:]
+        if location not in indexes:
+            if len(locations) > 0xFFFF:
+                raise InvalidTable("More than %s distinct locations." % 0xFFFF)
+            indexes[location] = len(locations)
+            locations.append(dict(zip(LOCATION_FIELDS, location)))
+        ranges[version].append((start, end, indexes[location]))
+
+    rows = bytearray()
+    for version in (4, 6):
+        width = WIDTHS[version]
+        ranges[version].sort()
+        for previous, current in zip(ranges[version], ranges[version][1:]):
+            if current[0] <= previous[1]:
+                raise InvalidTable("Range %s overlaps an other range." % ipaddress.ip_address(current[0]))
+        for start, end, index in ranges[version]:
+            rows += start.to_bytes(width, 'big') + end.to_bytes(width, 'big') + LOCATION_INDEX.pack(index)
+    body = json.dumps(locations, separators=(',', ':')).encode()
+    header = HEADER.pack(MAGIC, len(ranges[4]), len(ranges[6]), HEADER.size + len(rows), len(body))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as output:
+            output.write(header + rows + body)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    return {'ipv4': len(ranges[4]), 'ipv6': len(ranges[6]), 'locations': len(locations)}
+
+
+class IPRangeTable:
+    """
+    Memory-mapped geolocation file with an LRU cache of the looked up addresses.
+    """
+
+    def __init__(self, path, cache_size=None):
+        """
+        :param path: path of the geolocation file.
+        :param cache_size: number of addresses kept in the LRU cache, GEOLOCATION_CACHE_SIZE by default.
+        """
+        self.path = path
+        with open(path, 'rb') as stream:
+            self.mtime = os.fstat(stream.fileno()).st_mtime
+            self.buffer = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.buffer) < HEADER.size:
+            raise InvalidTable("%s is not a geolocation file." % path)
+        magic, ipv4, ipv6, offset, length = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC or offset + length != len(self.buffer):
+            raise InvalidTable("%s is not a geolocation file." % path)
+        self.sections = {4: (HEADER.size, ipv4), 6: (HEADER.size + ipv4 * self.row_size(4), ipv6)}
+        self.locations = json.loads(self.buffer[offset:offset + length].decode())
+        cache_size = settings.GEOLOCATION_CACHE_SIZE if cache_size is None else cache_size
+        self.lookup = lru_cache(maxsize=cache_size)(self.search)
+
+    @staticmethod
+    def row_size(version):
+        return 2 * WIDTHS[version] + LOCATION_INDEX.size
+
+    def __len__(self):
+        return sum(count for offset, count in self.sections.values())
+
+    def search(self, ip):
+        """
+        Function is used to find the location of an address with a binary search on the range starts.
+        :param ip: address as a string.
+        :return: location dict, or None if the address is invalid or in no range.
+        """
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return None
+        if address.version == 6 and address.ipv4_mapped is not None:
+            address = address.ipv4_mapped
+        width = WIDTHS[address.version]
+        offset, count = self.sections[address.version]
+        size = self.row_size(address.version)
+        key = address.packed
+        buffer = self.buffer
+        # Find the last range starting at or before the address.
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            position = offset + middle * size
+            if buffer[position:position + width] <= key:
+                low = middle + 1
+            else:
+                high = middle
+        if not low:
+            return None
+        position = offset + (low - 1) * size
+        if buffer[position + width:position + 2 * width] < key:
+            return None
+        index, = LOCATION_INDEX.unpack_from(buffer, position + 2 * width)
+        return self.locations[index]
+
+    def close(self):
+        self.buffer.close()
+
+
+_table = None
+_table_lock = threading.Lock()
+
+
+def get_table():
+    """
+    Function is used to get the geolocation table of this process, reopening it when the file was replaced.
+    :return: IPRangeTable object, or None if GEOLOCATION_TABLE does not exist.
+    """
+    global _table
+    path = settings.GEOLOCATION_TABLE
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+    table = _table
+    if table is not None and table.path == path and table.mtime == mtime:
+        return table
+    with _table_lock:
+        if _table is None or _table.path != path or _table.mtime != mtime:
+            try:
+                _table = IPRangeTable(path)
+            except (OSError, InvalidTable, ValueError) as e:
+                logger.exception(e)
+                return None
+        return _table
+
+
+def geolocate(ip):
+    """
+    Function is used to locate an address, in the shape the geolocation API answered.
+    :param ip: address as a string.
+    :return: dict with ip_address and the location fields, empty if the address is unknown.
+    """
+    table = get_table() if ip else None
+    location = table.lookup(ip) if table is not None else None
+    if location is None:
+        return {}
+    return dict(location, ip_address=ip)
+
+
+def client_ip(request):
+    """
+    Function is used to get the address of the client of a request. Behind GEOLOCATION_TRUSTED_PROXIES proxies,
+    each appending the address it got the request from to X-Forwarded-For, the client is the entry written by
+    the outermost proxy, that many entries from the right. Entries further left are sent by the client itself
+    and can not be trusted.
+    :param request: request of the client.
+    :return: address as a string, empty if it is not a valid address.
+    """
+    ip = request.META.get('REMOTE_ADDR', '')
+    proxies = settings.GEOLOCATION_TRUSTED_PROXIES
+    if proxies:
+        forwarded = [entry.strip() for entry in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')
+                     if entry.strip()]
+        if forwarded:
+            ip = forwarded[max(len(forwarded) - proxies, 0)]
+    try:
+        return str(ipaddress.ip_address(ip))
+    except ValueError:
+        return ''
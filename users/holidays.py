@@ -0,0 +1,168 @@
+import csv
+import datetime
+import logging
+import os
+import time
+from functools import lru_cache
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from users.models import User, Holiday
+
+logger = logging.getLogger('django')
+
+"""
+    This module contains the local holiday calendar, which fills in User.is_holiday and User.holiday_details
+    from the Holiday table instead of a holiday API.
+
+    holiday_details keeps the shape of the holidays.abstractapi.com answers, so clients reading it do not change.
+
+    The fixed-date holidays of the bundled dataset are created for the years given to import_holidays. When
+    the daily recompute_holidays finds no holiday stored for the year of its date, it imports the bundled
+    dataset for that year first, so the calendar does not run out on January 1st.
+"""
+
+DEFAULT_DATASET = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'holidays.csv')
+# Number of (country, date) answers kept in memory by every process.
+CACHE_SIZE = 4096
+# Key of the generation of the calendar in the shared Django cache, changed by every import.
+GENERATION_KEY = 'users:holidays:generation'
+
+
+def get_generation():
+    """
+    Function is used to get the current generation of the calendar. A missing generation starts from the
+    current time, so a generation lost by eviction can never match the answers cached before it.
+    :return: generation number.
+    """
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, time.time_ns(), timeout=None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def invalidate_calendar():
+    """
+    Function is used to make the holidays cached by every process stale.
+    """
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.add(GENERATION_KEY, time.time_ns(), timeout=None)
+
+
+def read_dataset(stream, years):
+    """
+    Function is used to read holidays from a CSV file with the country,date,name,type columns.
+    A date written MM-DD is a fixed-date holiday, repeated in every year of years.
+    :param stream: text file object.
+    :param years: years the fixed-date holidays are created for.
+    :return: list of unsaved Holiday objects.
+    """
+    holidays = []
+    for number, row in enumerate(csv.DictReader(stream), start=2):
+        try:
+            country = row['country'].strip().upper()
+            value = row['date'].strip()
+            if len(value) == 5:
+                month, day = value.split('-')
+                dates = [datetime.date(year, int(month), int(day)) for year in years]
+            else:
+                dates = [datetime.date.fromisoformat(value)]
+        except (KeyError, AttributeError, ValueError):
+            raise ValueError("Line %s is not a valid holiday." % number)
+        if len(country) != 2:
+            raise ValueError("Line %s has an invalid country code." % number)
+        holidays.extend(Holiday(country=country, date=date, name=row['name'].strip(),
+                                type=(row.get('type') or '').strip()) for date in dates)
+    return holidays
+
+
+def import_holidays(stream, years, replace=False):
+    """
+    Function is used to load a holiday dataset into the Holiday table.
+    :param stream: text file object.
+    :param years: years the fixed-date holidays are created for.
+    :param replace: True to delete the stored holidays of the countries of the dataset first.
+    :return: number of holidays in the dataset.
+    """
+    holidays = read_dataset(stream, years)
+    with transaction.atomic():
+        if replace:
+            Holiday.objects.filter(country__in={holiday.country for holiday in holidays}).delete()
+        Holiday.objects.bulk_create(holidays, batch_size=1000, ignore_conflicts=True)
+    invalidate_calendar()
+    return len(holidays)
+
+
+def import_missing_year(year):
+    """
+    Function is used to import the bundled dataset for a year the calendar has no holiday for.
+    :param year: year of the holidays.
+    :return: number of imported holidays, 0 if the year already has holidays.
+    """
+    if Holiday.objects.filter(date__year=year).exists():
+        return 0
+    logger.warning("No holidays stored for %s, importing the bundled dataset.", year)
+    with open(DEFAULT_DATASET, encoding='utf-8', newline='') as stream:
+        return import_holidays(stream, [year])
+
+
+def holiday_details(holiday):
+    return {
+        'name': holiday.name,
+        'country': holiday.country,
+        'type': holiday.type,
+        'date': holiday.date.strftime('%m/%d/%Y'),
+        'date_year': str(holiday.date.year),
+        'date_month': str(holiday.date.month),
+        'date_day': str(holiday.date.day),
+        'week_day': holiday.date.strftime('%A'),
+    }
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def cached_holidays(country, date, generation):
+    holidays = Holiday.objects.filter(country=country, date=date).order_by('name')
+    return tuple(holiday_details(holiday) for holiday in holidays)
+
+
+def holidays_on(country, date):
+    """
+    Function is used to get the holidays of a country on a date, cached per process. The calendar only changes
+    when a dataset is imported, which changes its generation, so the answers cached by every process before
+    the import are not used anymore.
+    :param country: ISO code of the country.
+    :param date: datetime.date object.
+    :return: tuple of holiday details, empty if the date is not a holiday.
+    """
+    return cached_holidays(country.upper(), date, get_generation())
+
+
+def recompute_holidays(date=None):
+    """
+    Function is used to set is_holiday and holiday_details of every user for a date, with one query for the
+    holidays of the date and one UPDATE per country. Only rows whose values change are written, and their
+    modified_on moves so the user ETags change too. The bundled dataset is imported first if the calendar has
+    no holiday in the year of the date.
+    :param date: datetime.date object, today by default.
+    :return: number of updated users.
+    """
+    date = date or timezone.localdate()
+    import_missing_year(date.year)
+    holidays = {}
+    for holiday in Holiday.objects.filter(date=date).order_by('country', 'name'):
+        holidays.setdefault(holiday.country, []).append(holiday_details(holiday))
+    updated = 0
+    countries = User.objects.order_by().values_list('country_code', flat=True).distinct()
+    for country in countries:
+        details = holidays.get(country, [])
+        users = User.objects.filter(country_code=country)
+        if not details:
+            # Users who had no holiday yesterday already hold these values.
+            users = users.filter(is_holiday=True)
+        updated += users.update(is_holiday=bool(details), holiday_details=details, modified_on=timezone.now())
+    return updated
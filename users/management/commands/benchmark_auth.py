@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.authentication import CachedJWTAuthentication, token_cache
+from users.models import User
+
+
+class Command(BaseCommand):
+    """
+    Command is used to measure the authentication overhead of a request with and without the token cache.
+    """
+    help = "Authenticate requests with JWTAuthentication and CachedJWTAuthentication and compare the time."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=10000, help="Number of requests per run.")
+
+    def handle(self, *args, **options):
+        requests = options['requests']
+        factory = APIRequestFactory()
+        # The user of the benchmark is rolled back at the end.
+        with transaction.atomic():
+            user = User.objects.create_user(username="benchmark-auth", email="benchmark-auth@example.com")
+            header = "Bearer %s" % AccessToken.for_user(user)
+            sample = [factory.get('/', HTTP_AUTHORIZATION=header) for _ in range(requests)]
+            token_cache.clear()
+            self.stdout.write("%s requests with the same token" % requests)
+            for authentication in (JWTAuthentication(), CachedJWTAuthentication()):
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    for request in sample:
+                        authentication.authenticate(request)
+                    elapsed = time.perf_counter() - started
+                self.stdout.write("%-24s %8.1f us/request %8s queries" % (
+                    type(authentication).__name__, elapsed / requests * 1e6, len(queries)))
+            token_cache.clear()
+            transaction.set_rollback(True)
@@ -0,0 +1,73 @@
+import io
+import os
+import random
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from users.geolocation import IPRangeTable, build_table
+
+
+def synthetic_dataset(ranges):
+    """
+    Function is used to build a CSV file of adjacent IPv4 ranges covering the whole address space.
+    :param ranges: number of ranges.
+    :return: text file object.
+    """
+    stream = io.StringIO()
+    stream.write("start_ip,end_ip,country_code,country,region,city\n")
+    step = 2 ** 32 // ranges
+    for index in range(ranges):
+        start = index * step
+        end = 2 ** 32 - 1 if index == ranges - 1 else start + step - 1
+        stream.write("%s,%s,C%s,Country,Region,City %s\n" % (
+            '.'.join(str(start >> shift & 255) for shift in (24, 16, 8, 0)),
+            '.'.join(str(end >> shift & 255) for shift in (24, 16, 8, 0)),
+            chr(ord('A') + index % 26), index % 1000))
+    stream.seek(0)
+    return stream
+
+
+class Command(BaseCommand):
+    """
+    Command is used to measure the lookups per second of the IP geolocation table.
+    """
+    help = "Look up random IPv4 addresses in the geolocation table, without and with the LRU cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lookups', type=int, default=100000, help="Number of lookups per run.")
+        parser.add_argument('--distinct', type=int, default=1000,
+                            help="Number of distinct addresses of the cached run.")
+        parser.add_argument('--synthetic', type=int, default=0,
+                            help="Build a temporary table of that many ranges instead of using GEOLOCATION_TABLE.")
+
+    def handle(self, *args, **options):
+        path = settings.GEOLOCATION_TABLE
+        temporary = None
+        if options['synthetic']:
+            descriptor, temporary = tempfile.mkstemp(suffix='.bin')
+            os.close(descriptor)
+            build_table(synthetic_dataset(options['synthetic']), temporary)
+            path = temporary
+        elif not os.path.exists(path):
+            self.stdout.write(self.style.WARNING("%s does not exist, use --synthetic." % path))
+            return
+        try:
+            table = IPRangeTable(path, cache_size=options['distinct'])
+            lookups = options['lookups']
+            addresses = ['.'.join(str(random.randrange(256)) for _ in range(4)) for _ in range(lookups)]
+            repeated = [addresses[index % options['distinct']] for index in range(lookups)]
+            self.stdout.write("Table of %s ranges, %s lookups" % (len(table), lookups))
+            for name, lookup, sample in (('binary search', table.search, addresses),
+                                         ('LRU cache', table.lookup, repeated)):
+                started = time.perf_counter()
+                for address in sample:
+                    lookup(address)
+                elapsed = time.perf_counter() - started
+                self.stdout.write("%-15s %12.0f lookups/s" % (name, lookups / elapsed))
+            table.close()
+        finally:
+            if temporary:
+                os.unlink(temporary)
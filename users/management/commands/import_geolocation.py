@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from users.geolocation import build_table
+
+
+class Command(BaseCommand):
+    """
+    Command is used to build the local IP geolocation table from a CSV file.
+    """
+    help = ("Build the geolocation table from a CSV file with a network column, or start_ip and end_ip columns, "
+            "and the country_code, country, region and city columns.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Path of the CSV file.")
+        parser.add_argument('--output', help="Path of the table, GEOLOCATION_TABLE by default.")
+
+    def handle(self, *args, **options):
+        output = options['output'] or settings.GEOLOCATION_TABLE
+        try:
+            with open(options['path'], encoding='utf-8', newline='') as stream:
+                counts = build_table(stream, output)
+        except (OSError, ValueError) as e:
+            raise CommandError(e)
+        self.stdout.write(self.style.SUCCESS("Wrote %s IPv4 and %s IPv6 ranges with %s locations to %s." % (
+            counts['ipv4'], counts['ipv6'], counts['locations'], output)))
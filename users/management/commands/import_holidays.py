@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from users.holidays import DEFAULT_DATASET, import_holidays
+
+
+class Command(BaseCommand):
+    """
+    Command is used to load a holiday dataset into the holiday calendar.
+    """
+    help = "Load holidays from a CSV file with the country,date,name,type columns, the bundled dataset by default."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=DEFAULT_DATASET, help="Path of the CSV file.")
+        parser.add_argument('--years', type=int, nargs='+',
+                            help="Years the fixed-date holidays are created for, this year and the next by default.")
+        parser.add_argument('--replace', action='store_true',
+                            help="Delete the stored holidays of the countries of the file first.")
+
+    def handle(self, *args, **options):
+        year = timezone.localdate().year
+        years = options['years'] or [year, year + 1]
+        try:
+            with open(options['path'], encoding='utf-8', newline='') as stream:
+                count = import_holidays(stream, years, replace=options['replace'])
+        except (OSError, ValueError) as e:
+            raise CommandError(e)
+        self.stdout.write(self.style.SUCCESS("Imported %s holidays for %s." % (
+            count, ', '.join(str(year) for year in years))))
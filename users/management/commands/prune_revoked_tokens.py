@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from users.revocation import prune_revoked_tokens
+
+
+class Command(BaseCommand):
+    """
+    Command is used to delete the revoked tokens which expired, they can not be used anyway.
+    """
+    help = "Delete the expired rows of the revoked token table."
+
+    def handle(self, *args, **options):
+        deleted = prune_revoked_tokens()
+        self.stdout.write(self.style.SUCCESS("Deleted %s expired revoked tokens." % deleted))
@@ -0,0 +1,25 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.holidays import recompute_holidays
+
+
+class Command(BaseCommand):
+    """
+    Command is used to refresh User.is_holiday from the holiday calendar, meant to run once a day.
+    """
+    help = "Set is_holiday and holiday_details of every user for a date, with one update per country."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Date as YYYY-MM-DD, today by default.")
+
+    def handle(self, *args, **options):
+        date = None
+        if options['date']:
+            try:
+                date = datetime.date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError("Invalid date %s." % options['date'])
+        updated = recompute_holidays(date)
+        self.stdout.write(self.style.SUCCESS("Updated %s users." % updated))
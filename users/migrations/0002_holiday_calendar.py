@@ -0,0 +1,60 @@
+# Generated by Django 3.0.8 on 2026-10-18 08:52
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def fill_country_codes(apps, schema_editor):
+    """
+    Copies the country code of the stored geolocation data of every user into User.country_code.
+    """
+    User = apps.get_model('users', 'User')
+    db = schema_editor.connection.alias
+    last_id = 0
+    while True:
+        users = list(User.objects.using(db).filter(id__gt=last_id).order_by('id')
+                     .only('id', 'geolocation_data')[:BATCH_SIZE])
+        if not users:
+            break
+        located = []
+        for user in users:
+            data = user.geolocation_data
+            country_code = data.get('country_code') if isinstance(data, dict) else None
+            if country_code:
+                user.country_code = country_code[:2].upper()
+                located.append(user)
+        User.objects.using(db).bulk_update(located, ['country_code'])
+        last_id = users[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Holiday',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+                ('modified_on', models.DateTimeField(auto_now=True)),
+                ('country', models.CharField(max_length=2)),
+                ('date', models.DateField()),
+                ('name', models.CharField(max_length=100)),
+                ('type', models.CharField(blank=True, max_length=50)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='country_code',
+            field=models.CharField(blank=True, db_index=True, max_length=2),
+        ),
+        migrations.AddConstraint(
+            model_name='holiday',
+            constraint=models.UniqueConstraint(fields=('country', 'date', 'name'), name='holiday_unique_country_date_name'),
+        ),
+        migrations.RunPython(fill_country_codes, migrations.RunPython.noop),
+    ]
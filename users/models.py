@@ -28,12 +28,50 @@ class User(AbstractUser, BaseModel):
     last_name = models.CharField(max_length=50, blank=True, null=True)
     email = models.EmailField(max_length=50, blank=False, unique=True)
     phone_number = models.CharField(max_length=14, blank=True, null=True)
+    country_code = models.CharField(max_length=2, blank=True, db_index=True)
     is_holiday = models.BooleanField(default=False)
     holiday_details = jsonfield.JSONField(blank=True, null=True)
     geolocation_data = jsonfield.JSONField(blank=True, null=True)
+    # Access tokens issued before this time are revoked, set when the password changes.
+    tokens_valid_after = models.DateTimeField(blank=True, null=True)
 
     def __str__(self):
         """Default object return value, it will return username
         :return self.username: Username of the user object.
         """
         return self.username
+
+
+class Holiday(BaseModel):
+    """
+    Holiday class is define for the keep the public holidays of every country, used to fill in
+    User.is_holiday without calling a holiday API.
+    :param BaseModel: Base class which has common attribute for the
+    application.
+    """
+    country = models.CharField(max_length=2)
+    date = models.DateField()
+    name = models.CharField(max_length=100)
+    type = models.CharField(max_length=50, blank=True)
+
+    def __str__(self):
+        return "%s %s %s" % (self.country, self.date, self.name)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['country', 'date', 'name'], name='holiday_unique_country_date_name'),
+        ]
+
+
+class RevokedToken(BaseModel):
+    """
+    RevokedToken class is define for the keep the ids of the access tokens revoked before they expire.
+    :param BaseModel: Base class which has common attribute for the
+    application.
+    """
+    jti = models.CharField(max_length=64, unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, blank=True, null=True, related_name='revoked_tokens')
+    expires_on = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.jti
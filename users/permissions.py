@@ -0,0 +1,10 @@
+from rest_framework import permissions
+
+
+class IsPostOrIsAuthenticated(permissions.BasePermission):
+
+    def has_permission(self, request, view):
+        # allow all POST requests, so anyone can sign up
+        if request.method == 'POST':
+            return True
+        return request.user and request.user.is_authenticated
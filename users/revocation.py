@@ -0,0 +1,231 @@
+import datetime
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+
+from users.models import RevokedToken, User
+
+"""
+    This module contains the revocation of JWTs before they expire.
+
+    A single token is revoked by storing its jti in RevokedToken until it expires. Every token of a user is
+    revoked by moving User.tokens_valid_after, which the authentication compares with the issue time of the
+    token. simplejwt does not put an iat claim in its tokens, so the issue time is exp minus the lifetime of
+    the token type, to the second: tokens issued in the second of the change are revoked too.
+
+    Checking a jti against the table would be a query per request, so every process keeps the revoked jtis in
+    a Bloom filter. A jti the filter does not contain was not revoked when it was last refreshed, which answers
+    almost every check in memory. The filter loads the rows added since its last refresh every
+    REVOCATION_REFRESH_INTERVAL seconds, and is rebuilt from the unexpired rows every
+    REVOCATION_REBUILD_INTERVAL seconds since a Bloom filter can not forget expired jtis. Only a jti the
+    filter contains is looked up in the table, to rule out a false positive.
+
+    Revocations are read from the primary database: a refresh reading a lagging replica would move past rows it
+    has not seen, and the cutoff of a user must be current for the authentication to refuse the old tokens.
+"""
+
+# Rows read again by an incremental refresh, for transactions committed out of order.
+REFRESH_OVERLAP = datetime.timedelta(seconds=30)
+
+
+class BloomFilter:
+    """
+    Set of strings answering membership with false positives but without false negatives.
+    """
+
+    def __init__(self, capacity, error_rate):
+        """
+        :param capacity: number of items the false positive rate is computed for.
+        :param error_rate: false positive rate with capacity items.
+        """
+        self.capacity = max(capacity, 1)
+        self.size = max(int(math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2)), 8)
+        self.hashes = max(int(round(self.size / self.capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(first + index * second) % self.size for index in range(self.hashes)]
+
+    def add(self, item):
+        for position in self.positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        bits = self.bits
+        return all(bits[position >> 3] & 1 << (position & 7) for position in self.positions(item))
+
+    def __len__(self):
+        return self.count
+
+
+class RevocationFilter:
+    """
+    Per-process Bloom filter of the revoked jtis, refreshed from the RevokedToken table.
+    """
+
+    def __init__(self, refresh_interval=None, rebuild_interval=None, capacity=None, error_rate=None):
+        """
+        :param refresh_interval: seconds between two loads of the new rows, REVOCATION_REFRESH_INTERVAL by default.
+        :param rebuild_interval: seconds between two rebuilds, REVOCATION_REBUILD_INTERVAL by default.
+        :param capacity: smallest capacity of the filter, REVOCATION_FILTER_CAPACITY by default.
+        :param error_rate: false positive rate of the filter, REVOCATION_FILTER_ERROR_RATE by default.
+        """
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.lock = threading.Lock()
+        self.bloom = None
+        self.refreshed_at = self.rebuilt_at = 0
+        self.since = None
+        self.checks = self.lookups = self.false_positives = 0
+
+    def setting(self, value, name):
+        return getattr(settings, name) if value is None else value
+
+    def rebuild(self):
+        """
+        Function is used to load every unexpired revoked jti into a new filter.
+        """
+        now = timezone.now()
+        revoked = RevokedToken.objects.using(DEFAULT_DB_ALIAS).filter(expires_on__gt=now)
+        jtis = list(revoked.values_list('jti', flat=True))
+        capacity = max(self.setting(self.capacity, 'REVOCATION_FILTER_CAPACITY'), 2 * len(jtis))
+        bloom = BloomFilter(capacity, self.setting(self.error_rate, 'REVOCATION_FILTER_ERROR_RATE'))
+        for jti in jtis:
+            bloom.add(jti)
+        self.bloom = bloom
+        self.since = now - REFRESH_OVERLAP
+        self.refreshed_at = self.rebuilt_at = time.monotonic()
+
+    def refresh(self):
+        """
+        Function is used to add the jtis revoked since the last refresh to the filter.
+        """
+        now = timezone.now()
+        revoked = RevokedToken.objects.using(DEFAULT_DB_ALIAS).filter(created_on__gte=self.since, expires_on__gt=now)
+        jtis = revoked.values_list('jti', flat=True)
+        for jti in jtis:
+            # Rows of the overlap were added by the previous refresh.
+            if jti not in self.bloom:
+                self.bloom.add(jti)
+        self.since = now - REFRESH_OVERLAP
+        self.refreshed_at = time.monotonic()
+
+    def update(self):
+        """
+        Function is used to refresh or rebuild the filter when it is due.
+        """
+        now = time.monotonic()
+        if self.bloom is not None and now - self.refreshed_at < self.setting(
+                self.refresh_interval, 'REVOCATION_REFRESH_INTERVAL'):
+            return
+        with self.lock:
+            if self.bloom is None or now - self.rebuilt_at >= self.setting(
+                    self.rebuild_interval, 'REVOCATION_REBUILD_INTERVAL') or len(self.bloom) > self.bloom.capacity:
+                self.rebuild()
+            elif now - self.refreshed_at >= self.setting(self.refresh_interval, 'REVOCATION_REFRESH_INTERVAL'):
+                self.refresh()
+
+    def add(self, jti):
+        if self.bloom is not None:
+            with self.lock:
+                self.bloom.add(jti)
+
+    def __contains__(self, jti):
+        """
+        Function is used to know if a jti is revoked, looking it up in the table only if the filter contains it.
+        :param jti: id of the token.
+        :return: True if the token is revoked.
+        """
+        self.update()
+        self.checks += 1
+        if jti not in self.bloom:
+            return False
+        self.lookups += 1
+        if RevokedToken.objects.using(DEFAULT_DB_ALIAS).filter(jti=jti).exists():
+            return True
+        self.false_positives += 1
+        return False
+
+    def stats(self):
+        return {'entries': len(self.bloom) if self.bloom is not None else 0, 'checks': self.checks,
+                'lookups': self.lookups, 'false_positives': self.false_positives}
+
+    def clear(self):
+        with self.lock:
+            self.bloom = None
+            self.checks = self.lookups = self.false_positives = 0
+
+
+revoked_jtis = RevocationFilter()
+
+
+def issued_at(validated_token):
+    """
+    Function is used to get the issue time of a token.
+    :param validated_token: validated token object.
+    :return: timestamp in seconds, or None if the token has no exp claim.
+    """
+    if 'iat' in validated_token:
+        return validated_token['iat']
+    if 'exp' not in validated_token:
+        return None
+    return validated_token['exp'] - validated_token.lifetime.total_seconds()
+
+
+def is_revoked(validated_token, user):
+    """
+    Function is used to know if a token was revoked, alone or with every token of its user.
+    :param validated_token: validated token object.
+    :param user: User object the token resolves to, read from the primary database.
+    :return: True if the token is revoked.
+    """
+    if user.tokens_valid_after is not None:
+        issued = issued_at(validated_token)
+        if issued is None or issued <= math.floor(user.tokens_valid_after.timestamp()):
+            return True
+    jti = validated_token.get(api_settings.JTI_CLAIM)
+    return jti is not None and jti in revoked_jtis
+
+
+def revoke_token(validated_token, user=None):
+    """
+    Function is used to revoke a single token until it expires.
+    :param validated_token: validated token object.
+    :param user: User object the token resolves to.
+    :return: RevokedToken object.
+    """
+    expires_on = datetime.datetime.fromtimestamp(validated_token['exp'], tz=datetime.timezone.utc)
+    revoked, created = RevokedToken.objects.get_or_create(jti=validated_token[api_settings.JTI_CLAIM], defaults={
+        'user': user, 'expires_on': expires_on})
+    revoked_jtis.add(revoked.jti)
+    return revoked
+
+
+def revoke_user_tokens(user_id):
+    """
+    Function is used to revoke every token issued to a user until now. The cached authentication of the user
+    holds the previous cutoff, so callers invalidate it too.
+    :param user_id: id of the user.
+    """
+    User.objects.filter(id=user_id).update(tokens_valid_after=timezone.now())
+
+
+def prune_revoked_tokens():
+    """
+    Function is used to delete the revoked tokens which expired.
+    :return: number of deleted rows.
+    """
+    deleted, rows = RevokedToken.objects.filter(expires_on__lte=timezone.now()).delete()
+    return deleted
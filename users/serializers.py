@@ -1,13 +1,21 @@
 from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+import constants
+from fieldset_utils import SparseFieldsetMixin
 from users.models import User
+from users.revocation import is_revoked
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     serializer to handle turning our `User` object into
     something that can be JSONified and sent to the client
     """
+    expandable_fields = ('holiday_details', 'geolocation_data')
     password = serializers.CharField(write_only=True)
 
     def create(self, validated_data):
@@ -55,3 +63,24 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         data['user_id'] = self.user.id
         data['username'] = self.user.username
         return data
+
+
+class RevocableTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    serializer refusing to refresh a revoked refresh token.
+    """
+
+    def validate(self, attrs):
+        """
+        function is used for check the refresh token is not revoked before refreshing it.
+        :param attrs: get refresh token
+        :return: dictionary with the new access token
+        """
+        try:
+            refresh = RefreshToken(attrs['refresh'])
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+        user = User.objects.filter(**{api_settings.USER_ID_FIELD: refresh.get(api_settings.USER_ID_CLAIM)}).first()
+        if user is None or is_revoked(refresh, user):
+            raise InvalidToken(constants.TOKEN_REVOKED)
+        return super().validate(attrs)
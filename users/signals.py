@@ -1,9 +1,11 @@
 from django.dispatch import receiver
-from django.template.loader import render_to_string
-from django_rest_passwordreset.signals import reset_password_token_created
+from django_rest_passwordreset.signals import post_password_reset, reset_password_token_created
 
 import constants
 import utils
+from mailer.outbox import render_email
+from users.authentication import invalidate_user
+from users.revocation import revoke_user_tokens
 
 
 @receiver(reset_password_token_created)
@@ -25,6 +27,20 @@ def password_reset_token_created(sender, instance, reset_password_token, *args,
     }
 
     # render email html
-    email_html_message = render_to_string('email_templates/user_reset_password.html', context)
+    email_html_message = render_email('email_templates/user_reset_password.html', context)
     utils.send_email(subject="Password Reset for WallApp", recipient=[reset_password_token.user.email],
                      body=email_html_message)
+
+
+@receiver(post_password_reset)
+def password_reset_done(sender, user, *args, **kwargs):
+    """
+    Revokes the tokens of a user whose password was reset.
+    :param sender: View Class that sent the signal
+    :param user: User whose password was reset
+    :param args:
+    :param kwargs:
+    :return:
+    """
+    revoke_user_tokens(user.id)
+    invalidate_user(user.id)
@@ -0,0 +1,109 @@
+import datetime
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django_rest_passwordreset.signals import post_password_reset
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.authentication import CachedJWTAuthentication, TokenCache, token_cache
+from users.models import User
+from users.revocation import revoked_jtis
+from users.views import ChangePasswordView, UserDetails
+
+
+class TestCachedJWTAuthentication(TestCase):
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.user = User.objects.create_user(username="token", first_name="token", email="token@gmail.com",
+                                             password="Admin@123")
+        self.token = str(AccessToken.for_user(self.user))
+        self.authentication = CachedJWTAuthentication()
+        token_cache.clear()
+        # Loads the revocation filter, which would add a query to the first authentication.
+        revoked_jtis.clear()
+        revoked_jtis.update()
+
+    def tearDown(self):
+        token_cache.clear()
+
+    def request(self, method='get', url='/', **kwargs):
+        return getattr(self.factory, method)(url, HTTP_AUTHORIZATION="Bearer %s" % self.token, **kwargs)
+
+    def test_token_is_verified_once(self):
+        with self.assertNumQueries(1):
+            user, validated_token = self.authentication.authenticate(self.request())
+        self.assertEqual(user, self.user)
+        with self.assertNumQueries(0):
+            cached_user, cached_token = self.authentication.authenticate(self.request())
+        self.assertEqual(cached_user, self.user)
+        self.assertIsNot(cached_user, user)
+        self.assertEqual(cached_token['user_id'], self.user.id)
+        self.assertEqual(token_cache.stats(), {'entries': 1, 'hits': 1, 'misses': 1})
+        self.assertIsNone(self.authentication.authenticate(self.factory.get('/')))
+
+    def test_entries_expire(self):
+        cache = TokenCache(timeout=0)
+        cache.set(self.token, self.user, AccessToken(self.token), cache.get_generation(self.user.id))
+        self.assertIsNone(cache.get(self.token))
+        self.assertEqual(cache.stats()['entries'], 0)
+
+        cache = TokenCache(timeout=60, max_entries=1)
+        other = str(AccessToken.for_user(User.objects.create(username="other", email="other@gmail.com")))
+        for raw_token in (self.token, other):
+            cache.set(raw_token, self.user, AccessToken(raw_token), cache.get_generation(self.user.id))
+        self.assertIsNone(cache.get(self.token))
+        self.assertIsNotNone(cache.get(other))
+
+    def test_account_changes_invalidate(self):
+        self.authentication.authenticate(self.request())
+        url = reverse('user_details', kwargs={'pk': self.user.id})
+        response = UserDetails.as_view()(self.request('put', url, data={"first_name": "renamed"}), self.user.id)
+        self.assertEqual(response.status_code, 201)
+        user, validated_token = self.authentication.authenticate(self.request())
+        self.assertEqual(user.first_name, "renamed")
+
+        response = ChangePasswordView.as_view()(self.request('put', reverse('change_pass'),
+                                                             data={"password": "Changed@123"}))
+        self.assertEqual(response.status_code, 201)
+        # The password change revokes the token, a token issued later resolves to the new password.
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.authenticate(self.request())
+        token = AccessToken.for_user(self.user)
+        # Issued in a later second than the password reset below, which would revoke it too otherwise.
+        token.set_exp(from_time=timezone.now() + datetime.timedelta(seconds=2))
+        self.token = str(token)
+        with self.assertNumQueries(1):
+            user, validated_token = self.authentication.authenticate(self.request())
+        self.assertTrue(user.check_password("Changed@123"))
+
+        self.authentication.authenticate(self.request())
+        post_password_reset.send(sender=self.__class__, user=self.user)
+        with self.assertNumQueries(1):
+            self.authentication.authenticate(self.request())
+
+    def test_invalidation_reaches_other_processes(self):
+        # Two processes, whose generations are in the same cache.
+        first, second = TokenCache(timeout=60), TokenCache(timeout=60)
+        second.set(self.token, self.user, AccessToken(self.token), second.get_generation(self.user.id))
+        first.invalidate(self.user.id)
+        self.assertIsNone(second.get(self.token))
+
+    def test_deleted_user_is_refused(self):
+        staff = User.objects.create_user(username="staff", email="staff@gmail.com", password="Admin@123")
+        self.authentication.authenticate(self.request())
+        url = reverse('user_details', kwargs={'pk': self.user.id})
+        request = self.factory.delete(url, HTTP_AUTHORIZATION="Bearer %s" % AccessToken.for_user(staff))
+        self.assertEqual(UserDetails.as_view()(request, self.user.id).status_code, 200)
+        self.assertEqual(UserDetails.as_view()(self.request('get', url), self.user.id).status_code, 401)
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_auth', '--requests', '20', stdout=out)
+        self.assertIn("JWTAuthentication", out.getvalue())
+        self.assertIn("CachedJWTAuthentication", out.getvalue())
@@ -0,0 +1,111 @@
+import io
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from users.geolocation import IPRangeTable, InvalidTable, build_table, client_ip, geolocate
+from users.holidays import cached_holidays
+from users.models import User, Holiday
+from users.views import UsersList
+
+DATASET = """start_ip,end_ip,network,country_code,country,region,city
+1.0.0.0,1.0.0.255,,au,Australia,Queensland,Brisbane
+,,203.0.113.0/24,IN,India,Gujarat,Surat
+203.0.114.0,203.0.114.10,,IN,India,Gujarat,Surat
+,,2001:db8::/32,FR,France,Ile-de-France,Paris
+"""
+
+
+class TestGeolocation(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "ip_ranges.bin")
+        self.counts = build_table(io.StringIO(DATASET), self.path)
+        self.factory = APIRequestFactory()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_lookup(self):
+        self.assertEqual(self.counts, {'ipv4': 3, 'ipv6': 1, 'locations': 3})
+        table = IPRangeTable(self.path, cache_size=10)
+        self.assertEqual(table.search("1.0.0.0")["city"], "Brisbane")
+        self.assertEqual(table.search("1.0.0.255")["country_code"], "AU")
+        self.assertEqual(table.search("203.0.114.10")["country_code"], "IN")
+        self.assertEqual(table.search("::ffff:203.0.113.9")["country_code"], "IN")
+        self.assertEqual(table.search("2001:db8::1")["country_code"], "FR")
+        for missing in ("0.255.255.255", "1.0.1.0", "203.0.114.11", "255.255.255.255", "::1", "not an ip"):
+            self.assertIsNone(table.search(missing))
+        table.lookup("1.0.0.1")
+        table.lookup("1.0.0.1")
+        self.assertEqual(table.lookup.cache_info().hits, 1)
+        table.close()
+
+    def test_invalid_datasets(self):
+        with self.assertRaisesMessage(InvalidTable, "overlaps"):
+            build_table(io.StringIO("network,country_code\n10.0.0.0/8,US\n10.1.0.0/16,CA\n"), self.path)
+        with self.assertRaisesMessage(InvalidTable, "Line 2"):
+            build_table(io.StringIO("start_ip,end_ip,country_code\n10.0.0.9,10.0.0.1,US\n"), self.path)
+        with self.assertRaisesMessage(InvalidTable, "country code"):
+            build_table(io.StringIO("network,country_code\n10.0.0.0/8,USA\n"), self.path)
+        with open(self.path, 'wb') as stream:
+            stream.write(b"x" * 64)
+        with self.assertRaises(InvalidTable):
+            IPRangeTable(self.path)
+
+    @override_settings(GEOLOCATION_TRUSTED_PROXIES=2)
+    def test_client_ip_behind_proxies(self):
+        request = self.factory.get("/", HTTP_X_FORWARDED_FOR="6.6.6.6, 203.0.113.9, 10.0.0.2",
+                                   REMOTE_ADDR="10.0.0.3")
+        self.assertEqual(client_ip(request), "203.0.113.9")
+        request = self.factory.get("/", REMOTE_ADDR="10.0.0.3")
+        self.assertEqual(client_ip(request), "10.0.0.3")
+        with self.settings(GEOLOCATION_TRUSTED_PROXIES=0):
+            request = self.factory.get("/", HTTP_X_FORWARDED_FOR="6.6.6.6", REMOTE_ADDR="10.0.0.3")
+            self.assertEqual(client_ip(request), "10.0.0.3")
+        request = self.factory.get("/", HTTP_X_FORWARDED_FOR="unknown, 10.0.0.2")
+        self.assertEqual(client_ip(request), "")
+
+    def test_signup_is_located(self):
+        cached_holidays.cache_clear()
+        Holiday.objects.create(country="IN", date=timezone.localdate(), name="Diwali")
+        with self.settings(GEOLOCATION_TABLE=self.path):
+            self.assertEqual(geolocate("203.0.113.9"), {'ip_address': '203.0.113.9', 'country_code': 'IN',
+                                                        'country': 'India', 'region': 'Gujarat', 'city': 'Surat'})
+            request = self.factory.post(reverse('users_list'), REMOTE_ADDR="203.0.113.9", data={
+                "first_name": "located", "username": "located", "email": "located@gmail.com",
+                "password": "Admin@123"})
+            response = UsersList.as_view()(request)
+        self.assertEqual(response.status_code, 201)
+        user = User.objects.get(username="located")
+        self.assertEqual((user.country_code, user.geolocation_data["city"]), ("IN", "Surat"))
+        self.assertTrue(user.is_holiday)
+        self.assertEqual(user.holiday_details[0]["name"], "Diwali")
+
+        with self.settings(GEOLOCATION_TABLE=os.path.join(self.directory, "missing.bin")):
+            self.assertEqual(geolocate("203.0.113.9"), {})
+
+    def test_commands(self):
+        source = os.path.join(self.directory, "ranges.csv")
+        with open(source, 'w') as stream:
+            stream.write(DATASET)
+        output = os.path.join(self.directory, "imported.bin")
+        out = StringIO()
+        call_command('import_geolocation', source, output=output, stdout=out)
+        self.assertIn("3 IPv4 and 1 IPv6 ranges", out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('import_geolocation', os.path.join(self.directory, "missing.csv"), stdout=StringIO())
+
+        out = StringIO()
+        call_command('benchmark_geolocation', synthetic=100, lookups=200, distinct=10, stdout=out)
+        self.assertIn("Table of 100 ranges", out.getvalue())
+        self.assertIn("LRU cache", out.getvalue())
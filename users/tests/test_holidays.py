@@ -0,0 +1,87 @@
+import datetime
+import io
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from users.holidays import cached_holidays, holidays_on, import_holidays, invalidate_calendar, recompute_holidays
+from users.models import User, Holiday
+
+
+class TestHolidays(TestCase):
+
+    def setUp(self):
+        cached_holidays.cache_clear()
+
+    def create_user(self, username, country_code, **kwargs):
+        return User.objects.create(username=username, first_name=username, email="%s@gmail.com" % username,
+                                   country_code=country_code, **kwargs)
+
+    def test_import_bundled_dataset(self):
+        out = StringIO()
+        call_command('import_holidays', years=[2020], stdout=out)
+        self.assertIn("for 2020", out.getvalue())
+        self.assertTrue(Holiday.objects.filter(country="IN", date=datetime.date(2020, 8, 15)).exists())
+        count = Holiday.objects.count()
+        call_command('import_holidays', years=[2020], stdout=StringIO())
+        self.assertEqual(Holiday.objects.count(), count)
+
+        with self.assertRaisesMessage(CommandError, "No such file"):
+            call_command('import_holidays', '/missing.csv', stdout=StringIO())
+
+    def test_import_replaces_and_validates(self):
+        import_holidays(io.StringIO("country,date,name\nin,01-26,Republic Day\nIN,2020-11-14,Diwali\n"), [2020, 2021])
+        self.assertEqual(Holiday.objects.filter(country="IN").count(), 3)
+        import_holidays(io.StringIO("country,date,name\nIN,2020-11-14,Diwali\n"), [2020], replace=True)
+        self.assertEqual(list(Holiday.objects.values_list('name', flat=True)), ["Diwali"])
+        with self.assertRaisesMessage(ValueError, "Line 2"):
+            import_holidays(io.StringIO("country,date,name\nIN,14/11/2020,Diwali\n"), [2020])
+
+    def test_lookup_is_cached(self):
+        date = datetime.date(2020, 11, 14)
+        Holiday.objects.create(country="IN", date=date, name="Diwali", type="National")
+        with self.assertNumQueries(1):
+            details = holidays_on("IN", date)
+            holidays_on("IN", date)
+        self.assertEqual(details, ({'name': 'Diwali', 'country': 'IN', 'type': 'National', 'date': '11/14/2020',
+                                    'date_year': '2020', 'date_month': '11', 'date_day': '14',
+                                    'week_day': 'Saturday'},))
+        self.assertEqual(holidays_on("US", date), ())
+
+        # Another process imported a dataset.
+        Holiday.objects.create(country="US", date=date, name="Veterans Day observed")
+        self.assertEqual(holidays_on("US", date), ())
+        invalidate_calendar()
+        self.assertEqual([holiday["name"] for holiday in holidays_on("us", date)], ["Veterans Day observed"])
+
+    def test_recompute_holidays(self):
+        date = datetime.date(2020, 8, 15)
+        Holiday.objects.create(country="IN", date=date, name="Independence Day")
+        indian = self.create_user("indian", "IN")
+        american = self.create_user("american", "US", is_holiday=True, holiday_details=[{"name": "Old"}])
+        unlocated = self.create_user("unlocated", "")
+        with self.assertNumQueries(6):
+            self.assertEqual(recompute_holidays(date), 2)
+        indian.refresh_from_db()
+        american.refresh_from_db()
+        unlocated.refresh_from_db()
+        self.assertTrue(indian.is_holiday)
+        self.assertEqual(indian.holiday_details[0]["name"], "Independence Day")
+        self.assertEqual((american.is_holiday, american.holiday_details), (False, []))
+        self.assertFalse(unlocated.is_holiday)
+
+        out = StringIO()
+        call_command('recompute_holidays', date="2020-08-16", stdout=out)
+        self.assertIn("Updated 1 users.", out.getvalue())
+        with self.assertRaisesMessage(CommandError, "Invalid date"):
+            call_command('recompute_holidays', date="yesterday", stdout=StringIO())
+
+    def test_recompute_imports_a_missing_year(self):
+        indian = self.create_user("indian", "IN")
+        with self.assertLogs('django', 'WARNING'):
+            self.assertEqual(recompute_holidays(datetime.date(2031, 8, 15)), 1)
+        indian.refresh_from_db()
+        self.assertEqual(indian.holiday_details[0]["name"], "Independence Day")
+        self.assertEqual(set(Holiday.objects.dates('date', 'year')), {datetime.date(2031, 1, 1)})
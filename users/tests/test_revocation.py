@@ -0,0 +1,124 @@
+import datetime
+import uuid
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+import constants
+from users.authentication import token_cache
+from users.models import RevokedToken, User
+from users.revocation import BloomFilter, RevocationFilter, revoked_jtis
+from users.views import ChangePasswordView, CustomTokenRefreshView, RevokeTokenView, UserDetails
+
+
+class TestBloomFilter(TestCase):
+
+    def test_membership(self):
+        bloom = BloomFilter(1000, 0.01)
+        items = [str(uuid.uuid4()) for _ in range(1000)]
+        for item in items:
+            bloom.add(item)
+        self.assertTrue(all(item in bloom for item in items))
+        false_positives = sum(str(uuid.uuid4()) in bloom for _ in range(10000))
+        self.assertLess(false_positives, 300)
+        self.assertEqual(len(bloom), 1000)
+
+
+class TestRevocation(TestCase):
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.user = User.objects.create_user(username="revoked", first_name="revoked", email="revoked@gmail.com",
+                                             password="Admin@123")
+        self.detail_url = reverse('user_details', kwargs={'pk': self.user.id})
+        token_cache.clear()
+        revoked_jtis.clear()
+
+    def tearDown(self):
+        token_cache.clear()
+        revoked_jtis.clear()
+
+    def access_token(self, issued=0):
+        """
+        :param issued: seconds between now and the issue time of the token.
+        """
+        token = AccessToken.for_user(self.user)
+        token.set_exp(from_time=timezone.now() + datetime.timedelta(seconds=issued))
+        return str(token)
+
+    def get_user(self, token):
+        request = self.factory.get(self.detail_url, HTTP_AUTHORIZATION="Bearer %s" % token)
+        return UserDetails.as_view()(request, self.user.id)
+
+    def test_revoke_endpoint(self):
+        token = self.access_token()
+        refresh = RefreshToken.for_user(self.user)
+        self.assertEqual(self.get_user(token).status_code, 200)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_user(token).status_code, 200)
+
+        other = RefreshToken.for_user(User.objects.create(username="other", email="other@gmail.com"))
+        request = self.factory.post(reverse('token_revoke'), data={"refresh": str(other)},
+                                    HTTP_AUTHORIZATION="Bearer %s" % token)
+        response = RevokeTokenView.as_view()(request)
+        self.assertEqual((response.status_code, response.data["message"]), (400, constants.INVALID_REFRESH_TOKEN))
+
+        request = self.factory.post(reverse('token_revoke'), data={"refresh": str(refresh)},
+                                    HTTP_AUTHORIZATION="Bearer %s" % token)
+        response = RevokeTokenView.as_view()(request)
+        self.assertEqual((response.status_code, response.data["message"]), (200, constants.REVOKE_TOKEN_SUCCESS))
+        self.assertEqual(RevokedToken.objects.filter(user=self.user).count(), 2)
+
+        response = self.get_user(token)
+        self.assertEqual((response.status_code, response.data["code"]), (401, 'token_revoked'))
+        self.assertEqual(self.get_user(self.access_token(issued=1)).status_code, 200)
+        request = self.factory.post(reverse('token_refresh'), data={"refresh": str(refresh)})
+        self.assertEqual(CustomTokenRefreshView.as_view()(request).status_code, 401)
+
+    def test_password_change_revokes_older_tokens(self):
+        old = self.access_token(issued=-10)
+        refresh = RefreshToken.for_user(self.user)
+        refresh.set_exp(from_time=timezone.now() - datetime.timedelta(seconds=10))
+        self.assertEqual(self.get_user(old).status_code, 200)
+
+        request = self.factory.put(reverse('change_pass'), data={"password": "Changed@123"},
+                                   HTTP_AUTHORIZATION="Bearer %s" % old)
+        self.assertEqual(ChangePasswordView.as_view()(request).status_code, 201)
+        self.assertEqual(self.get_user(old).status_code, 401)
+        request = self.factory.post(reverse('token_refresh'), data={"refresh": str(refresh)})
+        self.assertEqual(CustomTokenRefreshView.as_view()(request).status_code, 401)
+        # Tokens issued after the change, a second later at least, are accepted.
+        self.assertEqual(self.get_user(self.access_token(issued=1)).status_code, 200)
+
+    def test_filter_refresh(self):
+        revoked = RevocationFilter(refresh_interval=0, rebuild_interval=3600, capacity=10, error_rate=0.01)
+        expires_on = timezone.now() + datetime.timedelta(minutes=5)
+        RevokedToken.objects.create(jti="first", expires_on=expires_on)
+        RevokedToken.objects.create(jti="expired", expires_on=timezone.now() - datetime.timedelta(minutes=5))
+        with self.assertNumQueries(1):
+            self.assertNotIn("unknown", revoked)
+        self.assertEqual(revoked.stats()['entries'], 1)
+
+        # Revoked by an other process since the last refresh.
+        RevokedToken.objects.create(jti="second", expires_on=expires_on)
+        with self.assertNumQueries(2):
+            self.assertIn("second", revoked)
+        self.assertIn("first", revoked)
+        self.assertEqual(revoked.stats()['entries'], 2)
+
+        revoked.refresh_interval = 3600
+        with self.assertNumQueries(0):
+            self.assertNotIn("unknown", revoked)
+
+    def test_prune_command(self):
+        RevokedToken.objects.create(jti="live", expires_on=timezone.now() + datetime.timedelta(minutes=5))
+        RevokedToken.objects.create(jti="expired", expires_on=timezone.now() - datetime.timedelta(minutes=5))
+        out = StringIO()
+        call_command('prune_revoked_tokens', stdout=out)
+        self.assertIn("Deleted 1 expired revoked tokens.", out.getvalue())
+        self.assertEqual(list(RevokedToken.objects.values_list('jti', flat=True)), ["live"])
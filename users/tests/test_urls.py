@@ -1,7 +1,7 @@
 from django.test import SimpleTestCase
 from django.urls import reverse, resolve
-from rest_framework_simplejwt.views import TokenRefreshView,token_verify
-from users.views import CustomTokenObtainPairView,UsersList,UserDetails
+from rest_framework_simplejwt.views import token_verify
+from users.views import CustomTokenObtainPairView,CustomTokenRefreshView,RevokeTokenView,UsersList,UserDetails
 
 
 class TestUrls(SimpleTestCase):
@@ -12,7 +12,11 @@ class TestUrls(SimpleTestCase):
 
     def test_token_refresh_url_is_resolved(self):
         url = reverse("token_refresh")
-        self.assertEquals(resolve(url).func.view_class, TokenRefreshView)
+        self.assertEquals(resolve(url).func.view_class, CustomTokenRefreshView)
+
+    def test_token_revoke_url_is_resolved(self):
+        url = reverse("token_revoke")
+        self.assertEquals(resolve(url).func.view_class, RevokeTokenView)
 
     def test_token_verify_url_is_resolved(self):
         url = reverse("token_verify")
@@ -1,4 +1,6 @@
+from django.db import connection
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 
@@ -6,6 +8,8 @@ from rest_framework.test import APIRequestFactory, force_authenticate
 from rest_framework_simplejwt.views import TokenRefreshView
 
 import constants
+from jobs.models import Job
+from mailer.models import OutboxEmail
 from users.models import User
 from users.views import CustomTokenObtainPairView, UsersList, UserDetails
 
@@ -69,6 +73,88 @@ class TestViews(TestCase):
         self.assertEqual(response2.data["data"]["email"], obj.email)
         self.assertEqual(response2.data["data"]["phone_number"], obj.phone_number)
 
+    def get_users(self, **params):
+        request = self.factory.get(self.users_list_url, data=params)
+        force_authenticate(request, user=self.user)
+        return UsersList.as_view()(request)
+
+    def test_user_sparse_fieldset(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get_users(fields="id,username")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data["data"][0]), {"id", "username"})
+        self.assertNotIn('"holiday_details"', queries[0]["sql"])
+
+        response = self.get_users(fields="id", expand="geolocation_data")
+        self.assertEqual(set(response.data["data"][0]), {"id", "geolocation_data"})
+
+        response = self.get_users(fields="password")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["message"], constants.INVALID_FIELDSET)
+
+        detail_url = reverse('user_details', kwargs={'pk': self.user.id})
+        request = self.factory.get(detail_url, data={"fields": "email"})
+        force_authenticate(request, user=self.user)
+        response = UserDetails.as_view()(request, self.user.id)
+        self.assertEqual(response.data["data"], {"email": self.user.email})
+
+    def test_user_list_pages_and_projection(self):
+        for index in range(3):
+            self.create_user(username="page_user%s" % index, first_name="page", email="page%s@gmail.com" % index)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get_users(page_size=2)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([user["username"] for user in response.data["data"]], ["Admin12", "page_user0"])
+        self.assertNotIn("holiday_details", response.data["data"][0])
+        self.assertNotIn("geolocation_data", response.data["data"][0])
+        self.assertNotIn('"geolocation_data"', queries[0]["sql"])
+        self.assertTrue(response.data["next"])
+
+        response = self.get_users(page_size=2, cursor=response.data["next_cursor"], expand="holiday_details")
+        self.assertEqual([user["username"] for user in response.data["data"]], ["page_user1", "page_user2"])
+        self.assertIn("holiday_details", response.data["data"][0])
+        self.assertFalse(response.data["next"])
+        self.assertTrue(response.data["previous"])
+
+        response = self.get_users(sort_by="password")
+        self.assertEqual(response.data["message"], constants.INVALID_SORT_FIELD)
+        response = self.get_users(cursor="not-a-cursor")
+        self.assertEqual(response.data["message"], constants.INVALID_CURSOR)
+
+    def test_user_list_search_and_permission(self):
+        self.create_user(username="searcher", first_name="search", email="zeta@gmail.com")
+        self.create_user(username="other", first_name="other", email="search@gmail.com")
+        response = self.get_users(search="sea", sort_by="username", order="desc")
+        self.assertEqual([user["username"] for user in response.data["data"]], ["searcher", "other"])
+        self.assertFalse(self.get_users(search="earch").data["data"])
+
+        response = UsersList.as_view()(self.factory.get(self.users_list_url))
+        self.assertEqual(response.status_code, 401)
+
+    def test_user_detail_conditional_get(self):
+        detail_url = reverse('user_details', kwargs={'pk': self.user.id})
+        request = self.factory.get(detail_url)
+        force_authenticate(request, user=self.user)
+        response1 = UserDetails.as_view()(request, self.user.id)
+        self.assertEqual(response1.status_code, 200)
+
+        request = self.factory.get(detail_url, HTTP_IF_NONE_MATCH=response1["ETag"])
+        force_authenticate(request, user=self.user)
+        response2 = UserDetails.as_view()(request, self.user.id)
+        self.assertEqual(response2.status_code, 304)
+
+        request = self.factory.get(detail_url, HTTP_IF_MODIFIED_SINCE=response1["Last-Modified"])
+        force_authenticate(request, user=self.user)
+        response3 = UserDetails.as_view()(request, self.user.id)
+        self.assertEqual(response3.status_code, 304)
+
+        self.user.first_name = "changed"
+        self.user.save()
+        request = self.factory.get(detail_url, HTTP_IF_NONE_MATCH=response1["ETag"])
+        force_authenticate(request, user=self.user)
+        response4 = UserDetails.as_view()(request, self.user.id)
+        self.assertEqual(response4.status_code, 200)
+
     def test_success_user_success_post_data(self):
         request = self.factory.post(self.users_list_url, data=self.data)
         response = UsersList.as_view()(request)
@@ -80,6 +166,10 @@ class TestViews(TestCase):
         self.assertEqual(response.data["data"]["last_name"], self.data.get("last_name"))
         self.assertEqual(response.data["data"]["email"], self.data.get("email"))
         self.assertEqual(response.data["data"]["phone_number"], self.data.get("phone_number"))
+        email = OutboxEmail.objects.get()
+        self.assertEqual((email.subject, email.recipients), ("WELCOME!", [self.data.get("email")]))
+        self.assertIn(self.data.get("username"), email.html_body)
+        self.assertEqual(list(Job.objects.values_list('name', flat=True)), ["mailer.send_outbox"])
 
     def test_success_user_update_data(self):
         obj = self.create_user(username="update_user", first_name="update_name", email="update@gmail.com",
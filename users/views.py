@@ -1,54 +1,132 @@
 import logging
 
-from django.template.loader import render_to_string
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
 from rest_framework.views import APIView
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from drf_yasg.utils import swagger_auto_schema
 
-import importlib
-import requests
-import datetime
 import constants
-import utils
-from response_utils import ApiResponse, get_error_message
+from fieldset_utils import Fieldset, InvalidFieldset
+from pagination_utils import CursorPaginator, InvalidCursor, get_page_size
+from response_utils import ApiResponse, get_error_message, make_etag, not_modified_response
+from users.authentication import invalidate_user
+from users.emails import send_welcome_email
+from users.geolocation import client_ip, geolocate
+from users.holidays import holidays_on
 from users.models import User
-from users.serializers import UserSerializer, CustomTokenObtainPairSerializer
-from wall_app.settings import settings
+from users.permissions import IsPostOrIsAuthenticated
+from users.revocation import revoke_token, revoke_user_tokens
+from users.serializers import UserSerializer, CustomTokenObtainPairSerializer, RevocableTokenRefreshSerializer
 
 logger = logging.getLogger('django')
-holiday_api_key = settings.HOLIDAY_APIKEY
-geolocation_api_key = settings.GEOLOCATION_APIKEY
+
+# Fields a client can sort the user list by.
+USER_SORT_FIELDS = ('id', 'username', 'email', 'created_on')
 
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     """
     Custom token class for add user info with token response.
     """
+    throttle_scope = 'login'
     serializer_class = CustomTokenObtainPairSerializer
 
 
+class CustomTokenRefreshView(TokenRefreshView):
+    """
+    Token refresh class refusing revoked refresh tokens.
+    """
+    serializer_class = RevocableTokenRefreshSerializer
+
+
+class RevokeTokenView(APIView):
+    """
+    Class is used for revoke the access token of the request, and the refresh token given with it.
+    """
+    permission_classes = [IsAuthenticated, ]
+
+    @swagger_auto_schema(operation_description="API is used to revoke the access token of the request before it "
+                                               "expires. A refresh token of the same user can be sent as refresh "
+                                               "to revoke it too.")
+    def post(self, request):
+        """
+        Function is used for revoke tokens of the user.
+        :param request: request header with required info.
+        :return: 200 ok or error message
+        """
+        refresh = None
+        if request.data.get('refresh'):
+            try:
+                refresh = RefreshToken(request.data['refresh'])
+            except TokenError as e:
+                logger.exception(e)
+            if refresh is None or refresh.get(api_settings.USER_ID_CLAIM) != request.user.id:
+                api_response = ApiResponse(status=0, message=constants.INVALID_REFRESH_TOKEN,
+                                           http_status=status.HTTP_400_BAD_REQUEST)
+                return api_response.create_response()
+        with transaction.atomic():
+            revoke_token(request.auth, request.user)
+            if refresh is not None:
+                revoke_token(refresh, request.user)
+        api_response = ApiResponse(status=1, message=constants.REVOKE_TOKEN_SUCCESS, http_status=status.HTTP_200_OK)
+        return api_response.create_response()
+
+
 class UsersList(APIView):
     """
     Class is used for list all the user or create new user.
     """
-    authentication_classes = []
-    permission_classes = []
+    permission_classes = [IsPostOrIsAuthenticated]
+    throttle_scope = 'signup'
 
-    @swagger_auto_schema(operation_description="Api is used to get all user detail"
-                                               "from the application",
+    @swagger_auto_schema(operation_description="Api is used to get a page of users from the application. "
+                                               "holiday_details and geolocation_data are only sent with ?expand=, "
+                                               "and ?search= keeps the users whose username or email starts "
+                                               "with it.",
                          responses={200: UserSerializer()})
     def get(self, request):
         """
-        Function is used to get all the user list.
+        Function is used to get a page of the user list with keyset pagination.
         :param request: request header with required info.
-        :return: user list
+        :return: user list with next and previous cursor tokens
         """
-        users = User.objects.all()
-        serializer = UserSerializer(users, many=True)
+        try:
+            fieldset = Fieldset.from_query(UserSerializer, request.query_params, expand_by_default=False)
+        except InvalidFieldset as e:
+            logger.exception(e)
+            api_response = ApiResponse(status=0, message=constants.INVALID_FIELDSET,
+                                       http_status=status.HTTP_400_BAD_REQUEST)
+            return api_response.create_response()
+        sort_by = request.query_params.get('sort_by', 'id')
+        if sort_by not in USER_SORT_FIELDS:
+            api_response = ApiResponse(status=0, message=constants.INVALID_SORT_FIELD,
+                                       http_status=status.HTTP_400_BAD_REQUEST)
+            return api_response.create_response()
+        users = fieldset.shape(User.objects.all(), always=('id', sort_by))
+        search = request.query_params.get('search', '').strip()
+        if search:
+            # startswith is a LIKE 'prefix%' query, which the indexes of the unique columns can answer.
+            users = users.filter(Q(username__startswith=search) | Q(email__startswith=search))
+        paginator = CursorPaginator(users, sort_by, descending=request.query_params.get('order', 'asc') == 'desc',
+                                    page_size=get_page_size(request.query_params.get('page_size')))
+        try:
+            page = paginator.page(request.query_params.get('cursor'))
+        except InvalidCursor as e:
+            logger.exception(e)
+            api_response = ApiResponse(status=0, message=constants.INVALID_CURSOR,
+                                       http_status=status.HTTP_400_BAD_REQUEST)
+            return api_response.create_response()
+        serializer = fieldset.serializer(page.object_list, many=True)
         api_response = ApiResponse(status=1, data=serializer.data, message=constants.USERS_GET_SUCCESS,
-                                   http_status=status.HTTP_200_OK)
+                                   http_status=status.HTTP_200_OK, next=page.has_next(), previous=page.has_previous(),
+                                   next_cursor=page.next_cursor, previous_cursor=page.previous_cursor)
         return api_response.create_response()
 
     @swagger_auto_schema(request_body=UserSerializer, operation_description="API is used to post the user detail "
@@ -61,33 +139,14 @@ class UsersList(APIView):
         """
         serializer = UserSerializer(data=request.data)
         if serializer.is_valid():
-            holiday_flag = False
-            holiday_details = []
-            abstract_ip_geolocation_api = importlib.import_module("abstract-ip-geolocation-api")
-            geolocation_api = abstract_ip_geolocation_api.v1(geolocation_api_key)
-            location_data = geolocation_api.geolocate()
-            current_time = datetime.datetime.now()
-            if 'ip_address' in location_data:
-                geolocation_data = location_data
-                country = location_data['country_code']
-                response = requests.get(
-                    'https://holidays.abstractapi.com/v1/',
-                    params={'api_key': holiday_api_key, 'country': country,
-                            'year': current_time.year, 'month': current_time.month,
-                            'day': current_time.day},
-                )
-                if response.status_code == 200:
-                    if response.json():
-                        holiday_flag = True
-                        holiday_details = response.json()
-            serializer.save(is_holiday=holiday_flag, holiday_details=holiday_details, geolocation_data=geolocation_data)
-            context = {
-                'username': serializer.data['username'],
-                'site_url': constants.SITE_URL + constants.LOGIN
-            }
-            # render email html
-            email_html_message = render_to_string('email_templates/register_success.html', context)
-            utils.send_email(subject="WELCOME!", recipient=[serializer.data['email']], body=email_html_message)
+            geolocation_data = geolocate(client_ip(request))
+            country_code = geolocation_data.get('country_code', '')
+            holiday_details = list(holidays_on(country_code, timezone.localdate())) if country_code else []
+            # The welcome email is stored in the outbox with the user and sent by the job queue workers.
+            with transaction.atomic():
+                user = serializer.save(geolocation_data=geolocation_data, country_code=country_code,
+                                       is_holiday=bool(holiday_details), holiday_details=holiday_details)
+                send_welcome_email(user)
             api_response = ApiResponse(status=1, data=serializer.data, message=constants.CREATE_USER_SUCCESS,
                                        http_status=status.HTTP_201_CREATED)
             return api_response.create_response()
@@ -113,15 +172,26 @@ class UserDetails(APIView):
         :return: user info or send proper error status
         """
         try:
-            user = User.objects.get(id=pk)
+            fieldset = Fieldset.from_query(UserSerializer, request.query_params)
+        except InvalidFieldset as e:
+            logger.exception(e)
+            api_response = ApiResponse(status=0, message=constants.INVALID_FIELDSET,
+                                       http_status=status.HTTP_400_BAD_REQUEST)
+            return api_response.create_response()
+        try:
+            user = fieldset.shape(User.objects.all(), always=('modified_on',)).get(id=pk)
         except User.DoesNotExist as e:
             logger.exception(e)
             api_response = ApiResponse(status=0, message=constants.USER_DOES_NOT_EXIST,
                                        http_status=status.HTTP_404_NOT_FOUND)
             return api_response.create_response()
-        serializer = UserSerializer(user)
+        etag = make_etag(user.id, user.modified_on, fieldset.names, media_type=request.accepted_media_type)
+        not_modified = not_modified_response(request, etag=etag, last_modified=user.modified_on)
+        if not_modified is not None:
+            return not_modified
+        serializer = fieldset.serializer(user)
         api_response = ApiResponse(status=1, data=serializer.data, message=constants.GET_USER_SUCCESS,
-                                   http_status=status.HTTP_200_OK)
+                                   http_status=status.HTTP_200_OK, etag=etag, last_modified=user.modified_on)
         return api_response.create_response()
 
     @swagger_auto_schema(request_body=UserSerializer, operation_description="API is used to update the user details "
@@ -142,7 +212,11 @@ class UserDetails(APIView):
             return api_response.create_response()
         serializer = UserSerializer(user, data=request.data, partial=True)
         if serializer.is_valid():
+            password_changed = 'password' in serializer.validated_data
             serializer.save()
+            if password_changed:
+                revoke_user_tokens(user.id)
+            invalidate_user(user.id)
             api_response = ApiResponse(status=1, data=serializer.data, message=constants.UPDATE_USER_SUCCESS,
                                        http_status=status.HTTP_201_CREATED)
             return api_response.create_response()
@@ -167,6 +241,7 @@ class UserDetails(APIView):
                                        http_status=status.HTTP_404_NOT_FOUND)
             return api_response.create_response()
         user.delete()
+        invalidate_user(pk)
         api_response = ApiResponse(status=1, message=constants.DELETE_USER_SUCCESS, http_status=status.HTTP_200_OK)
         return api_response.create_response()
 
@@ -191,6 +266,9 @@ class ChangePasswordView(APIView):
             serializer = UserSerializer(user, data=data, partial=True)
             if serializer.is_valid():
                 serializer.save()
+                # Tokens issued with the previous password stop working.
+                revoke_user_tokens(user.id)
+                invalidate_user(user.id)
                 api_response = ApiResponse(status=1, data=serializer.data, message=constants.CHANGE_PASSWORD_SUCCESS,
                                            http_status=status.HTTP_201_CREATED)
                 return api_response.create_response()
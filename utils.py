@@ -1,13 +1,21 @@
-from django.core.mail import send_mail
+from mailer.outbox import queue_email
 from wall_app.settings import settings
 
 
 def send_email(subject, recipient, body, message=None):
+    """
+    Function is used to send an email through the outbox, in the transaction of the caller.
+    :param subject: subject of the email.
+    :param recipient: list of recipient addresses.
+    :param body: html of the email.
+    :param message: plain text of the email.
+    :return: OutboxEmail object.
+    """
     sender = settings.EMAIL_HOST_USER
-    send_mail(
+    return queue_email(
         subject=subject,
-        message=message,
+        recipients=recipient,
+        html_body=body,
+        body=message,
         from_email=sender,
-        recipient_list=recipient,
-        html_message=body,
     )
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class WallConfig(AppConfig):
     name = 'wall'
+
+    def ready(self):
+        import wall.signals
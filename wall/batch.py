@@ -0,0 +1,268 @@
+from abc import ABC, abstractmethod
+from collections import Counter
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+import constants
+from response_utils import get_error_message
+from wall import search
+from wall.counters import adjust_counters
+from wall.fast_serializers import comment_values, serialize_comments, serialize_walls, wall_values
+from wall.models import Wall, Comment
+from wall.serializers import WallSerializer, CommentSerializer
+from wall.signals import send_wall_changed
+
+"""
+    This module contains the batch writers, which create, update and delete many walls or comments in one
+    transaction with bulk queries.
+"""
+
+OPERATIONS = ('create', 'update', 'delete')
+
+
+class InvalidBatch(ValueError):
+    """
+    Raised when a batch can not be applied as a whole, e.g. because of its shape or a database conflict.
+    """
+
+
+def bulk_insert(model, objects):
+    """
+    Function is used to bulk_create objects and make sure their primary keys are set.
+    SQLite can not return the ids of a bulk insert, but it lets a single transaction write at a time,
+    so the rows written by this transaction are the newest rows of the table.
+    :param model: model class.
+    :param objects: unsaved objects.
+    :return: the objects, with their primary keys.
+    """
+    objects = model.objects.bulk_create(objects)
+    if objects and objects[0].pk is None:
+        last_id = model.objects.aggregate(last_id=Max('pk'))['last_id']
+        for pk, obj in enumerate(objects, start=last_id - len(objects) + 1):
+            obj.pk = pk
+            obj._state.adding = False
+    return objects
+
+
+def failure(message):
+    return {'status': 0, 'message': message}
+
+
+class BatchWriter(ABC):
+    """
+    Base class of the batch writers.
+
+    Every item is validated with the serializer of the model first. If any item is invalid nothing is written
+    and the result of every item is returned, otherwise all the items are written in one transaction.
+    Bulk queries send no signals, so subclasses keep counters and the search index up to date themselves.
+    """
+    model = None
+    serializer_class = None
+    does_not_exist = None
+    messages = {}
+
+    def __init__(self, request):
+        """
+        :param request: request of the user writing the batch.
+        """
+        self.request = request
+        self.user = request.user
+
+    def parse(self, data):
+        """
+        Function is used to check the shape of a batch.
+        :param data: body of the request, {"create": [...], "update": [...], "delete": [...]}.
+        :return: dict of operation to its list of items.
+        """
+        if not isinstance(data, dict) or not any(operation in data for operation in OPERATIONS):
+            raise InvalidBatch(constants.INVALID_BATCH)
+        items = {operation: data.get(operation) or [] for operation in OPERATIONS}
+        if not all(isinstance(value, list) for value in items.values()):
+            raise InvalidBatch(constants.INVALID_BATCH)
+        if sum(len(value) for value in items.values()) > settings.BATCH_WRITE_MAX_ITEMS:
+            raise InvalidBatch(constants.BATCH_TOO_LARGE % settings.BATCH_WRITE_MAX_ITEMS)
+        return items
+
+    def item_id(self, item):
+        value = item.get('id') if isinstance(item, dict) else item
+        if isinstance(value, bool) or not isinstance(value, (int, str)) or not str(value).isdigit():
+            return None
+        return int(value)
+
+    def run(self, data):
+        """
+        Function is used to validate and write a batch.
+        :param data: body of the request.
+        :return: tuple of (True if the batch was written, dict of operation to the list of item results).
+        """
+        items = self.parse(data)
+        try:
+            # Items are validated against the rows the transaction writes, which are locked where the
+            # database supports it, so a concurrent write can not change them in between.
+            with transaction.atomic():
+                written, results = self.apply(items)
+                if written is None:
+                    return False, results
+                created, updated, deleted = written
+                wall_ids = self.write(created, updated, deleted)
+        except IntegrityError as e:
+            raise InvalidBatch(constants.BATCH_CONFLICT) from e
+        for wall_id in wall_ids:
+            send_wall_changed(self.model, wall_id)
+
+        data = self.serialize([obj.pk for obj in created + updated])
+        for operation in ('create', 'update'):
+            results[operation] = [{'status': 1, 'message': self.messages[operation], 'data': data[obj.pk]}
+                                  for obj in results[operation]]
+        return True, results
+
+    def apply(self, items):
+        """
+        Function is used to validate the items of a batch and apply the valid ones to their objects, in memory.
+        :param items: dict of operation to its list of items, as returned by parse().
+        :return: tuple of (None if any item is invalid, else the created, updated and deleted objects,
+                 dict of operation to the list of item results).
+        """
+        targets = [('update', item, self.item_id(item)) for item in items['update']]
+        targets += [('delete', item, self.item_id(item)) for item in items['delete']]
+        seen = Counter(pk for operation, item, pk in targets)
+        ids = [pk for operation, item, pk in targets if pk is not None]
+        existing = self.model.objects.select_for_update().in_bulk(ids)
+        # Until the batch is written, the result of a valid create or update item is its object.
+        results = {operation: [] for operation in OPERATIONS}
+        created, updated, deleted = [], [], []
+
+        for item in items['create']:
+            serializer = self.serializer_class(data=item, context={'request': self.request})
+            if serializer.is_valid():
+                obj = self.build(serializer.validated_data)
+                created.append(obj)
+                results['create'].append(obj)
+            else:
+                results['create'].append(failure(get_error_message(serializer)))
+
+        for operation, item, pk in targets:
+            if pk is None:
+                results[operation].append(failure(constants.ID_REQUIRED))
+            elif seen[pk] > 1:
+                results[operation].append(failure(constants.DUPLICATE_BATCH_ITEM))
+            elif pk not in existing:
+                results[operation].append(failure(self.does_not_exist))
+            elif operation == 'delete':
+                deleted.append(existing[pk])
+                results[operation].append({'status': 1, 'message': self.messages['delete'], 'id': pk})
+            else:
+                serializer = self.serializer_class(existing[pk], data=item, partial=True,
+                                                   context={'request': self.request})
+                if serializer.is_valid():
+                    self.change(existing[pk], serializer.validated_data)
+                    updated.append(existing[pk])
+                    results[operation].append(existing[pk])
+                else:
+                    results[operation].append(failure(get_error_message(serializer)))
+
+        if any(isinstance(result, dict) and not result['status'] for value in results.values() for result in value):
+            return None, {operation: [result if isinstance(result, dict) else None for result in value]
+                          for operation, value in results.items()}
+        return (created, updated, deleted), results
+
+    def build(self, validated_data):
+        """
+        Function is used to build an unsaved object from the validated data of a create item.
+        """
+        return self.model(created_by=self.user, modified_by=self.user, **validated_data)
+
+    def change(self, instance, validated_data):
+        """
+        Function is used to apply the validated data of an update item to an object, without saving it.
+        """
+        for attribute, value in validated_data.items():
+            setattr(instance, attribute, value)
+        instance.modified_on = timezone.now()
+        instance.modified_by = self.user
+
+    @abstractmethod
+    def write(self, created, updated, deleted):
+        """
+        Function is used to write the batch, inside a transaction.
+        :return: ids of the walls whose payload changed.
+        """
+
+    @abstractmethod
+    def serialize(self, ids):
+        """
+        Function is used to serialize the written objects.
+        :return: dict of id to the serialized object.
+        """
+
+
+class WallBatchWriter(BatchWriter):
+    """
+    Batch writer of walls.
+    """
+    model = Wall
+    serializer_class = WallSerializer
+    does_not_exist = constants.WALL_DOES_NOT_EXIST
+    messages = {'create': constants.CREATE_WALL_SUCCESS, 'update': constants.UPDATE_WALL_SUCCESS,
+                'delete': constants.DELETE_WALL_SUCCESS}
+
+    def change(self, instance, validated_data):
+        super().change(instance, validated_data)
+        instance.last_activity_on = instance.modified_on
+
+    def write(self, created, updated, deleted):
+        bulk_insert(Wall, created)
+        if updated:
+            Wall.objects.bulk_update(updated, ['title', 'content', 'modified_on', 'modified_by', 'last_activity_on'])
+        search.index_walls(created + updated)
+        # Deleting walls sends post_delete, which already reports the deleted walls as changed.
+        Wall.objects.filter(id__in=[wall.id for wall in deleted]).delete()
+        return [wall.id for wall in created + updated]
+
+    def serialize(self, ids):
+        return {row['id']: row for row in serialize_walls(wall_values(Wall.objects.filter(id__in=ids)))}
+
+
+class CommentBatchWriter(BatchWriter):
+    """
+    Batch writer of comments, which also moves the comment counters of their walls.
+    """
+    model = Comment
+    serializer_class = CommentSerializer
+    does_not_exist = constants.COMMENT_DOES_NOT_EXIST
+    messages = {'create': constants.CREATE_COMMENT_SUCCESS, 'update': constants.UPDATE_COMMENT_SUCCESS,
+                'delete': constants.DELETE_COMMENT_SUCCESS}
+
+    def __init__(self, request):
+        super().__init__(request)
+        self.old_wall_ids = {}
+
+    def change(self, instance, validated_data):
+        self.old_wall_ids[instance.id] = instance.wall_id
+        super().change(instance, validated_data)
+
+    def write(self, created, updated, deleted):
+        bulk_insert(Comment, created)
+        if updated:
+            Comment.objects.bulk_update(updated, ['wall', 'comment_content', 'modified_on', 'modified_by'])
+        search.index_comments(created + updated)
+        Comment.objects.filter(id__in=[comment.id for comment in deleted]).delete()
+
+        deltas = Counter()
+        for comment in created:
+            deltas[comment.wall_id] += 1
+        for comment in updated:
+            deltas[self.old_wall_ids[comment.id]] -= 1
+            deltas[comment.wall_id] += 1
+        for comment in deleted:
+            deltas[comment.wall_id] -= 1
+        wall_ids = [wall_id for wall_id in deltas if wall_id]
+        for wall_id in wall_ids:
+            adjust_counters(wall_id, comment_count=deltas[wall_id])
+        return wall_ids
+
+    def serialize(self, ids):
+        return {row['id']: row for row in serialize_comments(comment_values(Comment.objects.filter(id__in=ids)))}
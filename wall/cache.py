@@ -0,0 +1,311 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from wall_app.db.routers import read_from_primary
+
+"""
+    This module contains the read-through caches of serialized wall payloads.
+"""
+
+# Seconds between two reads of a list page an other request is building.
+BUILD_POLL_INTERVAL = 0.01
+
+
+class WallDetailCache:
+    """
+    Versioned read-through cache of the WallDetails payload.
+
+    Every wall has a version number in the shared Django cache and payloads are stored under
+    (wall id, version), so invalidating a wall is a single increment and old payloads simply expire.
+    Payloads are built from the primary: one built from a lagging replica right after an invalidation would
+    be stored under the new version.
+    A bounded per-process LRU in front of the shared cache saves the unpickling of hot walls.
+    """
+
+    def __init__(self, alias='default', timeout=None, max_entries=None):
+        """
+        :param alias: name of the Django cache used as shared storage.
+        :param timeout: seconds a payload stays in the shared cache.
+        :param max_entries: number of payloads kept in the per-process LRU.
+        """
+        self.alias = alias
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self.local = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def version_key(self, wall_id):
+        return 'wall:detail:version:%s' % wall_id
+
+    def payload_key(self, wall_id, version, variant=None):
+        if variant is None:
+            return 'wall:detail:%s:%s' % (wall_id, version)
+        return 'wall:detail:%s:%s:%s' % (wall_id, version, variant)
+
+    def get_version(self, wall_id):
+        """
+        Function is used to get the current version of a wall. A missing version starts from the current time,
+        so a version lost by eviction can never match a payload stored before it.
+        :param wall_id: id of the wall.
+        :return: version number.
+        """
+        key = self.version_key(wall_id)
+        version = self.cache.get(key)
+        if version is None:
+            self.cache.add(key, time.time_ns(), timeout=None)
+            version = self.cache.get(key)
+        return version
+
+    def get_or_build(self, wall_id, build, variant=None):
+        """
+        Function is used to read the payload of a wall, building and storing it on a miss.
+        :param wall_id: id of the wall.
+        :param build: function returning the payload, or None if the wall does not exist.
+        :param variant: name of the payload shape, like the digest of a fieldset, None for the full payload.
+        :return: payload of the wall or None.
+        """
+        version = self.get_version(wall_id)
+        with self.lock:
+            entry = self.local.get(wall_id)
+            if entry is not None and entry[0] == version and variant in entry[1]:
+                self.local.move_to_end(wall_id)
+                self.hits += 1
+                return entry[1][variant]
+
+        key = self.payload_key(wall_id, version, variant)
+        payload = self.cache.get(key)
+        if payload is None:
+            with read_from_primary():
+                payload = build()
+            if payload is None:
+                with self.lock:
+                    self.misses += 1
+                return None
+            self.cache.set(key, payload, timeout=self.timeout or settings.WALL_DETAIL_CACHE_TIMEOUT)
+            hit = False
+        else:
+            hit = True
+
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            entry = self.local.get(wall_id)
+            if entry is None or entry[0] != version:
+                entry = self.local[wall_id] = (version, {})
+            entry[1][variant] = payload
+            self.local.move_to_end(wall_id)
+            while len(self.local) > (self.max_entries or settings.WALL_DETAIL_CACHE_LOCAL_ENTRIES):
+                self.local.popitem(last=False)
+        return payload
+
+    def invalidate(self, wall_id):
+        """
+        Function is used to make every cached payload of a wall stale.
+        :param wall_id: id of the wall.
+        """
+        key = self.version_key(wall_id)
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            self.cache.add(key, time.time_ns(), timeout=None)
+        with self.lock:
+            self.local.pop(wall_id, None)
+
+    def invalidate_many(self, wall_ids):
+        """
+        Function is used to make every cached payload of some walls stale with a single cache call. Their
+        versions are deleted, and a missing version starts again from the current time.
+        :param wall_ids: ids of the walls.
+        """
+        self.cache.delete_many([self.version_key(wall_id) for wall_id in wall_ids])
+        with self.lock:
+            for wall_id in wall_ids:
+                self.local.pop(wall_id, None)
+
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'local_entries': len(self.local)}
+
+    def clear(self):
+        with self.lock:
+            self.local.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+class WallListCache:
+    """
+    Shared cache of the wall list pages served to anonymous users.
+
+    All pages share one generation number which is bumped on every wall or comment write. Reactions only
+    bump a second generation, which the pages sorted by a value they change depend on: the other pages keep
+    serving their counters for up to WALL_LIST_CACHE_TIMEOUT seconds, so a burst of reactions does not turn
+    the cache off. An entry built under an older generation, or older than the fresh timeout, is stale: the
+    first request to take the rebuild lock rebuilds it while every other request keeps serving the stale
+    copy, or waits for the new one when there is no copy yet, so a page is never rebuilt by all workers at once.
+    Pages are built from the primary, like the payloads of WallDetailCache.
+    """
+
+    generation_key = 'wall:list:generation'
+    reaction_generation_key = 'wall:list:reaction-generation'
+
+    def __init__(self, alias='default', timeout=None, stale_timeout=None, lock_timeout=None, build_wait=None):
+        """
+        :param alias: name of the Django cache used as storage.
+        :param timeout: seconds an entry is served as fresh.
+        :param stale_timeout: seconds a stale entry can still be served while it is rebuilt.
+        :param lock_timeout: seconds after which a rebuild lock of a crashed worker expires.
+        :param build_wait: seconds a request waits for a page an other request is building.
+        """
+        self.alias = alias
+        self.timeout = timeout
+        self.stale_timeout = stale_timeout
+        self.lock_timeout = lock_timeout
+        self.build_wait = build_wait
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.waits = 0
+        self.misses = 0
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def entry_key(self, query):
+        digest = hashlib.sha1(repr(query).encode()).hexdigest()
+        return 'wall:list:%s' % digest
+
+    def lock_key(self, query):
+        return '%s:lock' % self.entry_key(query)
+
+    def get_generation(self, key=None):
+        """
+        Function is used to get the current value of a generation. A missing generation starts from the current
+        time, so a generation lost by eviction can never match an entry built before it.
+        :param key: key of the generation, the generation of every page by default.
+        :return: generation number.
+        """
+        key = key or self.generation_key
+        generation = self.cache.get(key)
+        if generation is None:
+            self.cache.add(key, time.time_ns(), timeout=None)
+            generation = self.cache.get(key)
+        return generation
+
+    def current_generation(self, reactions=False):
+        """
+        Function is used to get the generations an entry is built under.
+        :param reactions: True if the page depends on the reactions of its walls, like a page sorted by likes.
+        :return: tuple of generation numbers.
+        """
+        if reactions:
+            return self.get_generation(), self.get_generation(self.reaction_generation_key)
+        return self.get_generation(), None
+
+    def get_or_build(self, query, build, reactions=False):
+        """
+        Function is used to read a list page, building it on a miss and rebuilding it once when it is stale.
+        :param query: normalized query of the page, a tuple of (name, value) pairs.
+        :param build: function returning the page, or None if the page must not be cached.
+        :param reactions: True if the page depends on the reactions of its walls, like a page sorted by likes.
+        :return: page or None.
+        """
+        generation = self.current_generation(reactions)
+        entry = self.cache.get(self.entry_key(query))
+        if entry is not None and entry['generation'] == generation and entry['fresh_until'] > time.time():
+            self.count('hits')
+            return entry['page']
+
+        lock_key = self.lock_key(query)
+        if not self.cache.add(lock_key, 1, timeout=self.lock_timeout or settings.WALL_LIST_CACHE_LOCK_TIMEOUT):
+            if entry is not None:
+                self.count('stale_hits')
+                return entry['page']
+            entry = self.wait_for(query, generation, lock_key)
+            if entry is not None:
+                self.count('waits')
+                return entry['page']
+            self.count('misses')
+            return build()
+
+        self.count('misses')
+        try:
+            with read_from_primary():
+                page = build()
+            if page is not None:
+                self.store(query, generation, page)
+        finally:
+            self.cache.delete(lock_key)
+        return page
+
+    def wait_for(self, query, generation, lock_key):
+        """
+        Function is used to wait for the entry of a page an other request holds the rebuild lock of.
+        :param query: normalized query of the page.
+        :param generation: generations the entry must be built under.
+        :param lock_key: key of the rebuild lock.
+        :return: entry, or None if the other request did not store it in time.
+        """
+        wait = settings.WALL_LIST_CACHE_BUILD_WAIT if self.build_wait is None else self.build_wait
+        deadline = time.monotonic() + wait
+        while time.monotonic() < deadline:
+            time.sleep(BUILD_POLL_INTERVAL)
+            # The lock is read first: an entry stored before the lock was released is then seen below.
+            building = self.cache.get(lock_key) is not None
+            entry = self.cache.get(self.entry_key(query))
+            if entry is not None and entry['generation'] == generation:
+                return entry
+            if not building:
+                # The page could not be cached, or its builder failed.
+                return None
+        return None
+
+    def store(self, query, generation, page):
+        timeout = self.timeout or settings.WALL_LIST_CACHE_TIMEOUT
+        stale_timeout = self.stale_timeout or settings.WALL_LIST_CACHE_STALE_TIMEOUT
+        entry = {'generation': generation, 'fresh_until': time.time() + timeout, 'page': page}
+        self.cache.set(self.entry_key(query), entry, timeout=timeout + stale_timeout)
+
+    def invalidate(self, reactions=False):
+        """
+        Function is used to make cached list pages stale.
+        :param reactions: True if only reactions changed, which only makes the pages depending on them stale.
+        """
+        key = self.reaction_generation_key if reactions else self.generation_key
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            self.cache.add(key, time.time_ns(), timeout=None)
+
+    def count(self, counter):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'stale_hits': self.stale_hits, 'waits': self.waits, 'misses': self.misses}
+
+    def clear(self):
+        with self.lock:
+            self.hits = 0
+            self.stale_hits = 0
+            self.waits = 0
+            self.misses = 0
+
+
+wall_detail_cache = WallDetailCache()
+wall_list_cache = WallListCache()
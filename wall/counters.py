@@ -0,0 +1,68 @@
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from wall.models import Wall, Comment, Reaction
+
+"""
+    This module contains helpers to keep the denormalized like, dislike and comment counters of walls correct.
+"""
+
+COUNTER_FIELDS = ('like_count', 'dislike_count', 'comment_count')
+
+
+def adjust_counters(wall_id, **deltas):
+    """
+    Function is used to add deltas to the counters of a wall and record the activity in a single atomic UPDATE.
+    Counters never go below zero, so a drifted counter can not make a write fail. Called without deltas
+    it only moves last_activity_on, e.g. when a comment of the wall is edited.
+    :param wall_id: id of the wall.
+    :param deltas: counter name to the number added to it, e.g. like_count=1.
+    :return: number of updated walls.
+    """
+    if not wall_id:
+        return 0
+    changes = {field: F(field) + delta if delta > 0 else Greatest(F(field) + delta, 0)
+               for field, delta in deltas.items() if delta}
+    return Wall.objects.filter(id=wall_id).update(last_activity_on=timezone.now(), **changes)
+
+
+def count_rows(queryset, wall_field, wall_ids):
+    rows = queryset.filter(**{wall_field + '__in': wall_ids}).order_by().values(wall_field)
+    return dict(rows.annotate(total=Count('pk')).values_list(wall_field, 'total'))
+
+
+def actual_counters(wall_ids):
+    """
+    Function is used to count the likes, dislikes and comments of walls from the source tables.
+    :param wall_ids: ids of the walls.
+    :return: dict of wall id to a dict of counter values.
+    """
+    likes = count_rows(Reaction.objects.filter(kind=Reaction.LIKE), 'wall', wall_ids)
+    dislikes = count_rows(Reaction.objects.filter(kind=Reaction.DISLIKE), 'wall', wall_ids)
+    comments = count_rows(Comment.objects, 'wall', wall_ids)
+    return {wall_id: {'like_count': likes.get(wall_id, 0), 'dislike_count': dislikes.get(wall_id, 0),
+                      'comment_count': comments.get(wall_id, 0)}
+            for wall_id in wall_ids}
+
+
+def reconcile_counters(wall_ids):
+    """
+    Function is used to overwrite drifted counters of walls with the values counted from the source tables.
+    The walls are locked while they are counted so concurrent increments are not lost.
+    :param wall_ids: ids of the walls.
+    :return: number of walls whose counters were fixed.
+    """
+    with transaction.atomic():
+        walls = list(Wall.objects.select_for_update().filter(id__in=wall_ids).only('id', *COUNTER_FIELDS))
+        counters = actual_counters([wall.id for wall in walls])
+        drifted = []
+        for wall in walls:
+            actual = counters[wall.id]
+            if any(getattr(wall, field) != actual[field] for field in COUNTER_FIELDS):
+                for field in COUNTER_FIELDS:
+                    setattr(wall, field, actual[field])
+                drifted.append(wall)
+        Wall.objects.bulk_update(drifted, COUNTER_FIELDS)
+    return len(drifted)
@@ -0,0 +1,243 @@
+import contextlib
+import datetime
+import decimal
+import gzip
+import io
+import json
+import sys
+
+from django.core.exceptions import ValidationError
+from django.core.management.color import no_style
+from django.db import IntegrityError, connection, transaction
+
+from users.models import User
+from wall.cache import wall_detail_cache, wall_list_cache
+from wall.models import Wall, Comment, Reaction
+
+"""
+    This module contains the streaming export and import of the wall dataset as NDJSON.
+
+    The first line is a header, every other line holds one row: {"model": "wall.wall", "fields": {...}}, with
+    foreign keys stored as ids. Models are written parents first, so an import creating rows in file order
+    never points to a row it has not created yet.
+"""
+
+FORMAT = 'wall-data'
+VERSION = 1
+# Models in the order they are exported and imported, parents first.
+MODELS = (User, Wall, Comment, Reaction)
+
+
+def model_label(model):
+    return model._meta.label_lower
+
+
+def open_data_file(path, mode, compress=None):
+    """
+    Function is used to open the file of an export, '-' meaning stdin or stdout.
+    :param path: path of the file.
+    :param mode: 'r' to read or 'w' to write.
+    :param compress: True to gzip the file, None to decide from the .gz suffix.
+    :return: text file object.
+    """
+    if compress is None:
+        compress = path.endswith('.gz')
+    if path == '-':
+        stream = sys.stdin.buffer if mode == 'r' else sys.stdout.buffer
+        if compress:
+            return io.TextIOWrapper(gzip.GzipFile(fileobj=stream, mode=mode + 'b'), encoding='utf-8')
+        return io.TextIOWrapper(stream, encoding='utf-8')
+    if compress:
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def encode_value(value):
+    """
+    Function is used to encode the column values json does not know, keeping full precision.
+    :param value: value of a column.
+    :return: json friendly value.
+    """
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    raise TypeError("Object of type %s is not JSON serializable" % type(value).__name__)
+
+
+def export_data(stream, batch_size=1000):
+    """
+    Function is used to write every user, wall, comment and reaction to a stream, one row per line.
+    Rows are read with chunked iterators, so memory does not grow with the size of the tables. Every table is
+    read in one REPEATABLE READ transaction of the primary database, so the export is a consistent snapshot
+    and a comment never points to a wall created after the walls were exported.
+    :param stream: text file object.
+    :param batch_size: number of rows fetched per query.
+    :return: dict of model label to the number of exported rows.
+    """
+    outermost = not connection.in_atomic_block
+    with transaction.atomic(using=connection.alias):
+        if outermost and connection.vendor == 'postgresql':
+            # Must be the first statement of the transaction. SQLite transactions read a snapshot already.
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        stream.write(json.dumps({'format': FORMAT, 'version': VERSION}) + '\n')
+        counts = {}
+        for model in MODELS:
+            label = model_label(model)
+            count = 0
+            rows = model.objects.using(connection.alias).order_by('pk').values().iterator(chunk_size=batch_size)
+            for row in rows:
+                stream.write(json.dumps({'model': label, 'fields': row}, default=encode_value,
+                                        separators=(',', ':')) + '\n')
+                count += 1
+            counts[label] = count
+    return counts
+
+
+@contextlib.contextmanager
+def preserve_timestamps(models):
+    """
+    Context manager turning off auto_now and auto_now_add, so imported rows keep their exported timestamps.
+    :param models: models whose date fields are switched off.
+    """
+    switched = []
+    for model in models:
+        for field in model._meta.concrete_fields:
+            for attribute in ('auto_now', 'auto_now_add'):
+                if getattr(field, attribute, False):
+                    setattr(field, attribute, False)
+                    switched.append((field, attribute))
+    try:
+        yield
+    finally:
+        for field, attribute in switched:
+            setattr(field, attribute, True)
+
+
+class DataImporter:
+    """
+    Importer of an export file into empty tables, creating rows in batches with bulk_create.
+
+    bulk_create does not send signals, so the importer clears the wall caches itself and
+    the search index has to be rebuilt once the import is done.
+    """
+
+    def __init__(self, batch_size=1000):
+        """
+        :param batch_size: number of rows created per query.
+        """
+        self.batch_size = batch_size
+        self.models = {model_label(model): model for model in MODELS}
+        # Keys of the fields of an exported row, foreign keys being stored as ids.
+        self.columns = {model: {field.attname for field in model._meta.concrete_fields} for model in MODELS}
+        self.counts = {label: 0 for label in self.models}
+        self.model = None
+        self.batch = []
+        # Numbers of the first and last lines of the batch, to point at the rows a failed batch came from.
+        self.lines = None
+
+    def check_empty(self):
+        for model in MODELS:
+            if model.objects.exists():
+                raise ValueError("Table of %s is not empty." % model_label(model))
+
+    def read_header(self, line):
+        try:
+            header = json.loads(line)
+        except ValueError:
+            header = None
+        if not isinstance(header, dict) or header.get('format') != FORMAT:
+            raise ValueError("File is not a wall data export.")
+        if header.get('version') != VERSION:
+            raise ValueError("Unsupported export version %s." % header.get('version'))
+
+    def read_row(self, record):
+        """
+        Function is used to check a decoded line of the export.
+        :param record: decoded line of the export.
+        :return: model and fields of the row.
+        """
+        if not isinstance(record, dict):
+            raise ValueError("Row is not an object.")
+        model = self.models.get(record.get('model'))
+        if model is None:
+            raise ValueError("Unknown model %s." % record.get('model'))
+        fields = record.get('fields')
+        if not isinstance(fields, dict):
+            raise ValueError("Fields of the row are not an object.")
+        unknown = set(fields) - self.columns[model]
+        if unknown:
+            raise ValueError("Unknown fields %s of %s." % (", ".join(sorted(unknown)), model_label(model)))
+        return model, fields
+
+    def add(self, model, fields, number):
+        """
+        Function is used to queue a row, creating the queued rows when the batch is full or the model changes.
+        :param model: model of the row.
+        :param fields: fields of the row.
+        :param number: number of the line of the row.
+        """
+        if model is not self.model or len(self.batch) >= self.batch_size:
+            self.flush()
+            self.model = model
+            self.lines = (number, number)
+        self.batch.append(model(**fields))
+        self.lines = (self.lines[0], number)
+
+    def flush(self):
+        """
+        Function is used to create the queued rows.
+        A row the database rejects fails its whole batch, so the error names the lines of the batch.
+        """
+        if not self.batch:
+            return
+        try:
+            self.model.objects.bulk_create(self.batch, batch_size=self.batch_size)
+        except (IntegrityError, ValidationError) as e:
+            message = "; ".join(e.messages) if isinstance(e, ValidationError) else str(e)
+            first, last = self.lines
+            if first == last:
+                raise ValueError("Line %s: %s" % (first, message))
+            raise ValueError("Lines %s to %s: %s" % (first, last, message))
+        if self.model is Wall:
+            wall_detail_cache.invalidate_many([wall.pk for wall in self.batch])
+        self.counts[model_label(self.model)] += len(self.batch)
+        self.batch = []
+
+    def run(self, stream):
+        """
+        Function is used to import an export file in one transaction.
+        :param stream: text file object.
+        :return: dict of model label to the number of imported rows.
+        """
+        with transaction.atomic(), preserve_timestamps(MODELS):
+            self.check_empty()
+            self.read_header(stream.readline())
+            for number, line in enumerate(stream, start=2):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    raise ValueError("Line %s is not valid JSON." % number)
+                try:
+                    model, fields = self.read_row(record)
+                except ValueError as e:
+                    raise ValueError("Line %s: %s" % (number, e))
+                self.add(model, fields, number)
+            self.flush()
+            reset_sequences(MODELS)
+        wall_list_cache.invalidate()
+        return self.counts
+
+
+def reset_sequences(models):
+    """
+    Function is used to move the primary key sequences past the imported ids.
+    :param models: models whose sequences are reset.
+    """
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
@@ -0,0 +1,187 @@
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601
+from rest_framework.settings import api_settings
+
+from wall.models import comment_preview_queryset
+
+"""
+    This module contains the read-only fast path used to serialize wall and comment lists.
+
+    It builds the response dicts straight from values() rows with a list of precompiled
+    (field, column, converter) extractors, skipping the per row field machinery of DRF serializers.
+    The output must stay identical to WallSerializer and CommentSerializer, which the parity tests check,
+    so a new field on those serializers needs an extractor here as well.
+"""
+
+# Marker for the datetime columns, which get a converter bound to the current time zone on every call.
+DATETIME = object()
+# Marker for the nested comments of a wall.
+COMMENTS = object()
+
+
+def identity(value):
+    return value
+
+
+def optional_str(value):
+    return None if value is None else str(value)
+
+
+def datetime_converter():
+    """
+    Function is used to build a converter which formats datetimes the way DRF DateTimeField does.
+    :return: function converting a datetime into its representation.
+    """
+    output_format = api_settings.DATETIME_FORMAT
+    field_timezone = timezone.get_current_timezone() if settings.USE_TZ else None
+
+    def convert(value):
+        if not value:
+            return None
+        if output_format is None or isinstance(value, str):
+            return value
+        if field_timezone is not None:
+            if timezone.is_aware(value):
+                value = value.astimezone(field_timezone)
+            else:
+                value = timezone.make_aware(value, field_timezone)
+        elif timezone.is_aware(value):
+            value = timezone.make_naive(value, timezone.utc)
+        if output_format.lower() == ISO_8601:
+            value = value.isoformat()
+            if value.endswith('+00:00'):
+                value = value[:-6] + 'Z'
+            return value
+        return value.strftime(output_format)
+
+    return convert
+
+
+# (field, column, converter) in the order of CommentSerializer.Meta.fields.
+COMMENT_FIELDS = (
+    ('id', 'id', identity),
+    ('wall', 'wall_id', identity),
+    ('comment_content', 'comment_content', optional_str),
+    ('created_on', 'created_on', DATETIME),
+    ('modified_on', 'modified_on', DATETIME),
+    ('created_by', 'created_by__username', identity),
+    # CommentSerializer.get_modified_by returns the author of the comment.
+    ('modified_by', 'created_by__username', identity),
+)
+
+# (field, column, converter) in the order of WallSerializer.Meta.fields.
+WALL_FIELDS = (
+    ('id', 'id', identity),
+    ('title', 'title', optional_str),
+    ('content', 'content', optional_str),
+    ('likes', 'like_count', identity),
+    ('dis_likes', 'dislike_count', identity),
+    ('created_on', 'created_on', DATETIME),
+    ('comments', 'id', COMMENTS),
+    ('comment_count', 'comment_count', identity),
+    ('modified_on', 'modified_on', DATETIME),
+    ('created_by', 'created_by__username', identity),
+    ('modified_by', 'modified_by__username', identity),
+)
+
+
+class RowSerializer:
+    """
+    Serializer of values() rows, compiled once per call for a set of fields.
+    """
+
+    def __init__(self, fields, names=None):
+        """
+        :param fields: tuple of (field, column, converter) in output order.
+        :param names: names of the fields to output, None for every field.
+        """
+        convert_datetime = datetime_converter()
+        self.extractors = [(name, column, convert_datetime if convert is DATETIME else convert)
+                           for name, column, convert in fields if names is None or name in names]
+
+    @property
+    def columns(self):
+        return list(dict.fromkeys(column for name, column, convert in self.extractors))
+
+    def values(self, queryset, always=()):
+        """
+        Function is used to turn a queryset into the values() rows this serializer reads.
+        :param queryset: queryset to read.
+        :param always: columns loaded whatever the fields, like the ones used for sorting or ETags.
+        :return: values() queryset.
+        """
+        return queryset.values(*dict.fromkeys(list(always) + self.columns))
+
+    def to_representation(self, row, comments=None):
+        """
+        Function is used to serialize a single row.
+        :param row: values() row.
+        :param comments: serialized comments of the row, for the nested comments field.
+        :return: dict in the field order of the serializer.
+        """
+        return {name: (comments if convert is COMMENTS else convert(row[column]))
+                for name, column, convert in self.extractors}
+
+
+def serialize_comments(rows):
+    """
+    Function is used to serialize comment rows like CommentSerializer(many=True).
+    :param rows: values() rows read with comment_values().
+    :return: list of comment dicts.
+    """
+    serializer = RowSerializer(COMMENT_FIELDS)
+    return [serializer.to_representation(row) for row in rows]
+
+
+def comment_values(queryset, always=()):
+    """
+    Function is used to read the comment rows serialize_comments() needs.
+    :param queryset: Comment queryset.
+    :param always: columns loaded on top of the serialized ones, like the ones used for ETags.
+    :return: values() queryset.
+    """
+    return RowSerializer(COMMENT_FIELDS).values(queryset, always)
+
+
+def wall_values(queryset, names=None, always=()):
+    """
+    Function is used to read the wall rows serialize_walls() needs.
+    :param queryset: Wall queryset.
+    :param names: names of the fields to output, None for every field.
+    :param always: columns loaded whatever the fields, like the ones used for sorting or ETags.
+    :return: values() queryset.
+    """
+    return RowSerializer(WALL_FIELDS, names).values(queryset, always)
+
+
+def comment_previews(wall_ids, always=()):
+    """
+    Function is used to load the newest comments of some walls in one query, like attach_comment_previews.
+    :param wall_ids: ids of the walls.
+    :param always: columns loaded on top of the serialized ones, like the ones used for ETags.
+    :return: dict of wall id to the list of its comment rows, newest first.
+    """
+    previews = {wall_id: [] for wall_id in wall_ids}
+    for row in comment_values(comment_preview_queryset(wall_ids), always):
+        previews[row['wall_id']].append(row)
+    return previews
+
+
+def serialize_walls(rows, names=None, previews=None):
+    """
+    Function is used to serialize wall rows like WallSerializer(many=True).
+    :param rows: values() rows read with wall_values().
+    :param names: names of the fields to output, None for every field.
+    :param previews: comment rows by wall id, loaded with comment_previews() when missing and needed.
+    :return: list of wall dicts.
+    """
+    serializer = RowSerializer(WALL_FIELDS, names)
+    if names is not None and 'comments' not in names:
+        return [serializer.to_representation(row) for row in rows]
+    if previews is None:
+        previews = comment_previews([row['id'] for row in rows])
+    comment_serializer = RowSerializer(COMMENT_FIELDS)
+    return [serializer.to_representation(row, [comment_serializer.to_representation(comment)
+                                               for comment in previews.get(row['id'], ())])
+            for row in rows]
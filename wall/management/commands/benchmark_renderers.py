@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+import constants
+from renderer_utils import FastJSONRenderer, MessagePackRenderer, msgpack, orjson
+from response_utils import ApiResponse
+from wall.fast_serializers import serialize_walls, wall_values
+from wall.models import Wall
+
+
+class Command(BaseCommand):
+    """
+    Command is used to compare encode time and payload size of the response renderers on wall list pages.
+    """
+    help = "Render pages of the newest walls with every renderer and print the encode time and payload size."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=100, help="Number of walls in the rendered page.")
+        parser.add_argument('--rounds', type=int, default=200, help="Number of times the page is rendered.")
+
+    def handle(self, *args, **options):
+        page_size = options['page_size']
+        rounds = options['rounds']
+        walls = serialize_walls(list(wall_values(Wall.objects.all())[:page_size]))
+        if not walls:
+            self.stdout.write(self.style.WARNING("There are no walls to render."))
+            return
+        response = ApiResponse(status=1, data=walls, message=constants.WALLS_GET_SUCCESS, count=len(walls),
+                               total_page=1, next=False, previous=False).create_response()
+
+        renderers = [('JSONRenderer', JSONRenderer())]
+        if orjson is not None:
+            renderers.append(('FastJSONRenderer', FastJSONRenderer()))
+        if msgpack is not None:
+            renderers.append(('MessagePackRenderer', MessagePackRenderer()))
+
+        self.stdout.write("Page of %s walls, %s rounds" % (len(walls), rounds))
+        for name, renderer in renderers:
+            started = time.perf_counter()
+            for _ in range(rounds):
+                body = renderer.render(response.data, renderer.media_type)
+            elapsed = time.perf_counter() - started
+            self.stdout.write("%-20s %9.1f us/page %9s bytes" % (name, elapsed / rounds * 1e6, len(body)))
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from wall.fast_serializers import comment_previews, serialize_walls, wall_values
+from wall.models import Wall, attach_comment_previews
+from wall.serializers import WallSerializer
+
+
+class Command(BaseCommand):
+    """
+    Command is used to compare the speed of WallSerializer and the fast read path on the walls in the database.
+    """
+    help = "Serialize the newest walls with WallSerializer and with the fast read path and print rows per second."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--walls', type=int, default=100, help="Number of walls serialized per round.")
+        parser.add_argument('--rounds', type=int, default=20, help="Number of times the walls are serialized.")
+
+    def handle(self, *args, **options):
+        limit = options['walls']
+        rounds = options['rounds']
+        # Both sides load their rows once, so only the serialization itself is timed.
+        walls = attach_comment_previews(Wall.objects.with_authors()[:limit])
+        rows = list(wall_values(Wall.objects.all())[:limit])
+        previews = comment_previews([row['id'] for row in rows])
+        if not rows:
+            self.stdout.write(self.style.WARNING("There are no walls to serialize."))
+            return
+
+        results = [
+            ('WallSerializer', lambda: WallSerializer(walls, many=True).data),
+            ('fast read path', lambda: serialize_walls(rows, previews=previews)),
+        ]
+        for name, serialize in results:
+            started = time.perf_counter()
+            for _ in range(rounds):
+                serialize()
+            elapsed = time.perf_counter() - started
+            self.stdout.write("%-16s %10.0f rows/s" % (name, len(rows) * rounds / elapsed))
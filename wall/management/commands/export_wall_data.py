@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from wall.data_transfer import export_data, open_data_file
+
+
+class Command(BaseCommand):
+    """
+    Command is used to export users, walls, comments and reactions as NDJSON without loading them in memory.
+    """
+    help = "Stream users, walls, comments and reactions to an NDJSON file, gzip compressed if it ends with .gz."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to write, '-' for stdout.")
+        parser.add_argument('--gzip', action='store_true', default=None,
+                            help="Compress the output even if the file name does not end with .gz.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Number of rows fetched per query.")
+
+    def handle(self, *args, **options):
+        with open_data_file(options['path'], 'w', compress=options['gzip']) as stream:
+            counts = export_data(stream, batch_size=options['batch_size'])
+        if options['path'] != '-':
+            self.stdout.write(self.style.SUCCESS("Exported %s." % ", ".join(
+                "%s %s" % (count, label) for label, count in counts.items())))
@@ -0,0 +1,28 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from wall.data_transfer import DataImporter, open_data_file
+
+
+class Command(BaseCommand):
+    """
+    Command is used to load a file written by export_wall_data into empty tables.
+    """
+    help = "Load users, walls, comments and reactions from an export_wall_data file, then rebuild the search index."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to read, '-' for stdin.")
+        parser.add_argument('--gzip', action='store_true', default=None,
+                            help="Read the input as gzip even if the file name does not end with .gz.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Number of rows created per query.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        try:
+            with open_data_file(options['path'], 'r', compress=options['gzip']) as stream:
+                counts = DataImporter(batch_size=batch_size).run(stream)
+        except (OSError, ValueError) as e:
+            raise CommandError(e)
+        self.stdout.write(self.style.SUCCESS("Imported %s." % ", ".join(
+            "%s %s" % (count, label) for label, count in counts.items())))
+        call_command('rebuild_search_index', batch_size=batch_size, stdout=self.stdout)
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from wall import search
+from wall.models import Wall, Comment, SearchIndexEntry
+
+
+class Command(BaseCommand):
+    """
+    Command is used to rebuild the wall search index from scratch.
+    """
+    help = "Rebuild the inverted index used to search walls by title, content and comments."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Number of walls or comments read and index entries written per query.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        with transaction.atomic():
+            SearchIndexEntry.objects.all().delete()
+            walls = Wall.objects.only('id', 'title', 'content').order_by().iterator(chunk_size=batch_size)
+            wall_count = self.write_entries(walls, search.wall_entries, batch_size)
+            comments = Comment.objects.filter(wall__isnull=False).only('id', 'wall_id', 'comment_content')
+            comment_count = self.write_entries(comments.order_by().iterator(chunk_size=batch_size),
+                                               search.comment_entries, batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            "Indexed %s walls and %s comments." % (wall_count, comment_count)))
+
+    def write_entries(self, objects, build, batch_size):
+        """
+        Function is used to index objects and write their entries in batches.
+        :param objects: iterator of walls or comments.
+        :param build: function returning the index entries of one object.
+        :param batch_size: number of entries written per query.
+        :return: number of indexed objects.
+        """
+        count = 0
+        entries = []
+        for obj in objects:
+            entries.extend(build(obj))
+            count += 1
+            if len(entries) >= batch_size:
+                SearchIndexEntry.objects.bulk_create(entries, batch_size=batch_size)
+                entries = []
+        SearchIndexEntry.objects.bulk_create(entries, batch_size=batch_size)
+        return count
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from wall.counters import reconcile_counters
+from wall.models import Wall
+
+
+class Command(BaseCommand):
+    """
+    Command is used to fix drift in the denormalized like, dislike and comment counters of walls.
+    """
+    help = "Recount likes, dislikes and comments of every wall and fix the stored counters in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Number of walls recounted and locked per transaction.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = 0
+        checked = fixed = 0
+        while True:
+            wall_ids = list(Wall.objects.filter(id__gt=last_id).order_by('id')
+                            .values_list('id', flat=True)[:batch_size])
+            if not wall_ids:
+                break
+            fixed += reconcile_counters(wall_ids)
+            checked += len(wall_ids)
+            last_id = wall_ids[-1]
+        self.stdout.write(self.style.SUCCESS("Checked %s walls, fixed counters of %s." % (checked, fixed)))
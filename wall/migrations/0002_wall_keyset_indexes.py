@@ -0,0 +1,21 @@
+# Generated by Django 3.0.8 on 2026-10-18 08:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wall', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='wall',
+            index=models.Index(fields=['created_on', 'id'], name='wall_created_on_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wall',
+            index=models.Index(fields=['modified_on', 'id'], name='wall_modified_on_id_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.0.8 on 2026-10-18 08:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wall', '0002_wall_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['wall', 'created_on'], name='comment_wall_created_on_idx'),
+        ),
+    ]
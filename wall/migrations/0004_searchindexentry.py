@@ -0,0 +1,24 @@
+# Generated by Django 3.0.8 on 2026-10-18 08:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wall', '0003_comment_wall_created_on_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchIndexEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(db_index=True, max_length=50)),
+                ('weight', models.PositiveIntegerField(default=1)),
+                ('comment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='search_entries', to='wall.Comment')),
+                ('wall', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_entries', to='wall.Wall')),
+            ],
+        ),
+    ]
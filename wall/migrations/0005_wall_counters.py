@@ -0,0 +1,64 @@
+# Generated by Django 3.0.8 on 2026-10-18 08:28
+
+from django.db import migrations, models
+from django.db.models import Count
+
+BATCH_SIZE = 1000
+
+
+def count_by_wall(queryset, wall_field, wall_ids):
+    rows = queryset.filter(**{wall_field + '__in': wall_ids}).order_by().values(wall_field)
+    return dict(rows.annotate(total=Count('pk')).values_list(wall_field, 'total'))
+
+
+def fill_counters(apps, schema_editor):
+    Wall = apps.get_model('wall', 'Wall')
+    Comment = apps.get_model('wall', 'Comment')
+    Like = apps.get_model('wall', 'Like')
+    DisLike = apps.get_model('wall', 'DisLike')
+    db = schema_editor.connection.alias
+    last_id = 0
+    while True:
+        walls = list(Wall.objects.using(db).filter(id__gt=last_id).order_by('id').only('id')[:BATCH_SIZE])
+        if not walls:
+            break
+        wall_ids = [wall.id for wall in walls]
+        likes = count_by_wall(Like.users.through.objects.using(db), 'like__wall', wall_ids)
+        dislikes = count_by_wall(DisLike.users.through.objects.using(db), 'dislike__wall', wall_ids)
+        comments = count_by_wall(Comment.objects.using(db), 'wall', wall_ids)
+        for wall in walls:
+            wall.like_count = likes.get(wall.id, 0)
+            wall.dislike_count = dislikes.get(wall.id, 0)
+            wall.comment_count = comments.get(wall.id, 0)
+        Wall.objects.using(db).bulk_update(walls, ['like_count', 'dislike_count', 'comment_count'])
+        last_id = wall_ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wall', '0004_searchindexentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wall',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='wall',
+            name='dislike_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='wall',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='wall',
+            index=models.Index(fields=['like_count', 'id'], name='wall_like_count_id_idx'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 3.0.8 on 2026-10-18 08:28
+
+from django.conf import settings
+from django.db import migrations, models, transaction
+import django.db.models.deletion
+from django.db.models import Count
+
+BATCH_SIZE = 5000
+
+
+def copy_reactions(apps, schema_editor):
+    """
+    Copies the users of every Like and DisLike row into Reaction rows, walking the M2M tables in id
+    ranges so only one chunk is held in memory. A user found in both tables keeps the like.
+    Every chunk is committed on its own, and copying it again is a no-op thanks to ignore_conflicts.
+    """
+    Reaction = apps.get_model('wall', 'Reaction')
+    db = schema_editor.connection.alias
+    for model_name, relation, kind in (('Like', 'like', 'like'), ('DisLike', 'dislike', 'dislike')):
+        through = apps.get_model('wall', model_name).users.through
+        last_id = 0
+        while True:
+            rows = list(through.objects.using(db).filter(id__gt=last_id).order_by('id')
+                        .values_list('id', relation + '__wall_id', 'user_id')[:BATCH_SIZE])
+            if not rows:
+                break
+            with transaction.atomic(using=db):
+                Reaction.objects.using(db).bulk_create([Reaction(wall_id=wall_id, user_id=user_id, kind=kind)
+                                                        for _, wall_id, user_id in rows], ignore_conflicts=True)
+            last_id = rows[-1][0]
+    recount_reactions(apps, db)
+
+
+def recount_reactions(apps, db):
+    """
+    Recomputes like_count and dislike_count from the Reaction rows, since the dislike of a user found in
+    both tables was counted by 0005 but not copied. Every chunk of walls is committed on its own.
+    """
+    Wall = apps.get_model('wall', 'Wall')
+    Reaction = apps.get_model('wall', 'Reaction')
+    last_id = 0
+    while True:
+        walls = list(Wall.objects.using(db).filter(id__gt=last_id).order_by('id')
+                     .only('id', 'like_count', 'dislike_count')[:BATCH_SIZE])
+        if not walls:
+            break
+        rows = (Reaction.objects.using(db).filter(wall_id__in=[wall.id for wall in walls]).order_by()
+                .values('wall_id', 'kind').annotate(total=Count('pk')).values_list('wall_id', 'kind', 'total'))
+        counts = {(wall_id, kind): total for wall_id, kind, total in rows}
+        drifted = []
+        for wall in walls:
+            like_count, dislike_count = counts.get((wall.id, 'like'), 0), counts.get((wall.id, 'dislike'), 0)
+            if (wall.like_count, wall.dislike_count) != (like_count, dislike_count):
+                wall.like_count, wall.dislike_count = like_count, dislike_count
+                drifted.append(wall)
+        with transaction.atomic(using=db):
+            Wall.objects.using(db).bulk_update(drifted, ['like_count', 'dislike_count'])
+        last_id = walls[-1].id
+
+
+class Migration(migrations.Migration):
+    # The copy commits chunk by chunk instead of holding every copied row in one transaction.
+    atomic = False
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('wall', '0005_wall_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Reaction',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+                ('modified_on', models.DateTimeField(auto_now=True)),
+                ('kind', models.CharField(choices=[('like', 'Like'), ('dislike', 'Dislike')], max_length=7)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='wall_reactions', to=settings.AUTH_USER_MODEL)),
+                ('wall', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reactions', to='wall.Wall')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='reaction',
+            constraint=models.UniqueConstraint(fields=('wall', 'user'), name='reaction_unique_wall_user'),
+        ),
+        migrations.RunPython(copy_reactions, migrations.RunPython.noop),
+    ]
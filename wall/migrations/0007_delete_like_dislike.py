@@ -0,0 +1,27 @@
+# Generated by Django 3.0.8 on 2026-10-18 08:29
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wall', '0006_reaction'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='like',
+            name='users',
+        ),
+        migrations.RemoveField(
+            model_name='like',
+            name='wall',
+        ),
+        migrations.DeleteModel(
+            name='DisLike',
+        ),
+        migrations.DeleteModel(
+            name='Like',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.8 on 2026-10-18 08:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wall', '0007_delete_like_dislike'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wall',
+            name='last_activity_on',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.0.8 on 2026-10-18 10:09
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('wall', '0008_wall_last_activity_on'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingReaction',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('like', 'Like'), ('dislike', 'Dislike')], max_length=7, null=True)),
+                ('stored_kind', models.CharField(choices=[('like', 'Like'), ('dislike', 'Dislike')], max_length=7, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_wall_reactions', to=settings.AUTH_USER_MODEL)),
+                ('wall', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_reactions', to='wall.Wall')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='pendingreaction',
+            constraint=models.UniqueConstraint(fields=('wall', 'user'), name='pending_reaction_unique_wall_user'),
+        ),
+    ]
@@ -1,4 +1,6 @@
-from django.db import models
+from django.conf import settings
+from django.db import connection, models
+from django.db.models.expressions import RawSQL
 from users.models import User, BaseModel
 
 
@@ -17,6 +19,51 @@ class CommonModel(models.Model):
         abstract = True
 
 
+def comment_preview_queryset(wall_ids):
+    """
+    Function is used to build the queryset of the newest WALL_COMMENT_PREVIEW_SIZE comments of some walls,
+    newest first. The comments are ranked per wall with ROW_NUMBER() over the walls asked for only, so the
+    (wall, created_on) index is read for those walls instead of a correlated subquery run for every comment.
+    :param wall_ids: ids of the walls.
+    :return: Comment queryset.
+    """
+    wall_ids = list(wall_ids)
+    if not wall_ids:
+        return Comment.objects.none()
+    table = connection.ops.quote_name(Comment._meta.db_table)
+    ranked = ("SELECT id FROM (SELECT id, ROW_NUMBER() OVER (PARTITION BY wall_id ORDER BY created_on DESC, id DESC)"
+              " AS position FROM %s WHERE wall_id IN (%s)) AS ranked WHERE position <= %%s"
+              % (table, ', '.join(['%s'] * len(wall_ids))))
+    latest = RawSQL(ranked, wall_ids + [settings.WALL_COMMENT_PREVIEW_SIZE])
+    return Comment.objects.filter(id__in=latest).order_by('-created_on', '-id')
+
+
+def attach_comment_previews(walls):
+    """
+    Function is used to load the newest WALL_COMMENT_PREVIEW_SIZE comments of some walls, with their authors,
+    in a single query and store them in comment_preview, which Wall.recent_comments reads.
+    :param walls: Wall instances.
+    :return: list of the walls.
+    """
+    walls = list(walls)
+    previews = {wall.id: [] for wall in walls}
+    comments = comment_preview_queryset(previews).select_related('created_by', 'modified_by')
+    for comment in comments:
+        previews[comment.wall_id].append(comment)
+    for wall in walls:
+        wall.comment_preview = previews[wall.id]
+    return walls
+
+
+class WallQuerySet(models.QuerySet):
+    """
+    QuerySet for the Wall model with the query plan used to serialize walls.
+    """
+
+    def with_authors(self):
+        return self.select_related('created_by', 'modified_by')
+
+
 # Create your models here.
 class Wall(BaseModel, CommonModel):
     """
@@ -28,20 +75,41 @@ class Wall(BaseModel, CommonModel):
     """
     title = models.CharField(max_length=50, unique=True)
     content = models.TextField()
+    like_count = models.PositiveIntegerField(default=0)
+    dislike_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    last_activity_on = models.DateTimeField(auto_now=True)
+
+    objects = WallQuerySet.as_manager()
 
     @property
     def get_total_likes(self):
-        return self.likes.users.count()
+        return self.like_count
 
     @property
     def get_total_dis_likes(self):
-        return self.dis_likes.users.count()
+        return self.dislike_count
+
+    @property
+    def recent_comments(self):
+        """
+        Newest comments of the wall, limited to WALL_COMMENT_PREVIEW_SIZE.
+        """
+        if hasattr(self, 'comment_preview'):
+            return self.comment_preview
+        comments = self.comments.select_related('created_by', 'modified_by').order_by('-created_on', '-id')
+        return comments[:settings.WALL_COMMENT_PREVIEW_SIZE]
 
     def __str__(self):
         return self.title
 
     class Meta:
         ordering = ['-created_on']
+        indexes = [
+            models.Index(fields=['created_on', 'id'], name='wall_created_on_id_idx'),
+            models.Index(fields=['modified_on', 'id'], name='wall_modified_on_id_idx'),
+            models.Index(fields=['like_count', 'id'], name='wall_like_count_id_idx'),
+        ]
 
 
 class Comment(BaseModel, CommonModel):
@@ -60,30 +128,70 @@ class Comment(BaseModel, CommonModel):
 
     class Meta:
         ordering = ['-created_on']
+        indexes = [
+            models.Index(fields=['wall', 'created_on'], name='comment_wall_created_on_idx'),
+        ]
 
 
-class Like(BaseModel):
+class Reaction(BaseModel):
     """
-    Like class is define for the keep the Like details and other information.
+    Reaction class is define for the keep the like or dislike of a user on a wall.
+    A user has at most one reaction per wall.
     :param BaseModel: Base class which has common attribute for the
     application.
     """
-    wall = models.OneToOneField(Wall, related_name="likes", on_delete=models.CASCADE)
-    users = models.ManyToManyField(User, related_name='requirement_wall_likes', blank=True)
+    LIKE = 'like'
+    DISLIKE = 'dislike'
+    KIND_CHOICES = (
+        (LIKE, 'Like'),
+        (DISLIKE, 'Dislike'),
+    )
+
+    wall = models.ForeignKey(Wall, related_name="reactions", on_delete=models.CASCADE)
+    user = models.ForeignKey(User, related_name="wall_reactions", on_delete=models.CASCADE)
+    kind = models.CharField(max_length=7, choices=KIND_CHOICES)
 
     def __str__(self):
-        return str(self.comment.comment)[:30]
+        return "%s %s" % (self.user_id, self.kind)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['wall', 'user'], name='reaction_unique_wall_user'),
+        ]
 
 
-class DisLike(BaseModel):
+class PendingReaction(models.Model):
     """
-    DisLike class is define for the keep the DisLike details and other information.
-    :param BaseModel: Base class which has common attribute for the
-    application.
+    PendingReaction class is define for the keep the reaction of a user on a wall toggled through the
+    write-behind buffer and not written to Reaction yet. A user has at most one pending reaction per wall.
     """
+    wall = models.ForeignKey(Wall, related_name="pending_reactions", on_delete=models.CASCADE)
+    user = models.ForeignKey(User, related_name="pending_wall_reactions", on_delete=models.CASCADE)
+    # Reaction after the buffered toggles, null when they removed it.
+    kind = models.CharField(max_length=7, choices=Reaction.KIND_CHOICES, null=True)
+    # Stored reaction the toggles started from, used to show the counters of the wall until the flush.
+    stored_kind = models.CharField(max_length=7, choices=Reaction.KIND_CHOICES, null=True)
 
-    wall = models.OneToOneField(Wall, related_name="dis_likes", on_delete=models.CASCADE)
-    users = models.ManyToManyField(User, related_name='requirement_wall_dis_likes', blank=True)
+    def __str__(self):
+        return "%s %s" % (self.user_id, self.kind)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['wall', 'user'], name='pending_reaction_unique_wall_user'),
+        ]
+
+
+class SearchIndexEntry(models.Model):
+    """
+    SearchIndexEntry class is define for the keep one term of the inverted index used to search walls.
+    Entries of the wall title and content have no comment, entries of a comment point to it so they can be
+    replaced or removed together with the comment.
+    """
+    term = models.CharField(max_length=50, db_index=True)
+    wall = models.ForeignKey(Wall, related_name="search_entries", on_delete=models.CASCADE)
+    comment = models.ForeignKey(Comment, null=True, blank=True, related_name="search_entries",
+                                on_delete=models.CASCADE)
+    weight = models.PositiveIntegerField(default=1)
 
     def __str__(self):
-        return str(self.wall.title)[:30]
+        return self.term
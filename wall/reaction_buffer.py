@@ -0,0 +1,291 @@
+import atexit
+import logging
+import operator
+import threading
+import time
+from collections import Counter
+from functools import reduce
+from itertools import islice
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from users.models import User
+from wall.counters import adjust_counters
+from wall.models import Wall, PendingReaction, Reaction
+from wall.reactions import COUNTERS, MAX_ATTEMPTS, toggle_reaction
+from wall.signals import send_wall_changed
+
+logger = logging.getLogger('django')
+
+"""
+    This module contains the optional write-behind mode of the like/dislike toggles, turned on with
+    REACTION_WRITE_BEHIND.
+
+    Toggles are recorded in the PendingReaction table, which every process shares and which keeps only the
+    final reaction of every (wall, user): a toggle locks the row of its (wall, user) only, never the row of the
+    wall, so the toggles of two processes are coalesced without contending on a viral wall. A flusher thread
+    in every process writes the pending reactions in bulk every REACTION_FLUSH_INTERVAL seconds. Until then the
+    read paths of every process add the counter deltas of the pending reactions to the walls they send.
+"""
+
+# Key of each counter in the serialized walls.
+PAYLOAD_FIELDS = {'like_count': 'likes', 'dislike_count': 'dis_likes'}
+# Largest number of (wall, user) keys matched by one query, below the expression depth and the 999 query
+# parameters allowed by SQLite.
+MATCH_BATCH_SIZE = 400
+
+
+def contribution(kind):
+    """
+    Function is used to get the counters a reaction adds to its wall.
+    :param kind: Reaction.LIKE, Reaction.DISLIKE or None.
+    :return: Counter of counter name to 1.
+    """
+    return Counter({COUNTERS[kind]: 1}) if kind else Counter()
+
+
+def matching(keys):
+    return reduce(operator.or_, (Q(wall_id=wall_id, user_id=user_id) for wall_id, user_id in keys))
+
+
+def batches(keys, size=MATCH_BATCH_SIZE):
+    """
+    Function is used to split (wall, user) keys in lists small enough to be matched by one query.
+    :param keys: iterable of (wall id, user id).
+    :param size: largest number of keys in a list.
+    :return: iterator of lists of keys.
+    """
+    keys = iter(keys)
+    return iter(lambda: list(islice(keys, size)), [])
+
+
+class ReactionBuffer:
+    """
+    Write-behind buffer of reaction toggles, coalesced per (wall, user) in the PendingReaction table.
+
+    Only the first toggle of a (wall, user) since the last flush reads the stored reaction, the next ones only
+    change the pending one. A flush locks the pending rows and the walls and reads their stored reactions again,
+    so reactions written meanwhile are counted correctly. A failed flush rolls back and leaves the pending
+    rows for the next one.
+    """
+
+    def __init__(self, interval=None):
+        """
+        :param interval: seconds between two flushes, 0 to only flush when flush() is called and None to read
+        REACTION_FLUSH_INTERVAL.
+        """
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.thread = None
+        self.flushes = 0
+        self.written = 0
+
+    def stored_reaction(self, wall_id, user_id):
+        """
+        Function is used to read the reaction of a user on a wall, checking the wall exists in the same query.
+        :param wall_id: id of the wall.
+        :param user_id: id of the user.
+        :return: Reaction.LIKE, Reaction.DISLIKE or None.
+        """
+        kind = Reaction.objects.filter(wall=OuterRef('pk'), user_id=user_id).values('kind')[:1]
+        rows = list(Wall.objects.filter(id=wall_id).annotate(kind=Subquery(kind)).values_list('kind', flat=True))
+        if not rows:
+            raise Wall.DoesNotExist("Wall matching query does not exist.")
+        return rows[0]
+
+    def toggle(self, wall_id, user_id, kind):
+        """
+        Function is used to record a toggle without writing it to Reaction.
+        :param wall_id: id of the wall.
+        :param user_id: id of the user who reacted.
+        :param kind: Reaction.LIKE or Reaction.DISLIKE.
+        :return: the reaction of the user after the toggle, None if it was removed.
+        """
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                state = self._toggle(wall_id, user_id, kind)
+                break
+            except IntegrityError:
+                # a toggle of the same user in another process created the pending row first, start over from it
+                if attempt == MAX_ATTEMPTS - 1:
+                    raise
+        self.start()
+        return state
+
+    def _toggle(self, wall_id, user_id, kind):
+        with transaction.atomic():
+            pending = PendingReaction.objects.select_for_update().filter(wall_id=wall_id, user_id=user_id).first()
+            if pending is not None:
+                pending.kind = None if pending.kind == kind else kind
+                pending.save(update_fields=['kind'])
+                return pending.kind
+            stored = self.stored_reaction(wall_id, user_id)
+            state = None if stored == kind else kind
+            PendingReaction.objects.create(wall_id=wall_id, user_id=user_id, kind=state, stored_kind=stored)
+            return state
+
+    def pending_deltas(self, wall_ids):
+        """
+        Function is used to get the counter deltas of the pending reactions of walls.
+        :param wall_ids: ids of the walls.
+        :return: dict of wall id to a dict of its non zero counter deltas, for the walls having some.
+        """
+        if not settings.REACTION_WRITE_BEHIND or not wall_ids:
+            return {}
+        rows = (PendingReaction.objects.filter(wall_id__in=wall_ids).order_by()
+                .values('wall_id', 'kind', 'stored_kind').annotate(total=Count('pk')))
+        deltas = {}
+        for row in rows:
+            counter = deltas.setdefault(row['wall_id'], Counter())
+            for field in contribution(row['kind']):
+                counter[field] += row['total']
+            for field in contribution(row['stored_kind']):
+                counter[field] -= row['total']
+        pending = {}
+        for wall_id, counter in deltas.items():
+            counter = {field: delta for field, delta in counter.items() if delta}
+            if counter:
+                pending[wall_id] = counter
+        return pending
+
+    def merge(self, walls, wall_ids):
+        """
+        Function is used to add the counter deltas of the pending reactions to serialized walls.
+        :param walls: list of serialized walls.
+        :param wall_ids: id of every wall of the list, since the fieldset may leave the id out.
+        :return: list of serialized walls, the changed ones being copies.
+        """
+        pending = self.pending_deltas(wall_ids)
+        if not pending:
+            return walls
+        merged = []
+        for wall, wall_id in zip(walls, wall_ids):
+            if wall_id in pending:
+                wall = dict(wall)
+                for field, delta in pending[wall_id].items():
+                    if PAYLOAD_FIELDS[field] in wall:
+                        wall[PAYLOAD_FIELDS[field]] = max(wall[PAYLOAD_FIELDS[field]] + delta, 0)
+            merged.append(wall)
+        return merged
+
+    def flush(self):
+        """
+        Function is used to write the pending reactions in one transaction with bulk queries.
+        Toggles of the pending reactions wait for the flush, which deletes the rows it wrote.
+        :return: number of (wall, user) reactions which changed.
+        """
+        with transaction.atomic():
+            rows = list(PendingReaction.objects.select_for_update().order_by('id')
+                        .values_list('id', 'wall_id', 'user_id', 'kind'))
+            if not rows:
+                return 0
+            deltas, written = self.write({(wall_id, user_id): kind for _, wall_id, user_id, kind in rows})
+            for batch in batches(pending_id for pending_id, _, _, _ in rows):
+                PendingReaction.objects.filter(id__in=batch).delete()
+        for wall_id in deltas:
+            send_wall_changed(Reaction, wall_id)
+        return written
+
+    def write(self, reactions):
+        """
+        Function is used to write reactions, inside a transaction.
+        :param reactions: dict of (wall id, user id) to the final reaction.
+        :return: tuple of (dict of wall id to the Counter of the deltas applied to its counters,
+        number of written reactions).
+        """
+        with transaction.atomic():
+            wall_ids = set(Wall.objects.select_for_update().filter(
+                id__in={wall_id for wall_id, user_id in reactions}).order_by('id').values_list('id', flat=True))
+            user_ids = set(User.objects.filter(
+                id__in={user_id for wall_id, user_id in reactions}).values_list('id', flat=True))
+            # Reactions of walls or users deleted since the toggle are dropped.
+            keys = [key for key in reactions if key[0] in wall_ids and key[1] in user_ids]
+            stored = {}
+            for batch in batches(keys):
+                stored.update(((row[0], row[1]), row[2]) for row in
+                              Reaction.objects.filter(matching(batch)).values_list('wall_id', 'user_id', 'kind'))
+            removed, created, changed = [], [], {Reaction.LIKE: [], Reaction.DISLIKE: []}
+            deltas = {}
+            for key in keys:
+                current, state = stored.get(key), reactions[key]
+                if current == state:
+                    continue
+                if state is None:
+                    removed.append(key)
+                elif current is None:
+                    created.append(Reaction(wall_id=key[0], user_id=key[1], kind=state))
+                else:
+                    changed[state].append(key)
+                counter = deltas.setdefault(key[0], Counter())
+                counter.update(contribution(state))
+                counter.subtract(contribution(current))
+            for batch in batches(removed):
+                Reaction.objects.filter(matching(batch)).delete()
+            for kind, kind_keys in changed.items():
+                for batch in batches(kind_keys):
+                    Reaction.objects.filter(matching(batch)).update(kind=kind, modified_on=timezone.now())
+            Reaction.objects.bulk_create(created)
+            for wall_id, counter in deltas.items():
+                adjust_counters(wall_id, **counter)
+        written = len(removed) + len(created) + sum(len(kind_keys) for kind_keys in changed.values())
+        self.flushes += 1
+        self.written += written
+        return deltas, written
+
+    def start(self):
+        """
+        Function is used to start the flusher thread of this process, once.
+        """
+        interval = settings.REACTION_FLUSH_INTERVAL if self.interval is None else self.interval
+        if not interval or self.thread is not None:
+            return
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self.run, args=(interval,), name='reaction-flusher', daemon=True)
+            self.thread.start()
+        atexit.register(self.flush)
+
+    def run(self, interval):
+        """
+        Function is used to flush the buffer every interval seconds, in the flusher thread.
+        """
+        while True:
+            time.sleep(interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.exception(e)
+            finally:
+                connection.close()
+
+    def stats(self):
+        """
+        Function is used to get the state of the buffer.
+        :return: dict with the number of pending reactions, and the flushes and written reactions of this process.
+        """
+        return {'pending': PendingReaction.objects.count(), 'flushes': self.flushes, 'written': self.written}
+
+    def clear(self):
+        with self.lock:
+            self.flushes = 0
+            self.written = 0
+
+
+reaction_buffer = ReactionBuffer()
+
+
+def record_reaction(wall_id, user_id, kind):
+    """
+    Function is used to toggle a reaction, through the write-behind buffer when REACTION_WRITE_BEHIND is on.
+    :param wall_id: id of the wall.
+    :param user_id: id of the user who reacted.
+    :param kind: Reaction.LIKE or Reaction.DISLIKE.
+    :return: the reaction of the user after the toggle, None if it was removed.
+    """
+    if settings.REACTION_WRITE_BEHIND:
+        return reaction_buffer.toggle(wall_id, user_id, kind)
+    return toggle_reaction(wall_id, user_id, kind)
@@ -0,0 +1,49 @@
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from wall.counters import adjust_counters
+from wall.models import Wall, Reaction
+from wall.signals import send_wall_changed
+
+"""
+    This module contains the like/dislike toggle of a user on a wall.
+"""
+
+COUNTERS = {Reaction.LIKE: 'like_count', Reaction.DISLIKE: 'dislike_count'}
+MAX_ATTEMPTS = 3
+
+
+def toggle_reaction(wall_id, user_id, kind):
+    """
+    Function is used to toggle the like or dislike of a user on a wall. Every step is a single statement on
+    the unique (wall, user) index, so the membership check never loads other users' reactions.
+    :param wall_id: id of the wall.
+    :param user_id: id of the user who reacted.
+    :param kind: Reaction.LIKE or Reaction.DISLIKE.
+    :return: the reaction of the user after the toggle, None if it was removed.
+    """
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                state, deltas = _toggle(wall_id, user_id, kind)
+                if not adjust_counters(wall_id, **deltas):
+                    raise Wall.DoesNotExist("Wall matching query does not exist.")
+            send_wall_changed(Reaction, wall_id)
+            return state
+        except IntegrityError:
+            # a concurrent toggle of the same user inserted the row first, start over from its state
+            if attempt == MAX_ATTEMPTS - 1:
+                raise
+
+
+def _toggle(wall_id, user_id, kind):
+    reactions = Reaction.objects.filter(wall_id=wall_id, user_id=user_id)
+    deleted, _ = reactions.filter(kind=kind).delete()
+    if deleted:
+        return None, {COUNTERS[kind]: -1}
+    other = Reaction.DISLIKE if kind == Reaction.LIKE else Reaction.LIKE
+    if reactions.update(kind=kind, modified_on=timezone.now()):
+        return kind, {COUNTERS[kind]: 1, COUNTERS[other]: -1}
+    with transaction.atomic():
+        Reaction.objects.create(wall_id=wall_id, user_id=user_id, kind=kind)
+    return kind, {COUNTERS[kind]: 1}
@@ -0,0 +1,111 @@
+import operator
+import re
+from collections import Counter
+from functools import reduce
+
+from django.db.models import Case, IntegerField, Max, Q, Sum, When
+
+from wall.models import SearchIndexEntry
+
+"""
+    This module contains the inverted index used to search walls by title, content and comments.
+"""
+
+TITLE_WEIGHT = 3
+CONTENT_WEIGHT = 1
+COMMENT_WEIGHT = 1
+MAX_TERM_LENGTH = 50
+STOP_WORDS = frozenset(['a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'in', 'is', 'it', 'of', 'on',
+                        'or', 'the', 'to', 'was', 'with'])
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """
+    Function is used to split a text into lower case index terms.
+    :param text: text to split.
+    :return: list of terms.
+    """
+    return [token[:MAX_TERM_LENGTH] for token in TOKEN_RE.findall((text or '').lower())]
+
+
+def build_entries(wall_id, weighted_texts, comment_id=None):
+    """
+    Function is used to build the index entries of one document.
+    :param wall_id: id of the wall the document belongs to.
+    :param weighted_texts: list of (text, weight) tuples.
+    :param comment_id: id of the comment if the document is a comment.
+    :return: list of unsaved SearchIndexEntry objects.
+    """
+    weights = Counter()
+    for text, weight in weighted_texts:
+        for term in tokenize(text):
+            if term not in STOP_WORDS:
+                weights[term] += weight
+    return [SearchIndexEntry(term=term, wall_id=wall_id, comment_id=comment_id, weight=weight)
+            for term, weight in weights.items()]
+
+
+def wall_entries(wall):
+    return build_entries(wall.id, [(wall.title, TITLE_WEIGHT), (wall.content, CONTENT_WEIGHT)])
+
+
+def comment_entries(comment):
+    if not comment.wall_id:
+        return []
+    return build_entries(comment.wall_id, [(comment.comment_content, COMMENT_WEIGHT)], comment_id=comment.id)
+
+
+def index_wall(wall):
+    """
+    Function is used to replace the index entries of the title and content of a wall.
+    :param wall: Wall object.
+    """
+    index_walls([wall])
+
+
+def index_walls(walls):
+    """
+    Function is used to replace the index entries of the title and content of many walls in two queries.
+    :param walls: list of Wall objects.
+    """
+    SearchIndexEntry.objects.filter(wall_id__in=[wall.id for wall in walls], comment__isnull=True).delete()
+    SearchIndexEntry.objects.bulk_create([entry for wall in walls for entry in wall_entries(wall)])
+
+
+def index_comment(comment):
+    """
+    Function is used to replace the index entries of a comment.
+    :param comment: Comment object.
+    """
+    index_comments([comment])
+
+
+def index_comments(comments):
+    """
+    Function is used to replace the index entries of many comments in two queries.
+    :param comments: list of Comment objects.
+    """
+    SearchIndexEntry.objects.filter(comment_id__in=[comment.id for comment in comments]).delete()
+    SearchIndexEntry.objects.bulk_create([entry for comment in comments for entry in comment_entries(comment)])
+
+
+def search_walls(query):
+    """
+    Function is used to find the walls matching every term of a search query, best match first.
+    The last term is matched as a prefix so results can be shown while the user is still typing.
+    :param query: search text sent by the client.
+    :return: values queryset of {'wall': id, 'score': relevance}.
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return SearchIndexEntry.objects.none().values('wall')
+    # The last token may be an unfinished word such as "the" of "theatre", so it is kept even if it is a stop word.
+    terms = [term for term in tokens[:-1] if term not in STOP_WORDS] + tokens[-1:]
+    conditions = [Q(term=term) for term in terms[:-1]] + [Q(term__startswith=terms[-1])]
+    matched = [Max(Case(When(condition, then=1), default=0, output_field=IntegerField()))
+               for condition in conditions]
+    entries = SearchIndexEntry.objects.filter(reduce(operator.or_, conditions))
+    return entries.values('wall').annotate(score=Sum('weight'), matched=sum(matched[1:], matched[0])).filter(
+        matched=len(conditions)).values('wall', 'score').order_by('-score', '-wall')
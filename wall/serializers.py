@@ -1,6 +1,10 @@
 import datetime
+from django.db import transaction
 from rest_framework import serializers
-from wall.models import Wall, Comment, Like, DisLike
+from fieldset_utils import SparseFieldsetMixin
+from wall.counters import adjust_counters
+from wall.models import Wall, Comment
+from wall.signals import send_wall_changed
 
 
 class CommentSerializer(serializers.ModelSerializer):
@@ -19,7 +23,9 @@ class CommentSerializer(serializers.ModelSerializer):
         """
         validated_data['created_by'] = self.context['request'].user
         validated_data['modified_by'] = self.context['request'].user
-        comment = Comment.objects.create(**validated_data)
+        with transaction.atomic():
+            comment = Comment.objects.create(**validated_data)
+            adjust_counters(comment.wall_id, comment_count=1)
         return comment
 
     def update(self, instance, validated_data):
@@ -31,7 +37,17 @@ class CommentSerializer(serializers.ModelSerializer):
         """
         instance.modified_on = datetime.datetime.now()
         instance.modified_by = self.context['request'].user
-        return super(CommentSerializer, self).update(instance, validated_data)
+        old_wall_id = instance.wall_id
+        with transaction.atomic():
+            comment = super(CommentSerializer, self).update(instance, validated_data)
+            if comment.wall_id != old_wall_id:
+                adjust_counters(old_wall_id, comment_count=-1)
+                adjust_counters(comment.wall_id, comment_count=1)
+            else:
+                adjust_counters(comment.wall_id)
+        if old_wall_id and comment.wall_id != old_wall_id:
+            send_wall_changed(Comment, old_wall_id)
+        return comment
 
     def get_modified_by(self, obj):
         return obj.created_by.username
@@ -45,11 +61,19 @@ class CommentSerializer(serializers.ModelSerializer):
                   'modified_on', 'created_by', 'modified_by')
 
 
-class WallSerializer(serializers.ModelSerializer):
+class WallSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     serializer to handle turning our `Wall` object into
     something that can be JSONified and sent to the client
     """
+    expandable_fields = ('comments',)
+    field_sources = {
+        'likes': ('like_count',),
+        'dis_likes': ('dislike_count',),
+        'comments': (),
+        'created_by': ('created_by', 'created_by__username'),
+        'modified_by': ('modified_by', 'modified_by__username'),
+    }
     created_by = serializers.SerializerMethodField()
     modified_by = serializers.SerializerMethodField()
     likes = serializers.ReadOnlyField(source='get_total_likes')
@@ -64,8 +88,6 @@ class WallSerializer(serializers.ModelSerializer):
         validated_data['created_by'] = self.context['request'].user
         validated_data['modified_by'] = self.context['request'].user
         wall = Wall.objects.create(**validated_data)
-        Like.objects.create(wall=wall)
-        DisLike.objects.create(wall=wall)
         return wall
 
     def update(self, instance, validated_data):
@@ -87,9 +109,10 @@ class WallSerializer(serializers.ModelSerializer):
         if obj.created_by:
             return obj.created_by.username
 
-    comments = CommentSerializer(many=True, required=False)
+    comments = CommentSerializer(many=True, read_only=True, source='recent_comments')
+    comment_count = serializers.ReadOnlyField()
 
     class Meta:
         model = Wall
-        fields = ('id', 'title', 'content', 'likes', 'dis_likes', 'created_on', 'comments',
+        fields = ('id', 'title', 'content', 'likes', 'dis_likes', 'created_on', 'comments', 'comment_count',
                   'modified_on', 'created_by', 'modified_by')
@@ -0,0 +1,108 @@
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from users.models import User
+from wall import search
+from wall.cache import wall_detail_cache, wall_list_cache
+from wall.models import Wall, Comment, Reaction
+
+SEARCHABLE_WALL_FIELDS = {'title', 'content'}
+
+# Sent with wall_id whenever anything shown in the payload of a wall changes: the wall itself,
+# its comments or its reactions.
+wall_changed = Signal()
+
+
+def send_wall_changed(sender, wall_id):
+    """
+    Function is used to send wall_changed once the transaction of the change is committed, so a request
+    rebuilding the cached payload after the invalidation reads the new rows. Outside of a transaction it is
+    sent at once.
+    :param sender: model class of the changed object.
+    :param wall_id: id of the changed wall.
+    """
+    transaction.on_commit(lambda: wall_changed.send(sender=sender, wall_id=wall_id))
+
+
+@receiver(post_save, sender=Wall)
+def wall_saved(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Keeps the search index of a wall up to date when its title or content is saved.
+    :param sender: Wall model class.
+    :param instance: saved Wall object.
+    :param created: True if a new wall was inserted.
+    :param update_fields: fields passed to save(), None if every field was saved.
+    :return:
+    """
+    if update_fields is None or SEARCHABLE_WALL_FIELDS & set(update_fields):
+        search.index_wall(instance)
+    send_wall_changed(sender, instance.id)
+
+
+@receiver(post_delete, sender=Wall)
+def wall_deleted(sender, instance, **kwargs):
+    send_wall_changed(sender, instance.id)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    """
+    Keeps the search index of a comment up to date. Deleted walls and comments drop their
+    index entries through the cascading foreign keys.
+    :param sender: Comment model class.
+    :param instance: saved Comment object.
+    :param created: True if a new comment was inserted.
+    :return:
+    """
+    search.index_comment(instance)
+    if instance.wall_id:
+        send_wall_changed(sender, instance.wall_id)
+
+
+@receiver(wall_changed)
+def invalidate_wall_detail(sender, wall_id, **kwargs):
+    wall_detail_cache.invalidate(wall_id)
+
+
+@receiver(wall_changed)
+def invalidate_wall_list(sender, wall_id, **kwargs):
+    # A reaction only changes counters, which only the pages sorted by them must show at once.
+    wall_list_cache.invalidate(reactions=sender is Reaction)
+
+
+def authored_wall_ids(user_id):
+    """
+    Function is used to find the walls showing the username of a user, as author of the wall or of a comment.
+    :param user_id: id of the user.
+    :return: set of wall ids.
+    """
+    wall_ids = set(Wall.objects.filter(Q(created_by_id=user_id) | Q(modified_by_id=user_id))
+                   .values_list('id', flat=True))
+    wall_ids.update(Comment.objects.filter(Q(created_by_id=user_id) | Q(modified_by_id=user_id))
+                    .values_list('wall_id', flat=True))
+    return wall_ids
+
+
+@receiver(pre_save, sender=User)
+def user_renamed(sender, instance, update_fields=None, **kwargs):
+    """
+    Makes the cached payloads of the walls showing the username of a user stale once a new username is
+    committed. The list pages share one generation, which is bumped once whatever the number of walls.
+    :param sender: User model class.
+    :param instance: User object about to be saved.
+    :param update_fields: fields passed to save(), None if every field is saved.
+    :return:
+    """
+    if instance.pk is None or (update_fields is not None and 'username' not in update_fields):
+        return
+    if not User.objects.filter(pk=instance.pk).exclude(username=instance.username).exists():
+        return
+
+    def invalidate():
+        for wall_id in authored_wall_ids(instance.pk):
+            wall_detail_cache.invalidate(wall_id)
+        wall_list_cache.invalidate()
+
+    transaction.on_commit(invalidate)
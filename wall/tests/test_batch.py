@@ -0,0 +1,112 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+import constants
+from users.models import User
+from wall.cache import wall_detail_cache
+from wall.models import Wall, Comment
+from wall.search import search_walls
+from wall.views import WallsBatch, CommentsBatch, WallDetails
+from wall.tests.utils import run_on_commit_at_once
+
+
+class TestBatch(TestCase):
+
+    def setUp(self):
+        run_on_commit_at_once(self)
+        self.factory = APIRequestFactory()
+        self.user = User.objects.create(username="author", first_name="author", email="author@gmail.com")
+        self.wall = Wall.objects.create(title="Existing wall", content="content", created_by=self.user,
+                                        modified_by=self.user)
+        self.other_wall = Wall.objects.create(title="Other wall", content="content", created_by=self.user,
+                                              modified_by=self.user)
+
+    def post(self, view, url_name, data):
+        request = self.factory.post(reverse(url_name), data, format='json')
+        force_authenticate(request, user=self.user)
+        return view.as_view()(request)
+
+    def search(self, query):
+        return [row['wall'] for row in search_walls(query)]
+
+    def test_wall_batch(self):
+        wall_detail_cache.clear()
+        detail_url = reverse('wall_details', kwargs={'pk': self.wall.id})
+        WallDetails.as_view()(self.factory.get(detail_url), self.wall.id)
+        response = self.post(WallsBatch, 'walls_batch', {
+            "create": [{"title": "Batch one", "content": "sourdough"}, {"title": "Batch two", "content": "rye"}],
+            "update": [{"id": self.wall.id, "title": "Renamed wall"}],
+            "delete": [self.other_wall.id],
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["message"], constants.BATCH_SUCCESS)
+        created = response.data["data"]["create"]
+        self.assertEqual([item["data"]["title"] for item in created], ["Batch one", "Batch two"])
+        self.assertEqual(created[0]["data"]["created_by"], self.user.username)
+        self.assertEqual(response.data["data"]["update"][0]["data"]["title"], "Renamed wall")
+        self.assertEqual(response.data["data"]["delete"], [
+            {"status": 1, "message": constants.DELETE_WALL_SUCCESS, "id": self.other_wall.id}])
+
+        self.assertEqual(set(Wall.objects.values_list('title', flat=True)),
+                         {"Batch one", "Batch two", "Renamed wall"})
+        self.assertEqual(self.search("sourdough"), [created[0]["data"]["id"]])
+        self.assertEqual(self.search("renamed"), [self.wall.id])
+        response = WallDetails.as_view()(self.factory.get(detail_url), self.wall.id)
+        self.assertEqual(response.data["data"]["title"], "Renamed wall")
+
+    def test_invalid_item_writes_nothing(self):
+        response = self.post(WallsBatch, 'walls_batch', {
+            "create": [{"title": "Valid", "content": "content"}, {"title": "Existing wall", "content": "content"}],
+            "update": [{"title": "No id"}, {"id": 0, "title": "Missing"}],
+            "delete": [self.wall.id, self.wall.id],
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["message"], constants.BATCH_FAILED)
+        results = response.data["data"]
+        self.assertIsNone(results["create"][0])
+        self.assertEqual(results["create"][1]["message"], "wall with this title already exists.")
+        self.assertEqual([item["message"] for item in results["update"]],
+                         [constants.ID_REQUIRED, constants.WALL_DOES_NOT_EXIST])
+        self.assertEqual([item["message"] for item in results["delete"]], [constants.DUPLICATE_BATCH_ITEM] * 2)
+        self.assertFalse(Wall.objects.filter(title="Valid").exists())
+
+    def test_conflicting_items_roll_back(self):
+        response = self.post(WallsBatch, 'walls_batch', {
+            "create": [{"title": "Twin", "content": "one"}, {"title": "Twin", "content": "two"}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["message"], constants.BATCH_CONFLICT)
+        self.assertFalse(Wall.objects.filter(title="Twin").exists())
+
+    @override_settings(BATCH_WRITE_MAX_ITEMS=2)
+    def test_batch_size_and_shape_are_checked(self):
+        response = self.post(WallsBatch, 'walls_batch', {"delete": [1, 2, 3]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["message"], constants.BATCH_TOO_LARGE % 2)
+        response = self.post(WallsBatch, 'walls_batch', {"create": {"title": "not a list"}})
+        self.assertEqual(response.data["message"], constants.INVALID_BATCH)
+
+    def test_comment_batch_moves_counters(self):
+        first = Comment.objects.create(comment_content="first", wall=self.wall, created_by=self.user)
+        second = Comment.objects.create(comment_content="second", wall=self.wall, created_by=self.user)
+        Wall.objects.filter(id=self.wall.id).update(comment_count=2)
+        with self.assertNumQueries(17):
+            response = self.post(CommentsBatch, 'comments_batch', {
+                "create": [{"wall": self.wall.id, "comment_content": "baguette"},
+                           {"wall": self.other_wall.id, "comment_content": "croissant"}],
+                "update": [{"id": first.id, "wall": self.other_wall.id}],
+                "delete": [second.id],
+            })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["data"]["create"][0]["data"]["comment_content"], "baguette")
+        self.assertEqual(response.data["data"]["update"][0]["data"]["wall"], self.other_wall.id)
+        self.wall.refresh_from_db()
+        self.other_wall.refresh_from_db()
+        self.assertEqual(self.wall.comment_count, 1)
+        self.assertEqual(self.other_wall.comment_count, 2)
+        self.assertEqual(Comment.objects.filter(wall=self.other_wall).count(), 2)
+        self.assertEqual(self.search("croissant"), [self.other_wall.id])
+
+        response = self.post(CommentsBatch, 'comments_batch', {"create": [{"comment_content": ""}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["data"]["create"][0]["message"], "This field may not be blank.")
@@ -0,0 +1,121 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from users.models import User
+from wall.cache import wall_detail_cache
+from wall.models import Wall, Comment, Reaction, SearchIndexEntry
+from wall.search import search_walls
+
+
+class TestDataTransfer(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.user = User.objects.create_user(username="author", first_name="author", email="author@gmail.com",
+                                             password="Admin@123", holiday_details=[{"name": "Diwali"}])
+        self.other = User.objects.create_user(username="reader", first_name="reader", email="reader@gmail.com",
+                                              password="Admin@123")
+        self.wall = Wall.objects.create(title="Exported wall", content="content", created_by=self.user,
+                                        modified_by=self.user, like_count=1, comment_count=2)
+        Wall.objects.create(title="Anonymous wall", content="no author")
+        for index in range(2):
+            Comment.objects.create(comment_content="sourdough %s" % index, wall=self.wall, created_by=self.other,
+                                   modified_by=self.other)
+        Reaction.objects.create(wall=self.wall, user=self.other, kind=Reaction.LIKE)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def snapshot(self):
+        return [list(model.objects.order_by('pk').values()) for model in (User, Wall, Comment, Reaction)]
+
+    def clear(self):
+        SearchIndexEntry.objects.all().delete()
+        Reaction.objects.all().delete()
+        Comment.objects.all().delete()
+        Wall.objects.all().delete()
+        User.objects.all().delete()
+
+    def test_export_and_import_round_trip(self):
+        path = os.path.join(self.directory, "walls.ndjson.gz")
+        before = self.snapshot()
+        out = StringIO()
+        call_command('export_wall_data', path, batch_size=2, stdout=out)
+        self.assertIn("2 wall.wall", out.getvalue())
+        with gzip.open(path, 'rt') as stream:
+            lines = stream.read().splitlines()
+        self.assertEqual(json.loads(lines[0])["format"], "wall-data")
+        self.assertEqual([json.loads(line)["model"] for line in lines[1:]],
+                         ["users.user"] * 2 + ["wall.wall"] * 2 + ["wall.comment"] * 2 + ["wall.reaction"])
+
+        self.clear()
+        out = StringIO()
+        call_command('import_wall_data', path, batch_size=2, stdout=out)
+        self.assertIn("1 wall.reaction", out.getvalue())
+        self.assertEqual(self.snapshot(), before)
+        self.assertEqual([row['wall'] for row in search_walls("sourdough")], [self.wall.id])
+        self.assertTrue(User.objects.get(username="author").check_password("Admin@123"))
+
+        wall = Wall.objects.create(title="After import", content="content")
+        self.assertGreater(wall.id, self.wall.id)
+
+    def test_import_refuses_non_empty_tables(self):
+        path = os.path.join(self.directory, "walls.ndjson")
+        call_command('export_wall_data', path, stdout=StringIO())
+        with self.assertRaisesMessage(CommandError, "not empty"):
+            call_command('import_wall_data', path, stdout=StringIO())
+
+    def test_import_rejects_other_files(self):
+        path = os.path.join(self.directory, "walls.ndjson")
+        with open(path, 'w') as stream:
+            stream.write('{"model": "users.user"}\n')
+        self.clear()
+        with self.assertRaisesMessage(CommandError, "not a wall data export"):
+            call_command('import_wall_data', path, stdout=StringIO())
+
+    def test_import_rejects_invalid_rows(self):
+        path = os.path.join(self.directory, "walls.ndjson")
+        header = json.dumps({"format": "wall-data", "version": 1})
+        self.clear()
+        for row, message in (('["users.user"]', "Line 3: Row is not an object."),
+                             ('{"model": "wall.wall", "fields": null}', "Line 3: Fields of the row are not an object."),
+                             ('{"model": "wall.wall", "fields": {"title": "wall", "color": "red"}}',
+                              "Line 3: Unknown fields color of wall.wall."),
+                             ('{"model": "wall.post", "fields": {}}', "Line 3: Unknown model wall.post.")):
+            with open(path, 'w') as stream:
+                stream.write(header + '\n\n' + row + '\n')
+            with self.assertRaisesMessage(CommandError, message):
+                call_command('import_wall_data', path, stdout=StringIO())
+        self.assertFalse(Wall.objects.exists())
+
+    def test_import_reports_the_lines_of_rows_the_database_rejects(self):
+        path = os.path.join(self.directory, "walls.ndjson")
+        header = json.dumps({"format": "wall-data", "version": 1})
+        # Imported rows keep their timestamps, so a row without created_on breaks a NOT NULL constraint.
+        user = '{"model": "users.user", "fields": {"id": %s, "username": "user%s", "email": "user%s@gmail.com"}}'
+        self.clear()
+        for rows, message in (([user % (1, 1, 1), user % (2, 2, 2)], "Lines 2 to 3: NOT NULL constraint failed"),
+                              (['{"model": "wall.wall", "fields": {"title": "wall", "created_on": "yesterday"}}'],
+                               "Line 2: \u201cyesterday\u201d value has an invalid format.")):
+            with open(path, 'w') as stream:
+                stream.write(header + '\n' + '\n'.join(rows) + '\n')
+            with self.assertRaisesMessage(CommandError, message):
+                call_command('import_wall_data', path, stdout=StringIO())
+        self.assertFalse(User.objects.exists())
+
+    def test_import_invalidates_the_wall_details_once_per_batch(self):
+        path = os.path.join(self.directory, "walls.ndjson")
+        call_command('export_wall_data', path, stdout=StringIO())
+        self.clear()
+        with mock.patch.object(wall_detail_cache, 'invalidate_many') as invalidate_many:
+            call_command('import_wall_data', path, batch_size=2, stdout=StringIO())
+        invalidate_many.assert_called_once_with(list(Wall.objects.order_by('pk').values_list('id', flat=True)))
@@ -0,0 +1,69 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from users.models import User
+from wall.fast_serializers import comment_values, serialize_comments, serialize_walls, wall_values
+from wall.models import Wall, Comment, attach_comment_previews
+from wall.serializers import WallSerializer, CommentSerializer
+
+
+class TestFastSerializers(TestCase):
+    """
+    The fast read path must render exactly the same bytes as the DRF serializers.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(username="author", first_name="author", email="author@gmail.com")
+        self.editor = User.objects.create(username="editör", first_name="editor", email="editor@gmail.com")
+        self.wall1 = Wall.objects.create(title="Ünïcode wall", content="Line one\nline \"two\"",
+                                         created_by=self.user, modified_by=self.editor)
+        self.wall2 = Wall.objects.create(title="No authors", content="")
+        self.wall3 = Wall.objects.create(title="Busy wall", content="content", created_by=self.user,
+                                         modified_by=self.user, like_count=3, dislike_count=1, comment_count=5)
+        for index in range(5):
+            Comment.objects.create(comment_content="comment %s" % index, wall=self.wall3,
+                                   created_by=self.user, modified_by=self.editor)
+        Comment.objects.create(comment_content="first", wall=self.wall1, created_by=self.editor,
+                               modified_by=self.editor)
+        Wall.objects.filter(id=self.wall2.id).update(created_on=self.wall2.created_on.replace(microsecond=0))
+
+    def render(self, data):
+        return JSONRenderer().render(data)
+
+    def assert_wall_parity(self, names=None):
+        walls = attach_comment_previews(Wall.objects.with_authors())
+        expected = WallSerializer(walls, many=True, fields=names).data
+        actual = serialize_walls(list(wall_values(Wall.objects.all(), names)), names)
+        self.assertEqual(self.render(actual), self.render(expected))
+
+    def test_wall_parity(self):
+        self.assert_wall_parity()
+
+    def test_wall_parity_with_fieldsets(self):
+        self.assert_wall_parity(('id', 'title'))
+        self.assert_wall_parity(('comments', 'modified_by', 'likes'))
+        self.assert_wall_parity(('created_on', 'modified_on', 'comment_count'))
+
+    def test_wall_parity_in_other_time_zone(self):
+        with timezone.override('Asia/Kolkata'):
+            self.assert_wall_parity()
+
+    def test_comment_parity(self):
+        comments = Comment.objects.select_related('created_by').order_by('id')
+        expected = CommentSerializer(comments, many=True).data
+        actual = serialize_comments(comment_values(Comment.objects.order_by('id')))
+        self.assertEqual(self.render(actual), self.render(expected))
+
+    def test_empty_lists(self):
+        self.assertEqual(serialize_walls([]), [])
+        self.assertEqual(serialize_comments([]), [])
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_serializers', walls=3, rounds=2, stdout=out)
+        self.assertIn("WallSerializer", out.getvalue())
+        self.assertIn("fast read path", out.getvalue())
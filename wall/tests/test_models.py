@@ -1,6 +1,13 @@
-from django.test import TestCase
+from unittest import mock
 
-from wall.models import Wall, Comment
+from django.db import connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.conf import settings
+from django.test import TestCase, TransactionTestCase
+
+from users.models import User
+from wall.cache import wall_detail_cache, wall_list_cache
+from wall.models import Wall, Comment, attach_comment_previews
 
 
 class TestModels(TestCase):
@@ -65,3 +72,88 @@ class TestModels(TestCase):
         obj2 = self.create_comment(content=comment_content2, wall=self.wall1)
         qs1 = Comment.objects.all()
         self.assertEqual(qs1.count(), 3)  # Including wall1
+
+    def test_comment_previews_are_ranked_per_wall(self):
+        busy_wall = self.create_wall(title="busy", content="content")
+        busy_comments = [self.create_comment("busy %s" % index, busy_wall) for index in range(6)]
+        empty_wall = self.create_wall(title="empty", content="content")
+        with self.assertNumQueries(1):
+            walls = attach_comment_previews([self.wall1, busy_wall, empty_wall])
+        size = settings.WALL_COMMENT_PREVIEW_SIZE
+        self.assertEqual(walls[0].recent_comments, [self.comment1])
+        self.assertEqual(walls[1].recent_comments, busy_comments[::-1][:size])
+        self.assertEqual(walls[2].recent_comments, [])
+        with self.assertNumQueries(0):
+            self.assertEqual(attach_comment_previews([]), [])
+
+
+class TestWallChanged(TransactionTestCase):
+
+    def test_caches_are_invalidated_once_committed(self):
+        wall = Wall.objects.create(title="committed_title", content="committed_content")
+        with mock.patch.object(wall_detail_cache, 'invalidate') as invalidate_detail, \
+                mock.patch.object(wall_list_cache, 'invalidate') as invalidate_list:
+            with transaction.atomic():
+                Comment.objects.create(comment_content="committed_comment", wall=wall)
+                # A request rebuilding the payload now would read the rows before the comment.
+                invalidate_detail.assert_not_called()
+                invalidate_list.assert_not_called()
+            invalidate_detail.assert_called_once_with(wall.id)
+            invalidate_list.assert_called_once_with(reactions=False)
+
+            with self.assertRaises(ValueError):
+                with transaction.atomic():
+                    Comment.objects.create(comment_content="rolled_back_comment", wall=wall)
+                    raise ValueError
+            self.assertEqual(invalidate_detail.call_count, 1)
+
+
+    def test_caches_of_walls_showing_a_renamed_user_are_invalidated(self):
+        author = User.objects.create(username="author", email="author@gmail.com")
+        commenter = User.objects.create(username="commenter", email="commenter@gmail.com")
+        wall = Wall.objects.create(title="authored", content="content", created_by=author, modified_by=author)
+        commented = Wall.objects.create(title="commented", content="content")
+        Comment.objects.create(comment_content="comment", wall=commented, created_by=author, modified_by=author)
+        Comment.objects.create(comment_content="comment", wall=wall, created_by=commenter, modified_by=commenter)
+        with mock.patch.object(wall_detail_cache, 'invalidate') as invalidate_detail, \
+                mock.patch.object(wall_list_cache, 'invalidate') as invalidate_list:
+            author.first_name = "unchanged username"
+            author.save()
+            invalidate_detail.assert_not_called()
+            invalidate_list.assert_not_called()
+
+            author.username = "renamed"
+            author.save()
+            self.assertEqual(sorted(call[0][0] for call in invalidate_detail.call_args_list),
+                             [wall.id, commented.id])
+            invalidate_list.assert_called_once_with()
+
+class TestReactionMigration(TransactionTestCase):
+
+    migrate_from = [('wall', '0005_wall_counters'), ('users', '0001_initial')]
+    migrate_to = [('wall', '0006_reaction'), ('users', '0001_initial')]
+
+    def tearDown(self):
+        MigrationExecutor(connection).migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_like_and_dislike_users_are_copied_to_reactions(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_from)
+        old_apps = executor.loader.project_state(self.migrate_from).apps
+        user_model = old_apps.get_model('users', 'User')
+        wall = old_apps.get_model('wall', 'Wall').objects.create(title="old_wall", content="old_content")
+        liker = user_model.objects.create(username="liker", email="liker@gmail.com")
+        hater = user_model.objects.create(username="hater", email="hater@gmail.com")
+        old_apps.get_model('wall', 'Like').objects.create(wall=wall).users.add(liker)
+        old_apps.get_model('wall', 'DisLike').objects.create(wall=wall).users.add(hater, liker)
+        # Counters as 0005 filled them from the M2M tables.
+        old_apps.get_model('wall', 'Wall').objects.filter(id=wall.id).update(like_count=1, dislike_count=2)
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_to)
+        new_apps = executor.loader.project_state(self.migrate_to).apps
+        reactions = new_apps.get_model('wall', 'Reaction').objects.filter(wall_id=wall.id)
+        self.assertEqual(dict(reactions.values_list('user_id', 'kind')), {liker.id: 'like', hater.id: 'dislike'})
+        # The dislike of the user who also liked is dropped, and the counters follow.
+        wall = new_apps.get_model('wall', 'Wall').objects.get(id=wall.id)
+        self.assertEqual((wall.like_count, wall.dislike_count), (1, 1))
@@ -0,0 +1,155 @@
+from unittest import mock
+
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from users.models import User
+from wall.cache import wall_detail_cache, wall_list_cache
+from wall.models import Wall, Reaction
+from wall.reaction_buffer import MATCH_BATCH_SIZE, ReactionBuffer, reaction_buffer
+from wall.views import WallsList, WallDetails, LikeDetails, DislikeDetails
+from wall.tests.utils import run_on_commit_at_once
+
+
+@override_settings(REACTION_WRITE_BEHIND=True, REACTION_FLUSH_INTERVAL=0)
+class TestReactionBuffer(TestCase):
+
+    def setUp(self):
+        run_on_commit_at_once(self)
+        self.factory = APIRequestFactory()
+        self.user = User.objects.create(username="reader", first_name="reader", email="reader@gmail.com")
+        self.other = User.objects.create(username="other", first_name="other", email="other@gmail.com")
+        self.wall = Wall.objects.create(title="Viral wall", content="content", like_count=1)
+        Reaction.objects.create(wall=self.wall, user=self.other, kind=Reaction.LIKE)
+        reaction_buffer.clear()
+        wall_detail_cache.clear()
+        wall_list_cache.clear()
+
+    def tearDown(self):
+        reaction_buffer.clear()
+
+    def react(self, view, url_name, user, wall_id=None):
+        wall_id = self.wall.id if wall_id is None else wall_id
+        request = self.factory.get(reverse(url_name, kwargs={'wall_pk': wall_id}))
+        force_authenticate(request, user=user)
+        return view.as_view()(request, wall_id)
+
+    def touched_tables(self, queries):
+        return {table for query in queries.captured_queries
+                for table in ('wall_pendingreaction', 'wall_reaction', 'wall_wall') if '"%s"' % table in query['sql']}
+
+    def counters(self):
+        self.wall.refresh_from_db()
+        return self.wall.like_count, self.wall.dislike_count
+
+    def test_toggles_are_coalesced(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.react(LikeDetails, 'like_details', self.user)
+        self.assertEqual(response.data["data"], {"reaction": Reaction.LIKE})
+        self.assertEqual(self.touched_tables(queries), {'wall_pendingreaction', 'wall_reaction', 'wall_wall'})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.react(DislikeDetails, 'dislike_details', self.user)
+        # The next toggles only change the pending reaction, without reading or locking the wall.
+        self.assertEqual(self.touched_tables(queries), {'wall_pendingreaction'})
+        self.assertEqual(response.data["data"], {"reaction": Reaction.DISLIKE})
+        self.assertEqual(self.react(LikeDetails, 'like_details', self.other).data["data"], {"reaction": None})
+        self.assertEqual(self.react(LikeDetails, 'like_details', self.other).data["data"], {"reaction": Reaction.LIKE})
+        self.assertEqual(self.counters(), (1, 0))
+        self.assertEqual(reaction_buffer.pending_deltas([self.wall.id]), {self.wall.id: {'dislike_count': 1}})
+
+        self.assertEqual(reaction_buffer.flush(), 1)
+        self.assertEqual(self.counters(), (1, 1))
+        self.assertEqual(dict(Reaction.objects.values_list('user__username', 'kind')),
+                         {"reader": Reaction.DISLIKE, "other": Reaction.LIKE})
+        self.assertEqual(reaction_buffer.pending_deltas([self.wall.id]), {})
+        self.assertEqual(reaction_buffer.flush(), 0)
+
+    def test_reads_merge_pending_reactions(self):
+        detail_url = reverse('wall_details', kwargs={'pk': self.wall.id})
+        response = WallDetails.as_view()(self.factory.get(detail_url), self.wall.id)
+        etag = response["ETag"]
+        self.react(LikeDetails, 'like_details', self.other)
+        self.react(DislikeDetails, 'dislike_details', self.user)
+
+        response = WallDetails.as_view()(self.factory.get(detail_url, HTTP_IF_NONE_MATCH=etag), self.wall.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["data"]["likes"], response.data["data"]["dis_likes"]), (0, 1))
+        for user in (None, self.user):
+            request = self.factory.get(reverse('walls_list'), data={"fields": "title,likes,dis_likes"})
+            if user:
+                force_authenticate(request, user=user)
+            response = WallsList.as_view()(request)
+            self.assertEqual(response.data["data"], [{"title": "Viral wall", "likes": 0, "dis_likes": 1}])
+
+        reaction_buffer.flush()
+        response = WallDetails.as_view()(self.factory.get(detail_url), self.wall.id)
+        self.assertEqual((response.data["data"]["likes"], response.data["data"]["dis_likes"]), (0, 1))
+
+    def test_flush_rereads_stored_reactions(self):
+        buffer = ReactionBuffer(interval=0)
+        self.assertEqual(buffer.toggle(self.wall.id, self.user.id, Reaction.LIKE), Reaction.LIKE)
+        # Another process writes the same reaction before the flush.
+        Reaction.objects.create(wall=self.wall, user=self.user, kind=Reaction.LIKE)
+        Wall.objects.filter(id=self.wall.id).update(like_count=2)
+        self.assertEqual(buffer.toggle(self.wall.id, self.other.id, Reaction.DISLIKE), Reaction.DISLIKE)
+        deleted = Wall.objects.create(title="Deleted wall", content="content")
+        buffer.toggle(deleted.id, self.user.id, Reaction.LIKE)
+        deleted.delete()
+
+        self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(self.counters(), (1, 1))
+        self.assertEqual(buffer.stats(), {'pending': 0, 'flushes': 1, 'written': 1})
+
+    def test_processes_share_the_pending_reactions(self):
+        # Two buffers stand for the buffers of two worker processes.
+        first, second = ReactionBuffer(interval=0), ReactionBuffer(interval=0)
+        self.assertEqual(first.toggle(self.wall.id, self.user.id, Reaction.LIKE), Reaction.LIKE)
+        self.assertEqual(second.pending_deltas([self.wall.id]), {self.wall.id: {'like_count': 1}})
+        self.assertEqual(second.toggle(self.wall.id, self.user.id, Reaction.LIKE), None)
+        self.assertEqual(first.pending_deltas([self.wall.id]), {})
+
+        self.assertEqual(second.toggle(self.wall.id, self.other.id, Reaction.DISLIKE), Reaction.DISLIKE)
+        self.assertEqual(first.flush(), 1)
+        self.assertEqual(second.flush(), 0)
+        self.assertEqual(self.counters(), (0, 1))
+        self.assertEqual(dict(Reaction.objects.values_list('user__username', 'kind')), {"other": Reaction.DISLIKE})
+
+    def test_failed_flush_keeps_the_reactions(self):
+        buffer = ReactionBuffer(interval=0)
+        buffer.toggle(self.wall.id, self.user.id, Reaction.LIKE)
+
+        with mock.patch.object(buffer, 'write', side_effect=DatabaseError("database is locked")):
+            with self.assertRaises(DatabaseError):
+                buffer.flush()
+        self.assertEqual(buffer.stats()['pending'], 1)
+        self.assertEqual(buffer.pending_deltas([self.wall.id]), {self.wall.id: {'like_count': 1}})
+        buffer.toggle(self.wall.id, self.other.id, Reaction.LIKE)
+
+        self.assertEqual(buffer.flush(), 2)
+        self.assertEqual(self.counters(), (1, 0))
+        self.assertEqual(dict(Reaction.objects.values_list('user__username', 'kind')), {"reader": Reaction.LIKE})
+
+    def test_flush_of_many_reactions(self):
+        count = MATCH_BATCH_SIZE * 3
+        User.objects.bulk_create([User(username="user%s" % index, email="user%s@gmail.com" % index)
+                                  for index in range(count)])
+        user_ids = list(User.objects.filter(username__startswith="user").values_list('id', flat=True))
+        Reaction.objects.bulk_create([Reaction(wall=self.wall, user_id=user_id, kind=Reaction.DISLIKE)
+                                      for user_id in user_ids[:MATCH_BATCH_SIZE * 2]])
+        Wall.objects.filter(id=self.wall.id).update(dislike_count=MATCH_BATCH_SIZE * 2)
+        reactions = {(self.wall.id, user_id): Reaction.LIKE for user_id in user_ids[MATCH_BATCH_SIZE:]}
+        reactions.update({(self.wall.id, user_id): None for user_id in user_ids[:MATCH_BATCH_SIZE]})
+
+        deltas, written = ReactionBuffer(interval=0).write(reactions)
+        self.assertEqual(written, count)
+        self.assertEqual(self.counters(), (1 + MATCH_BATCH_SIZE * 2, 0))
+        self.assertEqual(Reaction.objects.filter(kind=Reaction.LIKE).count(), 1 + MATCH_BATCH_SIZE * 2)
+        self.assertFalse(Reaction.objects.filter(kind=Reaction.DISLIKE).exists())
+
+    def test_missing_wall(self):
+        response = self.react(LikeDetails, 'like_details', self.user, wall_id=0)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(reaction_buffer.stats()['pending'], 0)
@@ -0,0 +1,92 @@
+import datetime
+import decimal
+from io import StringIO
+
+import msgpack
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from renderer_utils import FastJSONRenderer, MessagePackRenderer
+from users.models import User
+from wall.models import Wall, Comment
+from wall.views import WallDetails, WallsList
+
+
+class TestRenderers(TestCase):
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.walls_list_url = reverse('walls_list')
+        user = User.objects.create(username="author", first_name="author", email="author@gmail.com",
+                                   geolocation_data={"country_code": "IN", "latitude": 19.0728},
+                                   holiday_details=[{"name": "Diwali", "week_day": "Thursday"}])
+        self.user = user
+        for index in range(3):
+            wall = Wall.objects.create(title="wall %s" % index, content="line\u2028separator ünïcode",
+                                       created_by=user, modified_by=user)
+            Comment.objects.create(comment_content="comment", wall=wall, created_by=user, modified_by=user)
+
+    def test_fast_json_matches_drf_json(self):
+        response = WallsList.as_view()(self.factory.get(self.walls_list_url))
+        self.assertEqual(FastJSONRenderer().render(response.data), JSONRenderer().render(response.data))
+
+        data = {
+            'created_on': timezone.now(),
+            'naive': datetime.datetime(2020, 7, 1, 10, 30),
+            'day': datetime.date(2020, 7, 1),
+            'amount': decimal.Decimal('1.50'),
+            'geolocation_data': self.user.geolocation_data,
+            'holiday_details': self.user.holiday_details,
+            1: 'integer key',
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_indented_json_is_left_to_drf(self):
+        data = {'status': 1, 'data': [1, 2]}
+        self.assertEqual(FastJSONRenderer().render(data, 'application/json; indent=4'),
+                         JSONRenderer().render(data, 'application/json; indent=4'))
+
+    def test_msgpack_is_chosen_with_accept_header(self):
+        json_response = WallsList.as_view()(self.factory.get(self.walls_list_url))
+        request = self.factory.get(self.walls_list_url, HTTP_ACCEPT='application/msgpack')
+        response = WallsList.as_view()(request)
+        response.render()
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content, raw=False), json_response.data)
+
+    def test_representations_have_their_own_etag(self):
+        wall = Wall.objects.first()
+        detail_url = reverse('wall_details', kwargs={'pk': wall.id})
+        for view, url, args in ((WallsList.as_view(), self.walls_list_url, ()),
+                                (WallDetails.as_view(), detail_url, (wall.id,))):
+            json_response = view(self.factory.get(url), *args)
+            json_response.render()
+            self.assertIn('Accept', json_response['Vary'])
+
+            request = self.factory.get(url, HTTP_ACCEPT='application/msgpack',
+                                       HTTP_IF_NONE_MATCH=json_response['ETag'])
+            response = view(request, *args)
+            self.assertEqual(response.status_code, 200)
+            response.render()
+            self.assertNotEqual(response['ETag'], json_response['ETag'])
+            self.assertIn('Accept', response['Vary'])
+
+            request = self.factory.get(url, HTTP_ACCEPT='application/msgpack', HTTP_IF_NONE_MATCH=response['ETag'])
+            response = view(request, *args)
+            self.assertEqual(response.status_code, 304)
+            self.assertIn('Accept', response['Vary'])
+
+    def test_msgpack_encodes_datetimes_like_json(self):
+        now = timezone.now()
+        data = msgpack.unpackb(MessagePackRenderer().render({'created_on': now}), raw=False)
+        self.assertEqual(data['created_on'], JSONRenderer().render(now).decode().strip('"'))
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_renderers', page_size=3, rounds=2, stdout=out)
+        self.assertIn("FastJSONRenderer", out.getvalue())
+        self.assertIn("MessagePackRenderer", out.getvalue())
@@ -0,0 +1,71 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIRequestFactory
+
+from wall.models import Wall, Comment, SearchIndexEntry
+from wall.search import search_walls
+from wall.views import WallsList
+
+
+class TestSearch(TestCase):
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.walls_list_url = reverse('walls_list')
+        self.wall1 = Wall.objects.create(title="Django tips", content="Use select_related for foreign keys")
+        self.wall2 = Wall.objects.create(title="Holiday photos", content="Pictures from the django meetup")
+        self.wall3 = Wall.objects.create(title="Recipes", content="Bread and butter")
+
+    def search(self, query):
+        return [row['wall'] for row in search_walls(query)]
+
+    def test_search_ranks_title_matches_first(self):
+        self.assertEqual(self.search("django"), [self.wall1.id, self.wall2.id])
+        self.assertEqual(self.search("django photos"), [self.wall2.id])
+        self.assertEqual(self.search("and"), [])
+
+    def test_search_matches_last_term_as_prefix(self):
+        self.assertEqual(self.search("bread butt"), [self.wall3.id])
+        self.assertEqual(self.search("holi"), [self.wall2.id])
+
+    def test_search_keeps_stop_word_typed_last_as_prefix(self):
+        theatre = Wall.objects.create(title="Theatre tickets", content="Two seats")
+        self.assertEqual(self.search("the"), [theatre.id])
+        self.assertEqual(self.search("the django"), [self.wall1.id, self.wall2.id])
+        self.assertEqual(self.search("tickets an"), [])
+
+    def test_index_follows_comment_and_wall_changes(self):
+        comment = Comment.objects.create(comment_content="Great sourdough", wall=self.wall1)
+        self.assertEqual(self.search("sourdough"), [self.wall1.id])
+        comment.comment_content = "Great baguette"
+        comment.save()
+        self.assertEqual(self.search("sourdough"), [])
+        self.assertEqual(self.search("baguette"), [self.wall1.id])
+        comment.delete()
+        self.assertEqual(self.search("baguette"), [])
+
+        self.wall3.title = "Sourdough recipes"
+        self.wall3.save()
+        self.assertEqual(self.search("sourdough"), [self.wall3.id])
+        self.wall3.delete()
+        self.assertEqual(self.search("sourdough"), [])
+
+    def test_rebuild_search_index_command(self):
+        Comment.objects.create(comment_content="Great sourdough", wall=self.wall1)
+        entries = SearchIndexEntry.objects.count()
+        SearchIndexEntry.objects.all().delete()
+        call_command('rebuild_search_index', batch_size=2, stdout=StringIO())
+        self.assertEqual(SearchIndexEntry.objects.count(), entries)
+        self.assertEqual(self.search("sourdough"), [self.wall1.id])
+
+    def test_wall_list_search_is_paginated(self):
+        request = self.factory.get(self.walls_list_url, data={"search": "django", "page_size": 1})
+        response = WallsList.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(response.data["total_page"], 2)
+        self.assertEqual(response.data["data"][0]["id"], self.wall1.id)
+        self.assertTrue(response.data["next"])
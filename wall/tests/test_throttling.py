@@ -0,0 +1,107 @@
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from throttle_utils import SlidingWindowStore, bucket_store, metrics, parse_rate
+from users.models import User
+from users.views import CustomTokenObtainPairView, UsersList
+from wall.models import Wall
+from wall.views import LikeDetails
+
+BUCKETS = {
+    'login': {'rate': '1/min', 'burst': 1, 'key': 'ip'},
+    'signup': {'rate': '1/hour', 'burst': 1, 'key': 'ip', 'methods': ('POST',)},
+    'write': {'rate': '60/min', 'burst': 30, 'key': 'user', 'methods': ('POST', 'PUT', 'PATCH', 'DELETE')},
+    'reaction': {'rate': '2/min', 'burst': 2, 'key': 'user'},
+}
+
+
+@override_settings(THROTTLE_BUCKETS=BUCKETS)
+class TestThrottling(TestCase):
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.user = User.objects.create_user(username="throttled", first_name="throttled",
+                                             email="throttled@gmail.com", password="Admin@123")
+        self.other = User.objects.create(username="other", first_name="other", email="other@gmail.com")
+        self.wall = Wall.objects.create(title="Throttled wall", content="content")
+        caches['default'].clear()
+        bucket_store.clear()
+        metrics.clear()
+
+    def tearDown(self):
+        caches['default'].clear()
+        bucket_store.clear()
+        metrics.clear()
+
+    def like(self, user):
+        request = self.factory.get(reverse('like_details', kwargs={'wall_pk': self.wall.id}))
+        force_authenticate(request, user=user)
+        return LikeDetails.as_view()(request, self.wall.id)
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('10/min'), 6)
+        self.assertEqual(parse_rate('100/5m'), 3)
+        with self.assertRaises(ValueError):
+            parse_rate('10/fortnight')
+
+    def test_bucket(self):
+        store = SlidingWindowStore()
+        # Windows of 30 seconds, 990 to 1020 then 1020 to 1050.
+        results = [store.consume('throttle:test', 10, 3, now=1000) for _ in range(4)]
+        self.assertEqual(results, [(True, 0)] * 3 + [(False, 30)])
+        # The three requests of the previous window count for 70% of their number 9 seconds into the next one.
+        allowed, wait = store.consume('throttle:test', 10, 3, now=1029)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 1)
+        self.assertEqual(store.consume('throttle:test', 10, 3, now=1030), (True, 0))
+        self.assertFalse(store.consume('throttle:test', 10, 3, now=1030)[0])
+
+        # A request the cache can not count is reported without a wait.
+        with mock.patch.object(type(caches['default']), 'incr', side_effect=ValueError):
+            self.assertEqual(store.consume('throttle:lost', 10, 1, now=1000), (False, None))
+
+    def test_requests_are_allowed_while_the_cache_is_down(self):
+        with mock.patch.object(type(caches['default']), 'incr', side_effect=ValueError):
+            self.assertEqual([self.like(self.user).status_code for _ in range(3)], [200] * 3)
+            self.assertEqual(metrics.stats()['reaction']['store_failures'], 3)
+            with self.settings(THROTTLE_FAIL_CLOSED=True):
+                response = self.like(self.user)
+                self.assertEqual(response.status_code, 429)
+                self.assertEqual(response["Retry-After"], "30")
+
+    def test_reactions_are_throttled_per_user(self):
+        self.assertEqual([self.like(self.user).status_code for _ in range(2)], [200, 200])
+        response = self.like(self.user)
+        self.assertEqual(response.status_code, 429)
+        # Until the two requests half slid out of the window, which depends on when the window started.
+        self.assertTrue(30 <= int(response["Retry-After"]) <= 90)
+        # The process remembers the full bucket, the rejection does not touch the database or the cache.
+        with self.assertNumQueries(0):
+            self.assertEqual(self.like(self.user).status_code, 429)
+        self.assertEqual(self.like(self.other).status_code, 200)
+        self.assertEqual(metrics.stats()['reaction'],
+                         {'allowed': 3, 'throttled': 1, 'fast_throttled': 1, 'store_failures': 0})
+
+        with self.settings(THROTTLE_ENABLED=False):
+            self.assertEqual(self.like(self.user).status_code, 200)
+
+    def test_login_and_signup_are_throttled_per_ip(self):
+        data = {"username": "throttled", "password": "Admin@123"}
+        for address, expected in (("10.0.0.1", 200), ("10.0.0.1", 429), ("10.0.0.2", 200)):
+            request = self.factory.post(reverse('token_obtain_pair'), data=data, REMOTE_ADDR=address)
+            self.assertEqual(CustomTokenObtainPairView.as_view()(request).status_code, expected)
+
+        data = {"first_name": "signup", "username": "signup", "email": "signup@gmail.com", "password": "Admin@123"}
+        request = self.factory.post(reverse('users_list'), data=data, REMOTE_ADDR="10.0.0.1")
+        self.assertEqual(UsersList.as_view()(request).status_code, 201)
+        request = self.factory.post(reverse('users_list'), data=data, REMOTE_ADDR="10.0.0.1")
+        self.assertEqual(UsersList.as_view()(request).status_code, 429)
+        # Only signups count, reading the user list is not throttled.
+        for _ in range(2):
+            request = self.factory.get(reverse('users_list'), REMOTE_ADDR="10.0.0.1")
+            force_authenticate(request, user=self.user)
+            self.assertEqual(UsersList.as_view()(request).status_code, 200)
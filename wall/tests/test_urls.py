@@ -1,6 +1,7 @@
 from django.test import SimpleTestCase
 from django.urls import reverse, resolve
-from wall.views import WallsList, WallDetails, CommentsList, CommentDetails,DislikeDetails,LikeDetails
+from wall.views import WallsList, WallDetails, WallCommentsList, CommentsList, CommentDetails,DislikeDetails, \
+    LikeDetails, WallsBatch, CommentsBatch
 
 
 class TestUrls(SimpleTestCase):
@@ -9,10 +10,22 @@ class TestUrls(SimpleTestCase):
         url = reverse("walls_list")
         self.assertEquals(resolve(url).func.view_class, WallsList)
 
+    def test_walls_batch_url_is_resolved(self):
+        url = reverse("walls_batch")
+        self.assertEquals(resolve(url).func.view_class, WallsBatch)
+
+    def test_comments_batch_url_is_resolved(self):
+        url = reverse("comments_batch")
+        self.assertEquals(resolve(url).func.view_class, CommentsBatch)
+
     def test_wall_detail_url_is_resolved(self):
         url = reverse("wall_details", kwargs={'pk': 1})
         self.assertEquals(resolve(url).func.view_class, WallDetails)
 
+    def test_wall_comments_list_url_is_resolved(self):
+        url = reverse("wall_comments_list", kwargs={'pk': 1})
+        self.assertEquals(resolve(url).func.view_class, WallCommentsList)
+
     def test_comment_list_url_is_resolved(self):
         url = reverse("comments_list")
         self.assertEquals(resolve(url).func.view_class, CommentsList)
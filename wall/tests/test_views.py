@@ -1,17 +1,33 @@
-from django.test import TestCase, Client
+import threading
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework.test import APIRequestFactory, force_authenticate
 
 import constants
-from wall.views import WallsList, WallDetails, CommentsList, CommentDetails
+from fieldset_utils import Fieldset
+from pagination_utils import encode_cursor
+from wall.cache import wall_detail_cache, wall_list_cache
+from wall.counters import reconcile_counters
+from wall.views import WallsList, WallDetails, WallCommentsList, CommentsList, CommentDetails, LikeDetails, \
+    DislikeDetails, list_cache_query
 from users.models import User
-from wall.models import Wall, Comment
+from wall.models import Wall, Comment, Reaction
+from wall.serializers import WallSerializer
+from wall.tests.utils import run_on_commit_at_once
 
 
 class TestViews(TestCase):
 
     def setUp(self):
+        run_on_commit_at_once(self)
         self.client = Client()
         self.walls_list_url = reverse('walls_list')
         self.comment_list_url = reverse('comments_list')
@@ -143,3 +159,404 @@ class TestViews(TestCase):
         self.assertEqual(response.data["message"], constants.DELETE_COMMENT_SUCCESS)
         comment = Comment.objects.filter(id=obj.id).first()
         self.assertEqual(comment, None)
+
+    def test_success_wall_cursor_pagination(self):
+        for index in range(5):
+            self.create_wall(title="cursor_title_%s" % index, content="cursor_content")
+        request = self.factory.get(self.walls_list_url, data={"cursor": "", "page_size": 2, "sort_by": "id"})
+        response1 = WallsList.as_view()(request)
+        self.assertEqual(response1.status_code, 200)
+        self.assertEqual(response1.data["status"], 1)
+        self.assertEqual(len(response1.data["data"]), 2)
+        self.assertTrue(response1.data["next"])
+        self.assertFalse(response1.data["previous"])
+        self.assertNotIn("count", response1.data)
+        self.assertNotIn("previous_cursor", response1.data)
+
+        request = self.factory.get(self.walls_list_url, data={"cursor": response1.data["next_cursor"],
+                                                              "page_size": 2, "sort_by": "id"})
+        response2 = WallsList.as_view()(request)
+        self.assertEqual(len(response2.data["data"]), 2)
+        self.assertTrue(response2.data["previous"])
+        self.assertLess(response2.data["data"][0]["id"], response1.data["data"][-1]["id"])
+
+        request = self.factory.get(self.walls_list_url, data={"cursor": response2.data["previous_cursor"],
+                                                              "page_size": 2, "sort_by": "id"})
+        response3 = WallsList.as_view()(request)
+        self.assertEqual([wall["id"] for wall in response3.data["data"]],
+                         [wall["id"] for wall in response1.data["data"]])
+        self.assertFalse(response3.data["previous"])
+
+    @override_settings(MAX_PAGE_SIZE=2)
+    def test_wall_page_size_is_limited(self):
+        for index in range(4):
+            self.create_wall(title="limit_title_%s" % index, content="limit_content")
+        request = self.factory.get(self.walls_list_url, data={"page_size": 100000})
+        response = WallsList.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["data"]), 2)
+        self.assertEqual(response.data["count"], 5)
+        self.assertEqual(response.data["total_page"], 3)
+
+    def test_fail_wall_invalid_cursor(self):
+        request = self.factory.get(self.walls_list_url, data={"cursor": "not-a-cursor"})
+        response = WallsList.as_view()(request)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["message"], constants.INVALID_CURSOR)
+
+        request = self.factory.get(self.walls_list_url, data={"cursor": "", "sort_by": "content"})
+        response = WallsList.as_view()(request)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["message"], constants.INVALID_SORT_FIELD)
+
+        # Well formed cursors whose value does not fit the sort field.
+        for sort_by, value in (("like_count", "many"), ("created_on", {"day": 1}), ("id", None)):
+            request = self.factory.get(self.walls_list_url, data={"cursor": encode_cursor(value, 1),
+                                                                  "sort_by": sort_by})
+            response = WallsList.as_view()(request)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data["message"], constants.INVALID_CURSOR)
+
+    def create_wall_with_activity(self, title, user, comments=3):
+        wall = self.create_wall(title=title, content="activity_content", created_by=user, modified_by=user)
+        Reaction.objects.create(wall=wall, user=user, kind=Reaction.LIKE)
+        for index in range(comments):
+            self.create_comment(comment="comment_%s" % index, wall=wall, created_by=user, modified_by=user)
+        reconcile_counters([wall.id])
+        return wall
+
+    def test_wall_list_query_count_is_constant(self):
+        user = self.create_user(username="test_user", first_name="test_name", email="test@gmail.com")
+        for index in range(2):
+            self.create_wall_with_activity(title="few_%s" % index, user=user)
+        request = self.factory.get(self.walls_list_url)
+        with self.assertNumQueries(3):
+            response = WallsList.as_view()(request)
+        self.assertEqual(response.data["data"][0]["likes"], 1)
+        self.assertEqual(response.data["data"][0]["dis_likes"], 0)
+        self.assertEqual(response.data["data"][0]["created_by"], user.username)
+
+        for index in range(6):
+            self.create_wall_with_activity(title="many_%s" % index, user=user, comments=5)
+        request = self.factory.get(self.walls_list_url)
+        with self.assertNumQueries(3):
+            WallsList.as_view()(request)
+        request = self.factory.get(self.walls_list_url, data={"cursor": ""})
+        with self.assertNumQueries(2):
+            WallsList.as_view()(request)
+
+    def test_wall_detail_query_count_is_constant(self):
+        user = self.create_user(username="test_user", first_name="test_name", email="test@gmail.com")
+        wall = self.create_wall_with_activity(title="detail_wall", user=user, comments=10)
+        request = self.factory.get(reverse('wall_details', kwargs={'pk': wall.id}))
+        with self.assertNumQueries(3):
+            response = WallDetails.as_view()(request, wall.id)
+        self.assertEqual(response.data["data"]["likes"], 1)
+        self.assertEqual(response.data["data"]["comment_count"], 10)
+        self.assertEqual(len(response.data["data"]["comments"]), settings.WALL_COMMENT_PREVIEW_SIZE)
+        self.assertEqual(response.data["data"]["comments"][0]["comment_content"], "comment_9")
+
+    def test_success_wall_comments_get_data(self):
+        user = self.create_user(username="test_user", first_name="test_name", email="test@gmail.com")
+        wall = self.create_wall_with_activity(title="comments_wall", user=user, comments=5)
+        comments_url = reverse('wall_comments_list', kwargs={'pk': wall.id})
+        request = self.factory.get(comments_url, data={"page_size": 3})
+        response1 = WallCommentsList.as_view()(request, wall.id)
+        self.assertEqual(response1.status_code, 200)
+        self.assertEqual(response1.data["message"], constants.COMMENTS_GET_SUCCESS)
+        self.assertEqual([comment["comment_content"] for comment in response1.data["data"]],
+                         ["comment_4", "comment_3", "comment_2"])
+
+        request = self.factory.get(comments_url, data={"page_size": 3, "cursor": response1.data["next_cursor"]})
+        response2 = WallCommentsList.as_view()(request, wall.id)
+        self.assertEqual([comment["comment_content"] for comment in response2.data["data"]],
+                         ["comment_1", "comment_0"])
+        self.assertFalse(response2.data["next"])
+
+        request = self.factory.get(reverse('wall_comments_list', kwargs={'pk': 0}))
+        response3 = WallCommentsList.as_view()(request, 0)
+        self.assertEqual(response3.status_code, 404)
+
+    def test_reaction_toggles_update_counters(self):
+        user = self.create_user(username="test_user", first_name="test_name", email="test@gmail.com")
+        wall = self.create_wall_with_activity(title="counter_wall", user=user, comments=0)
+        other = self.create_user(username="other_user", first_name="other_name", email="other@gmail.com")
+        like_url = reverse('like_details', kwargs={'wall_pk': wall.id})
+        dislike_url = reverse('dislike_details', kwargs={'wall_pk': wall.id})
+
+        request = self.factory.get(dislike_url)
+        force_authenticate(request, user=other)
+        response = DislikeDetails.as_view()(request, wall.id)
+        self.assertEqual(response.status_code, 200)
+        wall.refresh_from_db()
+        self.assertEqual((wall.like_count, wall.dislike_count), (1, 1))
+
+        request = self.factory.get(like_url)
+        force_authenticate(request, user=other)
+        LikeDetails.as_view()(request, wall.id)
+        wall.refresh_from_db()
+        self.assertEqual((wall.like_count, wall.dislike_count), (2, 0))
+
+        request = self.factory.get(like_url)
+        force_authenticate(request, user=other)
+        LikeDetails.as_view()(request, wall.id)
+        wall.refresh_from_db()
+        self.assertEqual((wall.like_count, wall.dislike_count), (1, 0))
+        self.assertFalse(Reaction.objects.filter(wall=wall, user=other).exists())
+
+        request = self.factory.get(reverse('like_details', kwargs={'wall_pk': 0}))
+        force_authenticate(request, user=other)
+        response = LikeDetails.as_view()(request, 0)
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Reaction.objects.filter(wall_id=0).exists())
+
+    def test_comment_views_update_counters(self):
+        user = self.create_user(username="test_user", first_name="test_name", email="test@gmail.com")
+        request = self.factory.post(self.comment_list_url, data={"comment_content": "counted", "wall": self.wall.id})
+        force_authenticate(request, user=user)
+        response = CommentsList.as_view()(request)
+        self.wall.refresh_from_db()
+        self.assertEqual(self.wall.comment_count, 1)
+
+        comment_id = response.data["data"]["id"]
+        request = self.factory.delete(reverse('comment_details', kwargs={'pk': comment_id}))
+        force_authenticate(request, user=user)
+        CommentDetails.as_view()(request, comment_id)
+        self.wall.refresh_from_db()
+        self.assertEqual(self.wall.comment_count, 0)
+
+    def test_reconcile_counters_command(self):
+        user = self.create_user(username="test_user", first_name="test_name", email="test@gmail.com")
+        wall = self.create_wall_with_activity(title="drift_wall", user=user, comments=2)
+        Wall.objects.filter(id=wall.id).update(like_count=7, comment_count=0)
+        call_command('reconcile_counters', batch_size=1, stdout=StringIO())
+        wall.refresh_from_db()
+        self.assertEqual((wall.like_count, wall.dislike_count, wall.comment_count), (1, 0, 2))
+
+    def test_success_wall_sort_by_like_count(self):
+        user = self.create_user(username="test_user", first_name="test_name", email="test@gmail.com")
+        popular = self.create_wall_with_activity(title="popular_wall", user=user, comments=0)
+        request = self.factory.get(self.walls_list_url, data={"cursor": "", "sort_by": "like_count"})
+        response = WallsList.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["data"][0]["id"], popular.id)
+        self.assertEqual(response.data["data"][0]["likes"], 1)
+
+    def test_wall_detail_is_cached_until_the_wall_changes(self):
+        user = self.create_user(username="test_user", first_name="test_name", email="test@gmail.com")
+        wall = self.create_wall_with_activity(title="cached_wall", user=user, comments=1)
+        detail_url = reverse('wall_details', kwargs={'pk': wall.id})
+        wall_detail_cache.clear()
+
+        WallDetails.as_view()(self.factory.get(detail_url), wall.id)
+        with self.assertNumQueries(1):
+            response = WallDetails.as_view()(self.factory.get(detail_url), wall.id)
+        self.assertEqual(response.data["data"]["title"], "cached_wall")
+        self.assertEqual(wall_detail_cache.stats()["hits"], 1)
+        self.assertEqual(wall_detail_cache.stats()["misses"], 1)
+
+        request = self.factory.put(detail_url, data={"title": "renamed_wall"})
+        force_authenticate(request, user=user)
+        WallDetails.as_view()(request, wall.id)
+        response = WallDetails.as_view()(self.factory.get(detail_url), wall.id)
+        self.assertEqual(response.data["data"]["title"], "renamed_wall")
+
+        request = self.factory.post(self.comment_list_url, data={"comment_content": "fresh", "wall": wall.id})
+        force_authenticate(request, user=user)
+        CommentsList.as_view()(request)
+        response = WallDetails.as_view()(self.factory.get(detail_url), wall.id)
+        self.assertEqual(response.data["data"]["comment_count"], 2)
+        self.assertEqual(response.data["data"]["comments"][0]["comment_content"], "fresh")
+
+        request = self.factory.get(reverse('dislike_details', kwargs={'wall_pk': wall.id}))
+        force_authenticate(request, user=user)
+        DislikeDetails.as_view()(request, wall.id)
+        response = WallDetails.as_view()(self.factory.get(detail_url), wall.id)
+        self.assertEqual((response.data["data"]["likes"], response.data["data"]["dis_likes"]), (0, 1))
+        self.assertEqual(wall_detail_cache.stats()["misses"], 4)
+
+    @override_settings(WALL_DETAIL_CACHE_LOCAL_ENTRIES=1)
+    def test_wall_detail_local_cache_is_bounded(self):
+        wall_detail_cache.clear()
+        other = self.create_wall(title="other_wall", content="other_content")
+        for wall in (self.wall, other):
+            WallDetails.as_view()(self.factory.get(reverse('wall_details', kwargs={'pk': wall.id})), wall.id)
+        self.assertEqual(wall_detail_cache.stats()["local_entries"], 1)
+
+    def test_wall_detail_conditional_get(self):
+        user = self.create_user(username="test_user", first_name="test_name", email="test@gmail.com")
+        wall = self.create_wall_with_activity(title="etag_wall", user=user, comments=1)
+        detail_url = reverse('wall_details', kwargs={'pk': wall.id})
+        response = WallDetails.as_view()(self.factory.get(detail_url), wall.id)
+        etag = response["ETag"]
+        last_modified = response["Last-Modified"]
+
+        with self.assertNumQueries(1):
+            response = WallDetails.as_view()(self.factory.get(detail_url, HTTP_IF_NONE_MATCH=etag), wall.id)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        response = WallDetails.as_view()(self.factory.get(detail_url, HTTP_IF_MODIFIED_SINCE=last_modified),
+                                         wall.id)
+        self.assertEqual(response.status_code, 304)
+
+        request = self.factory.get(reverse('like_details', kwargs={'wall_pk': wall.id}))
+        force_authenticate(request, user=user)
+        LikeDetails.as_view()(request, wall.id)
+        response = WallDetails.as_view()(self.factory.get(detail_url, HTTP_IF_NONE_MATCH=etag), wall.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_renamed_authors_change_the_etags(self):
+        user = self.create_user(username="test_user", first_name="test_name", email="test@gmail.com")
+        commenter = self.create_user(username="commenter", first_name="test_name", email="commenter@gmail.com")
+        wall = self.create_wall_with_activity(title="etag_wall", user=user, comments=1)
+        self.create_comment(comment="other comment", wall=wall, created_by=commenter, modified_by=commenter)
+        detail_url = reverse('wall_details', kwargs={'pk': wall.id})
+
+        for renamed, field in ((user, "created_by"), (commenter, "comments")):
+            detail_etag = WallDetails.as_view()(self.factory.get(detail_url), wall.id)["ETag"]
+            list_etag = WallsList.as_view()(self.factory.get(self.walls_list_url))["ETag"]
+            renamed.username = "renamed_%s" % renamed.username
+            renamed.save()
+            response = WallDetails.as_view()(self.factory.get(detail_url, HTTP_IF_NONE_MATCH=detail_etag), wall.id)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(renamed.username, str(response.data["data"][field]))
+            request = self.factory.get(self.walls_list_url, HTTP_IF_NONE_MATCH=list_etag)
+            force_authenticate(request, user=user)
+            response = WallsList.as_view()(request)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(renamed.username, str(response.data["data"][0][field]))
+
+    def test_wall_list_conditional_get(self):
+        user = self.create_user(username="test_user", first_name="test_name", email="test@gmail.com")
+        self.create_wall_with_activity(title="etag_wall", user=user, comments=1)
+        response = WallsList.as_view()(self.factory.get(self.walls_list_url))
+        etag = response["ETag"]
+
+        with self.assertNumQueries(0):
+            response = WallsList.as_view()(self.factory.get(self.walls_list_url, HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(response.status_code, 304)
+        request = self.factory.get(self.walls_list_url, HTTP_IF_NONE_MATCH=etag)
+        force_authenticate(request, user=user)
+        # The count, the walls and the comments, whose authors are part of the ETag.
+        with self.assertNumQueries(3):
+            response = WallsList.as_view()(request)
+        self.assertEqual(response.status_code, 304)
+        response = WallsList.as_view()(self.factory.get(self.walls_list_url, data={"page_size": 1},
+                                                        HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(response.status_code, 200)
+
+        self.create_wall(title="new_wall", content="new_content")
+        response = WallsList.as_view()(self.factory.get(self.walls_list_url, HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(response.status_code, 200)
+
+    def test_anonymous_wall_list_is_cached(self):
+        user = self.create_user(username="test_user", first_name="test_name", email="test@gmail.com")
+        self.create_wall_with_activity(title="cached_list", user=user, comments=1)
+        wall_list_cache.clear()
+        WallsList.as_view()(self.factory.get(self.walls_list_url))
+        with self.assertNumQueries(0):
+            response = WallsList.as_view()(self.factory.get(self.walls_list_url,
+                                                            data={"page": 1, "order": "desc", "utm": "x"}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["data"][0]["title"], "cached_list")
+        self.assertEqual(wall_list_cache.stats()["hits"], 1)
+
+        request = self.factory.get(self.walls_list_url)
+        force_authenticate(request, user=user)
+        with self.assertNumQueries(3):
+            WallsList.as_view()(request)
+
+        by_likes = {"sort_by": "like_count"}
+        WallsList.as_view()(self.factory.get(self.walls_list_url, data=by_likes))
+        request = self.factory.get(reverse('like_details', kwargs={'wall_pk': self.wall.id}))
+        force_authenticate(request, user=user)
+        LikeDetails.as_view()(request, self.wall.id)
+        # A reaction only rebuilds the pages sorted by a value it changes, the others keep their counters.
+        response = WallsList.as_view()(self.factory.get(self.walls_list_url))
+        self.assertEqual(response.data["data"][1]["likes"], 0)
+        self.assertEqual(wall_list_cache.stats()["misses"], 2)
+        response = WallsList.as_view()(self.factory.get(self.walls_list_url, data=by_likes))
+        self.assertEqual(response.data["data"][0]["likes"], 1)
+        self.assertEqual(wall_list_cache.stats()["misses"], 3)
+
+        self.create_wall(title="new_wall", content="new_content")
+        response = WallsList.as_view()(self.factory.get(self.walls_list_url))
+        self.assertEqual(response.data["data"][0]["title"], "new_wall")
+        self.assertEqual(response.data["data"][2]["likes"], 1)
+
+    def test_cold_wall_list_waits_for_its_builder(self):
+        wall_list_cache.clear()
+        query = (('page', 'cold'),)
+        lock_key = wall_list_cache.lock_key(query)
+        self.assertTrue(cache.add(lock_key, 1))
+
+        def store():
+            wall_list_cache.store(query, wall_list_cache.current_generation(), {'built_by': 'other'})
+            cache.delete(lock_key)
+
+        threading.Timer(0.05, store).start()
+        page = wall_list_cache.get_or_build(query, lambda: {'built_by': 'waiting'})
+        self.assertEqual(page, {'built_by': 'other'})
+        self.assertEqual(wall_list_cache.stats()["waits"], 1)
+
+        # The builder gave up without storing the page.
+        query = (('page', 'uncached'),)
+        self.assertTrue(cache.add(wall_list_cache.lock_key(query), 1))
+        threading.Timer(0.05, cache.delete, (wall_list_cache.lock_key(query),)).start()
+        self.assertEqual(wall_list_cache.get_or_build(query, lambda: {'built_by': 'waiting'}), {'built_by': 'waiting'})
+        self.assertEqual(wall_list_cache.stats()["misses"], 1)
+
+    def test_stale_wall_list_is_served_while_it_is_rebuilt(self):
+        WallsList.as_view()(self.factory.get(self.walls_list_url))
+        self.create_wall(title="new_wall", content="new_content")
+        lock_key = wall_list_cache.lock_key(list_cache_query({}, Fieldset(WallSerializer)))
+        self.assertTrue(cache.add(lock_key, 1))
+        try:
+            with self.assertNumQueries(0):
+                response = WallsList.as_view()(self.factory.get(self.walls_list_url))
+            self.assertEqual(response.data["count"], 1)
+        finally:
+            cache.delete(lock_key)
+        response = WallsList.as_view()(self.factory.get(self.walls_list_url))
+        self.assertEqual(response.data["count"], 2)
+
+    def test_wall_list_sparse_fieldset(self):
+        user = self.create_user(username="test_user", first_name="test_name", email="test@gmail.com")
+        self.create_wall_with_activity(title="sparse_wall", user=user, comments=2)
+        request = self.factory.get(self.walls_list_url, data={"fields": "id,title,likes"})
+        force_authenticate(request, user=user)
+        with CaptureQueriesContext(connection) as queries:
+            response = WallsList.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data["data"][0]), {"id", "title", "likes"})
+        self.assertEqual(response.data["data"][0]["likes"], 1)
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('"content"', queries[1]["sql"])
+        self.assertNotIn('"users_user"', queries[1]["sql"])
+
+        request = self.factory.get(self.walls_list_url, data={"fields": "id", "expand": "comments"})
+        force_authenticate(request, user=user)
+        with self.assertNumQueries(3):
+            response = WallsList.as_view()(request)
+        self.assertEqual(set(response.data["data"][0]), {"id", "comments"})
+        self.assertEqual(len(response.data["data"][0]["comments"]), 2)
+
+        response = WallsList.as_view()(self.factory.get(self.walls_list_url, data={"fields": "id,password"}))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["message"], constants.INVALID_FIELDSET)
+        response = WallsList.as_view()(self.factory.get(self.walls_list_url, data={"expand": "title"}))
+        self.assertEqual(response.status_code, 400)
+
+    def test_wall_detail_sparse_fieldset(self):
+        user = self.create_user(username="test_user", first_name="test_name", email="test@gmail.com")
+        wall = self.create_wall_with_activity(title="sparse_wall", user=user, comments=2)
+        detail_url = reverse('wall_details', kwargs={'pk': wall.id})
+        full = WallDetails.as_view()(self.factory.get(detail_url), wall.id)
+        with self.assertNumQueries(2):
+            response = WallDetails.as_view()(self.factory.get(detail_url, data={"fields": "title,created_by"}),
+                                             wall.id)
+        self.assertEqual(response.data["data"], {"title": "sparse_wall", "created_by": user.username})
+        self.assertNotEqual(response["ETag"], full["ETag"])
+        response = WallDetails.as_view()(self.factory.get(detail_url), wall.id)
+        self.assertEqual(response.data["data"], full.data["data"])
@@ -0,0 +1,16 @@
+from unittest import mock
+
+"""
+    This module contains helpers shared by the tests of the wall app.
+"""
+
+
+def run_on_commit_at_once(test_case):
+    """
+    Function is used to run the on_commit callbacks of a TestCase when they are registered, since the
+    transaction wrapping the test is never committed.
+    :param test_case: TestCase object, the patch is undone when its test ends.
+    """
+    patcher = mock.patch('django.db.transaction.on_commit', side_effect=lambda func, using=None: func())
+    patcher.start()
+    test_case.addCleanup(patcher.stop)
@@ -6,8 +6,11 @@ from wall import views
 # Additionally, we include login URLs for the browsable API.
 urlpatterns = [
     path('walls/list/', views.WallsList.as_view(), name='walls_list'),
+    path('walls/batch/', views.WallsBatch.as_view(), name='walls_batch'),
     path('walls/details/<int:pk>/', views.WallDetails.as_view(), name='wall_details'),
+    path('walls/details/<int:pk>/comments/', views.WallCommentsList.as_view(), name='wall_comments_list'),
     path('comment/list/', views.CommentsList.as_view(), name='comments_list'),
+    path('comment/batch/', views.CommentsBatch.as_view(), name='comments_batch'),
     path('comment/details/<int:pk>/', views.CommentDetails.as_view(), name='comment_details'),
     path('likes/<int:wall_pk>/', views.LikeDetails.as_view(), name='like_details'),
     path('dislikes/<int:wall_pk>/', views.DislikeDetails.as_view(), name='dislike_details'),
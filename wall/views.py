@@ -1,25 +1,102 @@
+import datetime
 import logging
 
 from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Max, Subquery
 from rest_framework.views import APIView
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 from drf_yasg.utils import swagger_auto_schema
 
 import constants
-from response_utils import ApiResponse, get_error_message
-from wall.models import Wall, Comment
+from fieldset_utils import Fieldset, InvalidFieldset
+from pagination_utils import CursorPaginator, InvalidCursor, get_page_size
+from response_utils import (ApiResponse, get_error_message, make_etag, media_type_etag, not_modified_response,
+                            set_validators)
+from wall.counters import adjust_counters
+from wall.models import Wall, Comment, Reaction, attach_comment_previews, comment_preview_queryset
 from wall.serializers import WallSerializer, CommentSerializer
+from wall.batch import CommentBatchWriter, InvalidBatch, WallBatchWriter
+from wall.cache import wall_detail_cache, wall_list_cache
+from wall.fast_serializers import comment_previews, comment_values, serialize_comments, serialize_walls, wall_values
 from wall.permissions import IsGetOrIsAuthenticated
+from wall.reaction_buffer import reaction_buffer, record_reaction
+from wall.search import search_walls
+from wall.signals import send_wall_changed
 
 logger = logging.getLogger('django')
 
+# Fields a client can sort by when paging walls with a cursor.
+CURSOR_SORT_FIELDS = ('created_on', 'modified_on', 'title', 'id', 'like_count', 'dislike_count', 'comment_count')
+# Fields a reaction changes, so the cached list pages sorted by them are rebuilt on every reaction.
+REACTION_SORT_FIELDS = ('like_count', 'dislike_count', 'last_activity_on')
+# Columns which change whenever the payload of a wall changes, used to build ETags.
+VALIDATOR_FIELDS = ('id', 'modified_on', 'last_activity_on', 'like_count', 'dislike_count', 'comment_count')
+# (field, column) of the authors shown in a payload: their username changes with their modified_on.
+AUTHOR_VALIDATOR_FIELDS = (('created_by', 'created_by__modified_on'), ('modified_by', 'modified_by__modified_on'))
+# Column which changes when the username shown for a comment changes.
+COMMENT_VALIDATOR_FIELD = 'created_by__modified_on'
+
+
+def validator_fields(fieldset):
+    """
+    Function is used to get the columns validating the payload of a wall, only joining the authors it shows.
+    :param fieldset: fields of the wall asked for.
+    :return: tuple of columns.
+    """
+    return VALIDATOR_FIELDS + tuple(column for name, column in AUTHOR_VALIDATOR_FIELDS if name in fieldset)
+
+
+def wall_validators(row, fields):
+    return tuple(row[field] for field in fields)
+
+
+def comment_validator(rows):
+    """
+    Function is used to get the validator of the comments shown with a wall.
+    :param rows: comment rows read with COMMENT_VALIDATOR_FIELD.
+    :return: newest modified_on of their authors, or None.
+    """
+    return max((row[COMMENT_VALIDATOR_FIELD] for row in rows if row[COMMENT_VALIDATOR_FIELD]), default=None)
+
+
+def last_modified_of(validators):
+    """
+    Function is used to get the Last-Modified date of a payload.
+    :param validators: validator values of the payload.
+    :return: newest datetime of the validators, or None.
+    """
+    return max((value for value in validators if isinstance(value, datetime.datetime)), default=None)
+
+
+def list_cache_query(query_params, fieldset):
+    """
+    Function is used to normalize the query of a wall list page, so equivalent urls share one cache entry.
+    :param query_params: query parameters of the request.
+    :param fieldset: fields of the walls asked for.
+    :return: tuple of (name, value) pairs.
+    """
+    search = ' '.join(query_params.get('search', '').lower().split())
+    return (('fields', fieldset.names),
+            ('page', query_params.get('page', '1')),
+            ('page_size', get_page_size(query_params.get('page_size'))),
+            ('sort_by', query_params.get('sort_by', 'created_on')),
+            ('order', query_params.get('order', 'desc')),
+            ('search', search),
+            ('cursor', query_params.get('cursor')))
+
 
 class WallsList(APIView):
     """
     Class is used for list all the wall or create new wall by a user.
     """
     permission_classes = [IsGetOrIsAuthenticated]
+    throttle_scope = 'write'
+    # False while a page is built for the anonymous list cache, which merges pending reactions and picks the
+    # media type of its ETag when it is served.
+    merge_pending = True
 
     @swagger_auto_schema(operation_description="Api is used to get all wall details"
                                                "from the application",
@@ -30,32 +107,152 @@ class WallsList(APIView):
         :param request: request header with required info.
         :return: Wall list
         """
+        try:
+            self.fieldset = Fieldset.from_query(WallSerializer, request.query_params)
+        except InvalidFieldset as e:
+            logger.exception(e)
+            api_response = ApiResponse(status=0, message=constants.INVALID_FIELDSET,
+                                       http_status=status.HTTP_400_BAD_REQUEST)
+            return api_response.create_response()
+        if request.user.is_authenticated:
+            return self.get_page()
+        reactions = (not request.query_params.get('search')
+                     and request.query_params.get('sort_by', 'created_on').lstrip('-') in REACTION_SORT_FIELDS)
+        page = wall_list_cache.get_or_build(list_cache_query(request.query_params, self.fieldset),
+                                            self.build_cached_page, reactions=reactions)
+        if page is None:
+            return self.get_page()
+        data, etag = page['data'], page['etag']
+        pending = reaction_buffer.pending_deltas(page['wall_ids'])
+        if pending:
+            etag = make_etag(etag, pending)
+        etag = media_type_etag(etag, request.accepted_media_type)
+        not_modified = not_modified_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+        if pending:
+            data = dict(data, data=reaction_buffer.merge(data['data'], page['wall_ids']))
+        return set_validators(Response(data, status=status.HTTP_200_OK), etag=etag)
+
+    def build_cached_page(self):
+        """
+        Function is used to build a page for the anonymous list cache.
+        :return: dict with the response body, its ETag and the ids of its walls, or None if the page is an error.
+        """
+        self.merge_pending = False
+        response = self.get_page(conditional=False)
+        if response.status_code != status.HTTP_200_OK:
+            return None
+        return {'data': response.data, 'etag': response['ETag'], 'wall_ids': self.wall_ids}
+
+    def get_page(self, conditional=True):
+        """
+        Function is used to get a page of walls from the database.
+        :param conditional: False to skip the If-None-Match check.
+        :return: Wall list
+        """
         page_number = self.request.query_params.get('page', 1)
-        page_size = self.request.query_params.get('page_size', 10)
+        page_size = get_page_size(self.request.query_params.get('page_size'))
         sort_by = self.request.query_params.get('sort_by', 'created_on')
         order = self.request.query_params.get('order', 'desc')
         search = self.request.query_params.get('search', None)
+        cursor = self.request.query_params.get('cursor', None)
 
+        if search:
+            return self.get_search_page(search, page_number, page_size, conditional)
+
+        if cursor is not None:
+            return self.get_cursor_page(cursor, sort_by, order == 'desc', page_size, conditional)
+
+        always = validator_fields(self.fieldset) + (sort_by,)
+        walls = wall_values(Wall.objects.all(), self.fieldset.names, always=always)
         if order == 'desc':
             sort_by = '-' + sort_by
 
-        if search:
-            walls = Wall.objects.filter(title__icontains=search).order_by(sort_by)
-        else:
-            walls = Wall.objects.all().order_by(sort_by)
-
-        paginator = Paginator(walls, page_size)
-
-        count = paginator.count
-        total_page = len(paginator.page_range)
-        next = paginator.page(page_number).has_next()
-        previous = paginator.page(page_number).has_previous()
-        serializer = WallSerializer(paginator.page(page_number), many=True)
-        api_response = ApiResponse(status=1, data=serializer.data, message=constants.WALLS_GET_SUCCESS,
-                                   http_status=status.HTTP_200_OK, count=count, total_page=total_page, next=next,
-                                   previous=previous)
+        paginator = Paginator(walls.order_by(sort_by), page_size)
+        page = paginator.page(page_number)
+        return self.list_response(list(page.object_list), conditional, count=paginator.count,
+                                  total_page=paginator.num_pages, next=page.has_next(), previous=page.has_previous())
+
+    def list_response(self, walls, conditional=True, **envelope):
+        """
+        Function is used to send a page of walls, or a 304 when the client copy of the page is still fresh.
+        The ETag is built from the query, the envelope and the validator columns of the walls, so the
+        comments are only loaded and the walls only serialized when the page changed.
+        :param walls: list of wall rows in the page, read with wall_values().
+        :param conditional: False to skip the If-None-Match check.
+        :param envelope: pagination values sent with the list.
+        :return: Wall list
+        """
+        self.wall_ids = [wall['id'] for wall in walls]
+        fields = validator_fields(self.fieldset)
+        validators = [wall_validators(wall, fields) for wall in walls]
+        previews = None
+        if 'comments' in self.fieldset:
+            # The authors of the comments are part of the page, so the comments are loaded for the ETag.
+            previews = comment_previews(self.wall_ids, always=(COMMENT_VALIDATOR_FIELD,))
+            validators = [wall + (comment_validator(previews[wall_id]),)
+                          for wall, wall_id in zip(validators, self.wall_ids)]
+        pending = reaction_buffer.pending_deltas(self.wall_ids) if self.merge_pending else {}
+        etag = make_etag(sorted(self.request.query_params.lists()), sorted(envelope.items()), validators, pending,
+                         media_type=self.request.accepted_media_type if self.merge_pending else None)
+        if conditional:
+            not_modified = not_modified_response(self.request, etag=etag)
+            if not_modified is not None:
+                return not_modified
+        data = serialize_walls(walls, self.fieldset.names, previews=previews)
+        if pending:
+            data = reaction_buffer.merge(data, self.wall_ids)
+        api_response = ApiResponse(status=1, data=data, message=constants.WALLS_GET_SUCCESS,
+                                   http_status=status.HTTP_200_OK, etag=etag, **envelope)
         return api_response.create_response()
 
+    def get_search_page(self, search, page_number, page_size, conditional=True):
+        """
+        Function is used to get a page of walls matching a search, most relevant first.
+        :param search: search text sent by the client.
+        :param page_number: number of the page.
+        :param page_size: number of walls in a page.
+        :param conditional: False to skip the If-None-Match check.
+        :return: Wall list
+        """
+        paginator = Paginator(search_walls(search), page_size)
+        page = paginator.page(page_number)
+        wall_ids = [row['wall'] for row in page.object_list]
+        walls = wall_values(Wall.objects.filter(id__in=wall_ids), self.fieldset.names,
+                            always=validator_fields(self.fieldset))
+        walls = {row['id']: row for row in walls}
+        return self.list_response([walls[wall_id] for wall_id in wall_ids if wall_id in walls], conditional,
+                                  count=paginator.count, total_page=paginator.num_pages,
+                                  next=page.has_next(), previous=page.has_previous())
+
+    def get_cursor_page(self, cursor, sort_by, descending, page_size, conditional=True):
+        """
+        Function is used to get a page of walls with keyset pagination.
+        :param cursor: cursor token sent by the client, empty for the first page.
+        :param sort_by: field used for sorting.
+        :param descending: True to sort from the highest value to the lowest.
+        :param page_size: number of walls in a page.
+        :param conditional: False to skip the If-None-Match check.
+        :return: Wall list with next and previous cursor tokens.
+        """
+        if sort_by not in CURSOR_SORT_FIELDS:
+            api_response = ApiResponse(status=0, message=constants.INVALID_SORT_FIELD,
+                                       http_status=status.HTTP_400_BAD_REQUEST)
+            return api_response.create_response()
+        always = validator_fields(self.fieldset) + (sort_by,)
+        walls = wall_values(Wall.objects.all(), self.fieldset.names, always=always)
+        paginator = CursorPaginator(walls, sort_by, descending=descending, page_size=page_size)
+        try:
+            page = paginator.page(cursor)
+        except InvalidCursor as e:
+            logger.exception(e)
+            api_response = ApiResponse(status=0, message=constants.INVALID_CURSOR,
+                                       http_status=status.HTTP_400_BAD_REQUEST)
+            return api_response.create_response()
+        return self.list_response(page.object_list, conditional, next=page.has_next(), previous=page.has_previous(),
+                                  next_cursor=page.next_cursor, previous_cursor=page.previous_cursor)
+
     @swagger_auto_schema(request_body=WallSerializer, operation_description="API is used to post the Wall detail "
                                                                             "and store data inside database")
     def post(self, request):
@@ -75,11 +272,53 @@ class WallsList(APIView):
         return api_response.create_response()
 
 
+def batch_response(writer, data):
+    """
+    Function is used to write a batch and send the result of every item.
+    :param writer: BatchWriter object.
+    :param data: body of the request.
+    :return: item results, with 400 if nothing was written.
+    """
+    try:
+        written, results = writer.run(data)
+    except InvalidBatch as e:
+        logger.exception(e)
+        api_response = ApiResponse(status=0, message=str(e), http_status=status.HTTP_400_BAD_REQUEST)
+        return api_response.create_response()
+    if not written:
+        api_response = ApiResponse(status=0, data=results, message=constants.BATCH_FAILED,
+                                   http_status=status.HTTP_400_BAD_REQUEST)
+        return api_response.create_response()
+    api_response = ApiResponse(status=1, data=results, message=constants.BATCH_SUCCESS,
+                               http_status=status.HTTP_200_OK)
+    return api_response.create_response()
+
+
+class WallsBatch(APIView):
+    """
+    Class is used for create, update and delete many walls in one request.
+    """
+    permission_classes = [IsAuthenticated, ]
+    throttle_scope = 'write'
+
+    @swagger_auto_schema(operation_description="API is used to create, update and delete many walls "
+                                               "in one transaction. Update items need an id and delete "
+                                               "items are ids.")
+    def post(self, request):
+        """
+        Function is used to write a batch of walls.
+        :param request: request header with the create, update and delete lists.
+        :return: result of every item
+        """
+        return batch_response(WallBatchWriter(request), request.data)
+
+
 class WallDetails(APIView):
     """
     Class is used for retrieve, update or delete a wall instance.
     """
     permission_classes = [IsGetOrIsAuthenticated, ]
+    throttle_scope = 'write'
 
     @swagger_auto_schema(operation_description="Api is used to get particular wall detail"
                                                "from the application",
@@ -92,17 +331,57 @@ class WallDetails(APIView):
         :return: wall info or send proper error status
         """
         try:
-            wall = Wall.objects.get(id=pk)
-        except Wall.DoesNotExist as e:
+            fieldset = Fieldset.from_query(WallSerializer, request.query_params)
+        except InvalidFieldset as e:
             logger.exception(e)
+            api_response = ApiResponse(status=0, message=constants.INVALID_FIELDSET,
+                                       http_status=status.HTTP_400_BAD_REQUEST)
+            return api_response.create_response()
+        walls = Wall.objects.filter(id=pk)
+        fields = validator_fields(fieldset)
+        if 'comments' in fieldset:
+            comments = comment_preview_queryset([pk]).order_by().values('wall_id')
+            comments = comments.annotate(modified_on=Max(COMMENT_VALIDATOR_FIELD)).values('modified_on')
+            walls = walls.annotate(comment_authors_modified_on=Subquery(comments))
+            fields += ('comment_authors_modified_on',)
+        validators = walls.values_list(*fields).first()
+        data = None
+        if validators is not None:
+            pending = reaction_buffer.pending_deltas([pk])
+            etag = make_etag(pk, validators, fieldset.names, pending, media_type=request.accepted_media_type)
+            # Pending reactions are not in last_activity_on yet, so only the ETag can validate the merged wall.
+            last_modified = None if pending else last_modified_of(validators)
+            not_modified = not_modified_response(request, etag=etag, last_modified=last_modified)
+            if not_modified is not None:
+                return not_modified
+            data = wall_detail_cache.get_or_build(pk, lambda: self.build_payload(pk, fieldset),
+                                                  variant=fieldset.digest)
+            if data is not None and pending:
+                data = reaction_buffer.merge([data], [pk])[0]
+        if data is None:
             api_response = ApiResponse(status=0, message=constants.WALL_DOES_NOT_EXIST,
                                        http_status=status.HTTP_404_NOT_FOUND)
             return api_response.create_response()
-        serializer = WallSerializer(wall)
-        api_response = ApiResponse(status=1, data=serializer.data, message=constants.GET_WALL_SUCCESS,
-                                   http_status=status.HTTP_200_OK)
+        api_response = ApiResponse(status=1, data=data, message=constants.GET_WALL_SUCCESS,
+                                   http_status=status.HTTP_200_OK, etag=etag, last_modified=last_modified)
         return api_response.create_response()
 
+    def build_payload(self, pk, fieldset):
+        """
+        Function is used to serialize a wall for the detail cache.
+        :param pk: primary key of a object.
+        :param fieldset: fields of the wall asked for.
+        :return: wall info or None if the wall does not exist
+        """
+        try:
+            wall = fieldset.shape(Wall.objects.all()).get(id=pk)
+        except Wall.DoesNotExist as e:
+            logger.exception(e)
+            return None
+        if 'comments' in fieldset:
+            attach_comment_previews([wall])
+        return fieldset.serializer(wall).data
+
     @swagger_auto_schema(request_body=WallSerializer, operation_description="API is used to update the wall details "
                                                                             "and store data inside database")
     def put(self, request, pk):
@@ -151,11 +430,50 @@ class WallDetails(APIView):
         return api_response.create_response()
 
 
+class WallCommentsList(APIView):
+    """
+    Class is used for list the comments of a wall, newest first, with cursor pagination.
+    """
+    permission_classes = [IsGetOrIsAuthenticated, ]
+
+    @swagger_auto_schema(operation_description="Api is used to get the comments of a particular wall"
+                                               "from the application",
+                         responses={200: CommentSerializer(many=True)})
+    def get(self, request, pk):
+        """
+        Function is used to get a page of comments of a wall.
+        :param request: request header with required info.
+        :param pk: primary key of the wall.
+        :return: Comment list with next and previous cursor tokens.
+        """
+        if not Wall.objects.filter(id=pk).exists():
+            api_response = ApiResponse(status=0, message=constants.WALL_DOES_NOT_EXIST,
+                                       http_status=status.HTTP_404_NOT_FOUND)
+            return api_response.create_response()
+        page_size = get_page_size(self.request.query_params.get('page_size'))
+        comments = comment_values(Comment.objects.filter(wall_id=pk))
+        paginator = CursorPaginator(comments, 'created_on', page_size=page_size)
+        try:
+            page = paginator.page(self.request.query_params.get('cursor'))
+        except InvalidCursor as e:
+            logger.exception(e)
+            api_response = ApiResponse(status=0, message=constants.INVALID_CURSOR,
+                                       http_status=status.HTTP_400_BAD_REQUEST)
+            return api_response.create_response()
+        api_response = ApiResponse(status=1, data=serialize_comments(page.object_list),
+                                   message=constants.COMMENTS_GET_SUCCESS,
+                                   http_status=status.HTTP_200_OK, next=page.has_next(),
+                                   previous=page.has_previous(), next_cursor=page.next_cursor,
+                                   previous_cursor=page.previous_cursor)
+        return api_response.create_response()
+
+
 class CommentsList(APIView):
     """
     Class is used for list all the Comments or create new Comments.
     """
     permission_classes = [IsAuthenticated, ]
+    throttle_scope = 'write'
 
     @swagger_auto_schema(request_body=WallSerializer, operation_description="API is used to post the comment detail "
                                                                             "and store data inside database")
@@ -176,11 +494,31 @@ class CommentsList(APIView):
         return api_response.create_response()
 
 
+class CommentsBatch(APIView):
+    """
+    Class is used for create, update and delete many comments in one request.
+    """
+    permission_classes = [IsAuthenticated, ]
+    throttle_scope = 'write'
+
+    @swagger_auto_schema(operation_description="API is used to create, update and delete many comments "
+                                               "in one transaction. Update items need an id and delete "
+                                               "items are ids.")
+    def post(self, request):
+        """
+        Function is used to write a batch of comments.
+        :param request: request header with the create, update and delete lists.
+        :return: result of every item
+        """
+        return batch_response(CommentBatchWriter(request), request.data)
+
+
 class CommentDetails(APIView):
     """
     Class is used for retrieve, update or delete a comment instance.
     """
     permission_classes = [IsAuthenticated, ]
+    throttle_scope = 'write'
 
     @swagger_auto_schema(operation_description="Api is used to get particular comment detail"
                                                "from the application",
@@ -245,7 +583,11 @@ class CommentDetails(APIView):
             api_response = ApiResponse(status=0, message=constants.COMMENT_DOES_NOT_EXIST,
                                        http_status=status.HTTP_404_NOT_FOUND)
             return api_response.create_response()
-        comment.delete()
+        with transaction.atomic():
+            comment.delete()
+            adjust_counters(comment.wall_id, comment_count=-1)
+        if comment.wall_id:
+            send_wall_changed(Comment, comment.wall_id)
         api_response = ApiResponse(status=1, message=constants.DELETE_COMMENT_SUCCESS, http_status=status.HTTP_200_OK)
         return api_response.create_response()
 
@@ -255,6 +597,9 @@ class LikeDetails(APIView):
     Class is used for create/remove Likes.
     """
     permission_classes = [IsAuthenticated, ]
+    throttle_scope = 'reaction'
+    # The toggle writes, so it reads from the primary and pins the client to it.
+    pin_primary = True
 
     def get(self, request, wall_pk):
         """
@@ -263,13 +608,8 @@ class LikeDetails(APIView):
         :return: comment info or send proper error status
         """
         try:
-            wall = Wall.objects.get(id=wall_pk)
-            if request.user in wall.likes.users.all():
-                wall.likes.users.remove(request.user)
-            else:
-                wall.likes.users.add(request.user)
-                wall.dis_likes.users.remove(request.user)
-            api_response = ApiResponse(status=1, message=constants.GET_LIKE_SUCCESS,
+            reaction = record_reaction(wall_pk, request.user.id, Reaction.LIKE)
+            api_response = ApiResponse(status=1, data={'reaction': reaction}, message=constants.GET_LIKE_SUCCESS,
                                        http_status=status.HTTP_200_OK)
             return api_response.create_response()
         except Wall.DoesNotExist as e:
@@ -284,6 +624,9 @@ class DislikeDetails(APIView):
     Class is used for create/Remove Dislikes.
     """
     permission_classes = [IsAuthenticated, ]
+    throttle_scope = 'reaction'
+    # The toggle writes, so it reads from the primary and pins the client to it.
+    pin_primary = True
 
     def get(self, request, wall_pk):
         """
@@ -292,13 +635,8 @@ class DislikeDetails(APIView):
         :return: comment info or send proper error status
         """
         try:
-            wall = Wall.objects.get(id=wall_pk)
-            if request.user in wall.dis_likes.users.all():
-                wall.dis_likes.users.remove(request.user)
-            else:
-                wall.dis_likes.users.add(request.user)
-                wall.likes.users.remove(request.user)
-            api_response = ApiResponse(status=1, message=constants.GET_DISLIKE_SUCCESS,
+            reaction = record_reaction(wall_pk, request.user.id, Reaction.DISLIKE)
+            api_response = ApiResponse(status=1, data={'reaction': reaction}, message=constants.GET_DISLIKE_SUCCESS,
                                        http_status=status.HTTP_200_OK)
             return api_response.create_response()
         except Wall.DoesNotExist as e:
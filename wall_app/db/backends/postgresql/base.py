@@ -0,0 +1,15 @@
+from django.db.backends.postgresql import base, creation
+
+from wall_app.db.pool import PooledDatabaseCreationMixin, PooledDatabaseWrapperMixin
+
+"""
+    This module contains the PostgreSQL backend taking its connections from the pool of the process.
+"""
+
+
+class DatabaseCreation(PooledDatabaseCreationMixin, creation.DatabaseCreation):
+    pass
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    creation_class = DatabaseCreation
@@ -0,0 +1,17 @@
+from django.db.backends.sqlite3 import base, creation
+
+from wall_app.db.pool import PooledDatabaseCreationMixin, PooledDatabaseWrapperMixin
+
+"""
+    This module contains the SQLite backend taking its connections from the pool of the process, the local
+    stand-in for the pooled PostgreSQL backend. In-memory databases are never closed by Django, so their
+    connections are not given back to the pool.
+"""
+
+
+class DatabaseCreation(PooledDatabaseCreationMixin, creation.DatabaseCreation):
+    pass
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    creation_class = DatabaseCreation
@@ -0,0 +1,72 @@
+import time
+
+from django.conf import settings
+
+from wall_app.db.routers import get_replicas, selector, state
+
+"""
+    This module contains the middleware picking the database a request reads from.
+"""
+
+PIN_COOKIE = 'db_pin'
+PIN_HEADER = 'X-DB-Pin-Until'
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+
+def pinned_until(request, now):
+    """
+    Function is used to read the time until which the client of a request reads from the primary.
+    :param request: request of the client.
+    :param now: current timestamp.
+    :return: timestamp sent in the pin cookie or header, None if the client is not pinned.
+    """
+    value = request.COOKIES.get(PIN_COOKIE) or request.META.get('HTTP_X_DB_PIN_UNTIL')
+    try:
+        until = float(value)
+    except (TypeError, ValueError):
+        return None
+    # A client can not pin itself for longer than a write would.
+    if now < until <= now + settings.DATABASE_PIN_SECONDS:
+        return until
+    return None
+
+
+class DatabasePinMiddleware:
+    """
+    Middleware sending the reads of a request to a replica, unless the request writes or its client wrote in the
+    last DATABASE_PIN_SECONDS. A view whose GET writes, like a reaction toggle, sets pin_primary.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        replicas = get_replicas()
+        state.replica = None
+        if replicas and request.method not in WRITE_METHODS:
+            if pinned_until(request, time.time()) is None:
+                state.replica = selector.choose(replicas, settings.DATABASE_REPLICA_STRATEGY)
+            else:
+                selector.count_pinned()
+        try:
+            response = self.get_response(request)
+        finally:
+            self.release_replica()
+        writes = request.method in WRITE_METHODS or getattr(request, 'pin_primary', False)
+        if replicas and writes and response.status_code < 400:
+            until = int(time.time()) + settings.DATABASE_PIN_SECONDS
+            response.set_cookie(PIN_COOKIE, str(until), max_age=settings.DATABASE_PIN_SECONDS, httponly=True,
+                                samesite='Lax')
+            response[PIN_HEADER] = str(until)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+        if getattr(view_class, 'pin_primary', False):
+            request.pin_primary = True
+            self.release_replica()
+
+    def release_replica(self):
+        if state.replica is not None:
+            selector.done(state.replica)
+            state.replica = None
@@ -0,0 +1,328 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger('django')
+
+"""
+    This module contains the per-process pool of database connections used by the pooled database backends.
+
+    Django opens a connection per thread and closes it at the end of a request when CONN_MAX_AGE is reached,
+    which with PostgreSQL is a TCP and authentication handshake per request. The pooled backends borrow their
+    connection from a ConnectionPool instead and give it back when Django closes it, so the handshake is only
+    paid when the pool grows.
+
+    A pool holds at most MAX_SIZE connections, open or lent. A thread asking for a connection of a full pool
+    waits up to TIMEOUT seconds. Connections are replaced after MAX_LIFETIME seconds or MAX_IDLE_TIME seconds
+    unused, and a connection unused for CHECK_INTERVAL seconds is checked with SELECT 1 before being lent.
+"""
+
+DEFAULT_OPTIONS = {
+    'MAX_SIZE': 10,
+    'TIMEOUT': 30,
+    'MAX_LIFETIME': 3600,
+    'MAX_IDLE_TIME': 300,
+    'CHECK_INTERVAL': 30,
+}
+
+
+class PoolTimeout(Exception):
+    """
+    Raised when no connection of a full pool was given back in time.
+    """
+
+
+def check_connection(connection):
+    """
+    Function is used to check a DB-API connection still answers, leaving no transaction open.
+    :param connection: DB-API connection.
+    :return: True if the connection works.
+    """
+    try:
+        cursor = connection.cursor()
+        try:
+            cursor.execute('SELECT 1')
+            cursor.fetchall()
+        finally:
+            cursor.close()
+        connection.rollback()
+    except Exception as e:
+        logger.warning("Pooled database connection failed its health check: %s", e)
+        return False
+    return True
+
+
+def close_connection(connection):
+    try:
+        connection.close()
+    except Exception as e:
+        logger.warning("Pooled database connection could not be closed: %s", e)
+
+
+class ConnectionPool:
+    """
+    Bounded pool of DB-API connections shared by the threads of a process.
+    """
+
+    def __init__(self, max_size=None, timeout=None, max_lifetime=None, max_idle_time=None, check_interval=None,
+                 health_check=check_connection):
+        """
+        :param max_size: largest number of connections, open or lent.
+        :param timeout: seconds to wait for a connection of a full pool.
+        :param max_lifetime: seconds after which a connection is replaced, None to keep it.
+        :param max_idle_time: seconds an unused connection is kept, None to keep it.
+        :param check_interval: seconds a connection can stay unused before it is checked when lent.
+        :param health_check: function telling if a connection works.
+        """
+        self.max_size = DEFAULT_OPTIONS['MAX_SIZE'] if max_size is None else max_size
+        self.timeout = DEFAULT_OPTIONS['TIMEOUT'] if timeout is None else timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle_time = max_idle_time
+        self.check_interval = DEFAULT_OPTIONS['CHECK_INTERVAL'] if check_interval is None else check_interval
+        self.health_check = health_check
+        self.condition = threading.Condition()
+        self.idle = deque()
+        self.lent = {}
+        # Connections of the parent processes, kept referenced so this process never closes them, and ids of
+        # the ones they had lent, which this process may still give back.
+        self.parent_connections = []
+        self.parent_lent = set()
+        self.reset()
+
+    def reset(self):
+        """
+        Function is used to forget every connection. The connections of a parent process are not closed, even
+        by the garbage collector, since closing them from a child would end the sessions of the parent.
+        """
+        self.parent_connections.extend(connection for connection, opened_at, released_at in self.idle)
+        self.parent_lent.update(self.lent)
+        self.pid = os.getpid()
+        # (connection, opened at, given back at), the last given back is lent first.
+        self.idle = deque()
+        # id of a lent connection -> opened at
+        self.lent = {}
+        self.counters = dict.fromkeys(('created', 'reused', 'closed', 'checks', 'failed_checks', 'waits',
+                                       'timeouts'), 0)
+        self.wait_time = 0.0
+
+    def expired(self, opened_at, released_at, now):
+        return ((self.max_lifetime is not None and now - opened_at >= self.max_lifetime)
+                or (self.max_idle_time is not None and now - released_at >= self.max_idle_time))
+
+    def acquire(self, connect):
+        """
+        Function is used to borrow a connection, opening one if the pool is not full.
+        :param connect: function opening a new connection.
+        :return: DB-API connection.
+        """
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self.condition:
+                if self.pid != os.getpid():
+                    self.reset()
+                waited_since = None
+                while not self.idle and len(self.lent) >= self.max_size:
+                    now = time.monotonic()
+                    if waited_since is None:
+                        waited_since = now
+                        self.counters['waits'] += 1
+                    if now >= deadline:
+                        self.counters['timeouts'] += 1
+                        self.wait_time += now - waited_since
+                        raise PoolTimeout("No database connection was available within %s seconds." % self.timeout)
+                    self.condition.wait(deadline - now)
+                now = time.monotonic()
+                if waited_since is not None:
+                    self.wait_time += now - waited_since
+                if self.idle:
+                    connection, opened_at, released_at = self.idle.pop()
+                    self.lent[id(connection)] = opened_at
+                else:
+                    connection, opened_at, released_at = None, now, now
+                    # Reserve the slot, the connection is opened without holding the lock.
+                    placeholder = object()
+                    self.lent[id(placeholder)] = now
+            if connection is None:
+                break
+            # Connections are checked and closed without holding the lock.
+            if self.expired(opened_at, released_at, now):
+                self.discard(connection)
+                continue
+            if now - released_at >= self.check_interval:
+                healthy = self.health_check(connection)
+                with self.condition:
+                    self.counters['checks'] += 1
+                    self.counters['failed_checks'] += not healthy
+                if not healthy:
+                    self.discard(connection)
+                    continue
+            with self.condition:
+                self.counters['reused'] += 1
+            return connection
+
+        try:
+            connection = connect()
+        except BaseException:
+            with self.condition:
+                del self.lent[id(placeholder)]
+                self.condition.notify()
+            raise
+        with self.condition:
+            del self.lent[id(placeholder)]
+            self.lent[id(connection)] = time.monotonic()
+            self.counters['created'] += 1
+        return connection
+
+    def discard(self, connection):
+        """
+        Function is used to close a lent connection and free its slot.
+        :param connection: DB-API connection returned by acquire().
+        """
+        with self.condition:
+            self.lent.pop(id(connection), None)
+            self.counters['closed'] += 1
+            self.condition.notify()
+        close_connection(connection)
+
+    def release(self, connection, discard=False):
+        """
+        Function is used to give a borrowed connection back, rolling back what it left open.
+        :param connection: DB-API connection returned by acquire().
+        :param discard: True to close the connection instead of keeping it.
+        """
+        with self.condition:
+            if self.pid != os.getpid():
+                self.reset()
+            if id(connection) in self.parent_lent:
+                # Lent before a fork: a rollback or a close would act on the session of the parent.
+                self.parent_lent.discard(id(connection))
+                self.parent_connections.append(connection)
+                return
+            opened_at = self.lent.get(id(connection))
+        if opened_at is None:
+            # Lent by an other pool: it is not ours to keep.
+            close_connection(connection)
+            return
+        now = time.monotonic()
+        if not discard:
+            try:
+                connection.rollback()
+            except Exception as e:
+                logger.warning("Pooled database connection could not be rolled back: %s", e)
+                discard = True
+        if discard or self.expired(opened_at, now, now):
+            self.discard(connection)
+            return
+        with self.condition:
+            if self.lent.pop(id(connection), None) is not None:
+                self.idle.append((connection, opened_at, now))
+                self.condition.notify()
+                return
+        close_connection(connection)
+
+    def close_idle(self):
+        """
+        Function is used to close the connections which are not lent.
+        :return: number of closed connections.
+        """
+        with self.condition:
+            idle, self.idle = self.idle, deque()
+            self.counters['closed'] += len(idle)
+        for connection, opened_at, released_at in idle:
+            close_connection(connection)
+        return len(idle)
+
+    def stats(self):
+        with self.condition:
+            stats = dict(self.counters, max_size=self.max_size, lent=len(self.lent), idle=len(self.idle),
+                         wait_time=round(self.wait_time, 6))
+        stats['size'] = stats['lent'] + stats['idle']
+        return stats
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def pool_key(alias, settings_dict):
+    return (alias,) + tuple(settings_dict.get(name) for name in ('ENGINE', 'NAME', 'HOST', 'PORT', 'USER'))
+
+
+def get_pool(alias, settings_dict):
+    """
+    Function is used to get the pool of a database, created from its POOL settings on first use.
+    :param alias: alias of the database.
+    :param settings_dict: settings of the database.
+    :return: ConnectionPool object.
+    """
+    key = pool_key(alias, settings_dict)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                options = dict(DEFAULT_OPTIONS, **settings_dict.get('POOL', {}))
+                pool = _pools[key] = ConnectionPool(
+                    max_size=options['MAX_SIZE'], timeout=options['TIMEOUT'], max_lifetime=options['MAX_LIFETIME'],
+                    max_idle_time=options['MAX_IDLE_TIME'], check_interval=options['CHECK_INTERVAL'])
+    return pool
+
+
+def close_pools(alias=None):
+    """
+    Function is used to close the idle connections of every pool, or of the pools of one database.
+    :param alias: alias of the database, None for every database.
+    :return: number of closed connections.
+    """
+    with _pools_lock:
+        pools = [pool for key, pool in _pools.items() if alias is None or key[0] == alias]
+    return sum(pool.close_idle() for pool in pools)
+
+
+def pool_stats():
+    """
+    Function is used to get the statistics of the pools of this process, for monitoring.
+    :return: dict of database alias -> list of pool statistics, one per database name.
+    """
+    with _pools_lock:
+        pools = list(_pools.items())
+    stats = {}
+    for key, pool in pools:
+        stats.setdefault(key[0], []).append(dict(pool.stats(), name=key[2]))
+    return stats
+
+
+class PooledDatabaseWrapperMixin:
+    """
+    Mixin for a Django DatabaseWrapper taking its connections from a ConnectionPool.
+    """
+
+    def get_pool(self):
+        return get_pool(self.alias, self.settings_dict)
+
+    def get_new_connection(self, conn_params):
+        connect = super().get_new_connection
+        try:
+            return self.get_pool().acquire(lambda: connect(conn_params))
+        except PoolTimeout as e:
+            # Raised as a database error, which Django turns into django.db.utils.OperationalError.
+            raise self.Database.OperationalError(str(e))
+
+    def _close(self):
+        if self.connection is not None:
+            # A connection which raised an error is only kept if it still works.
+            discard = self.errors_occurred and not self.is_usable()
+            with self.wrap_database_errors:
+                self.get_pool().release(self.connection, discard=discard)
+
+
+class PooledDatabaseCreationMixin:
+    """
+    Mixin for a Django DatabaseCreation closing the pooled connections of a test database before it is dropped.
+    """
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        close_pools(self.connection.alias)
+        return super()._destroy_test_db(test_database_name, verbosity)
@@ -0,0 +1,126 @@
+import contextlib
+import itertools
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+"""
+    This module contains the routing of the reads of a request to the read replicas.
+
+    The DatabasePinMiddleware picks the replica of a request when it starts, so every read of the request sees
+    the same replica, and the ReplicaRouter sends the reads there. Writes, reads made inside a transaction of
+    the primary or under read_from_primary(), and every query made outside of a request (commands, job workers)
+    go to the primary.
+
+    Replicas lag behind the primary, so a client which just wrote is pinned to the primary for
+    DATABASE_PIN_SECONDS: the middleware sends the time the pin ends in a cookie and a header, and a request
+    bringing it back before that time reads from the primary too.
+"""
+
+STRATEGIES = ('round_robin', 'least_load')
+
+# Replica of the request handled by the thread, None to read from the primary.
+state = threading.local()
+
+
+class ReplicaSelector:
+    """
+    Per-process choice of the replica of a request, with the number of requests every replica is serving.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counter = itertools.count()
+        self.active = {}
+        self.requests = {}
+        self.pinned = 0
+
+    def choose(self, replicas, strategy):
+        """
+        Function is used to pick the replica of a request and count it as serving the request.
+        :param replicas: aliases of the replicas.
+        :param strategy: round_robin, or least_load for the replica serving the fewest requests of the process.
+        :return: alias of the replica.
+        """
+        with self.lock:
+            start = next(self.counter) % len(replicas)
+            # Rotating the list first makes the least loaded replicas take turns on ties.
+            candidates = replicas[start:] + replicas[:start]
+            if strategy == 'least_load':
+                replica = min(candidates, key=lambda alias: self.active.get(alias, 0))
+            else:
+                replica = candidates[0]
+            self.active[replica] = self.active.get(replica, 0) + 1
+            self.requests[replica] = self.requests.get(replica, 0) + 1
+        return replica
+
+    def done(self, replica):
+        with self.lock:
+            self.active[replica] -= 1
+
+    def count_pinned(self):
+        with self.lock:
+            self.pinned += 1
+
+    def stats(self):
+        with self.lock:
+            return {'pinned': self.pinned,
+                    'replicas': {alias: {'active': self.active[alias], 'requests': self.requests[alias]}
+                                 for alias in self.requests}}
+
+    def clear(self):
+        with self.lock:
+            # Requests being served still end and decrement their replica.
+            self.counter = itertools.count()
+            self.requests = dict.fromkeys(self.requests, 0)
+            self.pinned = 0
+
+
+selector = ReplicaSelector()
+
+
+def get_replicas():
+    return list(settings.DATABASE_REPLICAS)
+
+
+def current_replica():
+    return getattr(state, 'replica', None)
+
+
+@contextlib.contextmanager
+def read_from_primary():
+    """
+    Context manager sending the reads of the thread to the primary, e.g. while building a shared cache entry,
+    which would keep serving the lagging rows of a replica after the invalidation of the write.
+    """
+    replica = current_replica()
+    state.replica = None
+    try:
+        yield
+    finally:
+        state.replica = replica
+
+
+class ReplicaRouter:
+    """
+    Database router sending the reads of a request to the replica picked for it, and the rest to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        replica = current_replica()
+        if replica is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # A read made to write what it reads must see the latest rows.
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every database is the primary or a copy of it, so rows read from one can be related to rows of another.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary.
+        return db not in get_replicas()
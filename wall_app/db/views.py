@@ -0,0 +1,28 @@
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser
+from rest_framework.views import APIView
+from drf_yasg.utils import swagger_auto_schema
+
+import constants
+from response_utils import ApiResponse
+from wall_app.db.pool import pool_stats
+
+
+class PoolStatsView(APIView):
+    """
+    Class is used for get the statistics of the database connection pools of the process.
+    """
+    permission_classes = [IsAdminUser, ]
+
+    @swagger_auto_schema(operation_description="API is used by admins to monitor the database connection pools of "
+                                               "the process answering the request: connections created, reused, "
+                                               "lent and idle, failed health checks, waits and timeouts.")
+    def get(self, request):
+        """
+        Function is used for get the statistics of the pools.
+        :param request: request header with required info.
+        :return: 200 ok with the statistics of every pooled database.
+        """
+        api_response = ApiResponse(status=1, data=pool_stats(), message=constants.POOL_STATS_SUCCESS,
+                                   http_status=status.HTTP_200_OK)
+        return api_response.create_response()
@@ -8,6 +8,14 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        # A file, unlike the default in-memory database, makes threads in tests wait for locks instead of failing.
+        'TEST': {'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3')},
+    },
+    # Local stand-in for a read replica, only read from when listed in DATABASE_REPLICAS.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db_replica.sqlite3'),
+        'TEST': {'NAME': os.path.join(BASE_DIR, 'test_db_replica.sqlite3')},
+    },
 }
 
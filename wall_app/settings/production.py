@@ -4,6 +4,16 @@ ALLOWED_HOSTS = ['*']
 
 DEBUG = False
 
+# Wall versions, list generations, authentication generations and throttle buckets are read by every process,
+# so they must live in a cache shared by all of them.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': os.environ.get('MEMCACHED_LOCATION', '127.0.0.1:11211').split(','),
+        'KEY_PREFIX': 'wall-app',
+    }
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -11,7 +21,27 @@ DATABASES = {
         'NAME': os.environ['PSQL_DB_NAME'],
         'USER': os.environ['PSQL_DB_USER'],
         'PASSWORD': os.environ['PSQL_DB_PASSWORD'],
+        # Seconds a connection is kept by its thread when the pool is disabled.
+        'CONN_MAX_AGE': int(os.environ.get('PSQL_CONN_MAX_AGE', 60)),
     }
 }
 
+if os.environ.get('PSQL_POOL', '1') == '1':
+    # Connections are given back to the pool at the end of every request, so threads share them.
+    DATABASES['default'].update({
+        'ENGINE': 'wall_app.db.backends.postgresql',
+        'CONN_MAX_AGE': 0,
+        'POOL': {
+            'MAX_SIZE': int(os.environ.get('PSQL_POOL_MAX_SIZE', 10)),
+            'TIMEOUT': float(os.environ.get('PSQL_POOL_TIMEOUT', 30)),
+            'MAX_LIFETIME': int(os.environ.get('PSQL_POOL_MAX_LIFETIME', 3600)),
+            'MAX_IDLE_TIME': int(os.environ.get('PSQL_POOL_MAX_IDLE_TIME', 300)),
+            'CHECK_INTERVAL': int(os.environ.get('PSQL_POOL_CHECK_INTERVAL', 30)),
+        },
+    })
 
+# Read replicas, as comma separated hosts sharing the credentials of the primary.
+for index, host in enumerate(filter(None, os.environ.get('PSQL_REPLICA_HOSTS', '').split(',')), 1):
+    DATABASES['replica_%s' % index] = dict(DATABASES['default'], HOST=host.strip())
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_REPLICA_STRATEGY = os.environ.get('DATABASE_REPLICA_STRATEGY', 'round_robin')
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.0/ref/settings/
 """
 
+import importlib.util
 import os
 from datetime import timedelta
 
@@ -40,18 +41,85 @@ INSTALLED_APPS = [
     'corsheaders',
     'users',
     'wall',
+    'jobs',
+    'mailer',
     'django_rest_passwordreset',
     'drf_yasg',
 ]
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ),
+    'DEFAULT_RENDERER_CLASSES': [
+        'renderer_utils.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_THROTTLE_CLASSES': (
+        'throttle_utils.BucketThrottle',
+    ),
+}
+
+# Sliding window buckets of the views with a throttle_scope: requests per period, requests allowed at once, methods
+# counted (all by default) and whether the bucket is kept per client IP or per user (IP for anonymous users)
+THROTTLE_ENABLED = True
+THROTTLE_CACHE = 'default'
+# Reject the requests the throttle cache can not count, instead of allowing them while the cache is down.
+THROTTLE_FAIL_CLOSED = False
+THROTTLE_BLOCKED_ENTRIES = 10000
+THROTTLE_BUCKETS = {
+    'login': {'rate': '10/min', 'burst': 5, 'key': 'ip'},
+    'signup': {'rate': '10/hour', 'burst': 5, 'key': 'ip', 'methods': ('POST',)},
+    'write': {'rate': '60/min', 'burst': 30, 'key': 'user', 'methods': ('POST', 'PUT', 'PATCH', 'DELETE')},
+    'reaction': {'rate': '120/min', 'burst': 30, 'key': 'user'},
 }
 
+# MessagePack responses are offered only when msgpack is installed.
+if importlib.util.find_spec('msgpack') is not None:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].insert(1, 'renderer_utils.MessagePackRenderer')
+
+# Pagination
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+
+# Number of newest comments embedded in every wall payload
+WALL_COMMENT_PREVIEW_SIZE = 3
+
+# Largest number of items in a batch write request
+BATCH_WRITE_MAX_ITEMS = 100
+
+# Buffer like/dislike toggles in the PendingReaction table, shared by every worker process, and write them to
+# Reaction in bulk every REACTION_FLUSH_INTERVAL seconds.
+REACTION_WRITE_BEHIND = False
+REACTION_FLUSH_INTERVAL = 1.0
+
+# Job queue: attempts of a job, backoff of its retries in seconds, seconds before a job left running by a dead
+# worker is run again and seconds an idle worker waits between two polls
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BACKOFF = 10
+JOB_RETRY_BACKOFF_MAX = 3600
+JOB_LOCK_TIMEOUT = 600
+JOB_POLL_INTERVAL = 1.0
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'wall-app',
+    }
+}
+
+# Seconds a serialized wall stays in the cache and number of walls kept in memory by every process
+WALL_DETAIL_CACHE_TIMEOUT = 300
+WALL_DETAIL_CACHE_LOCAL_ENTRIES = 1000
+WALL_LIST_CACHE_TIMEOUT = 30
+WALL_LIST_CACHE_STALE_TIMEOUT = 300
+WALL_LIST_CACHE_LOCK_TIMEOUT = 10
+# Seconds a request waits for a list page an other request is building before building it too
+WALL_LIST_CACHE_BUILD_WAIT = 2
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'wall_app.db.middleware.DatabasePinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -91,6 +159,13 @@ DATABASES = {
     }
 }
 
+# Aliases of DATABASES serving the reads of requests, how the replica of a request is picked (round_robin or
+# least_load) and seconds a client which wrote reads from the primary
+DATABASE_ROUTERS = ['wall_app.db.routers.ReplicaRouter']
+DATABASE_REPLICAS = []
+DATABASE_REPLICA_STRATEGY = 'round_robin'
+DATABASE_PIN_SECONDS = 10
+
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
 
@@ -172,6 +247,11 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'x-db-pin-until',
+]
+
+CORS_EXPOSE_HEADERS = [
+    'x-db-pin-until',
 ]
 
 CORS_ALLOW_METHODS = [
@@ -186,6 +266,19 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
 }
 
+# Verified access tokens: seconds a process reuses one without checking it again, and number of tokens it keeps.
+# Account changes reach the other processes through the default cache, so with the process-local cache above they
+# only do after AUTH_CACHE_TIMEOUT.
+AUTH_CACHE_TIMEOUT = 60
+AUTH_CACHE_MAX_ENTRIES = 10000
+
+# Token revocation: seconds between two loads of the newly revoked tokens by every process, seconds between two
+# rebuilds dropping the expired ones, and smallest capacity and false positive rate of the Bloom filter
+REVOCATION_REFRESH_INTERVAL = 5
+REVOCATION_REBUILD_INTERVAL = 3600
+REVOCATION_FILTER_CAPACITY = 100000
+REVOCATION_FILTER_ERROR_RATE = 0.001
+
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = os.environ.get('EMAIL_HOST', 'smtp.gmail.com')
 EMAIL_PORT = 587
@@ -193,6 +286,14 @@ EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', 'any@gmail.com')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', 'mail_password')
 EMAIL_USE_TLS = True
 
-# abstractapi
-HOLIDAY_APIKEY = os.environ.get('HOLIDAY_APIKEY', '8edd6ef3d55e477eb1ccfbae37d40791')
-GEOLOCATION_APIKEY = os.environ.get('GEOLOCATION_APIKEY', '22578cb2810d4380817774a6e9437a02')
+# Email outbox: emails sent over one SMTP connection, attempts of an email and seconds before an email left
+# sending by a dead sender is sent again
+MAILER_BATCH_SIZE = 100
+MAILER_MAX_ATTEMPTS = 5
+MAILER_LOCK_TIMEOUT = 600
+
+# Local IP geolocation: file built by the import_geolocation command, number of addresses cached by every
+# process and number of proxies in front of the app which append the client address to X-Forwarded-For
+GEOLOCATION_TABLE = os.environ.get('GEOLOCATION_TABLE', os.path.join(BASE_DIR, 'data', 'ip_ranges.bin'))
+GEOLOCATION_CACHE_SIZE = 10000
+GEOLOCATION_TRUSTED_PROXIES = int(os.environ.get('GEOLOCATION_TRUSTED_PROXIES', 0))
@@ -0,0 +1,199 @@
+import os
+import sqlite3
+import tempfile
+import threading
+from unittest import mock
+
+from django.db import OperationalError
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from users.models import User
+from wall_app.db import pool
+from wall_app.db.pool import ConnectionPool, PoolTimeout
+from wall_app.db.views import PoolStatsView
+
+
+class TestConnectionPool(SimpleTestCase):
+
+    def setUp(self):
+        self.opened = []
+
+    def tearDown(self):
+        for connection in self.opened:
+            connection.close()
+
+    def connect(self):
+        connection = sqlite3.connect(':memory:', check_same_thread=False)
+        self.opened.append(connection)
+        return connection
+
+    def test_reuse(self):
+        connections = ConnectionPool(max_size=2)
+        first = connections.acquire(self.connect)
+        connections.release(first)
+        self.assertIs(connections.acquire(self.connect), first)
+        second = connections.acquire(self.connect)
+        self.assertIsNot(second, first)
+        self.assertEqual(connections.stats(), {
+            'created': 2, 'reused': 1, 'closed': 0, 'checks': 0, 'failed_checks': 0, 'waits': 0, 'timeouts': 0,
+            'wait_time': 0.0, 'max_size': 2, 'lent': 2, 'idle': 0, 'size': 2})
+
+        connections.release(first)
+        connections.release(second)
+        self.assertEqual(connections.close_idle(), 2)
+        self.assertEqual(connections.stats()['size'], 0)
+
+    def test_wait_and_timeout(self):
+        connections = ConnectionPool(max_size=1, timeout=0.05)
+        first = connections.acquire(self.connect)
+        with self.assertRaises(PoolTimeout):
+            connections.acquire(self.connect)
+
+        # A thread waiting for the full pool gets the connection given back.
+        connections.timeout = 5
+        borrowed = []
+        waiting = threading.Thread(target=lambda: borrowed.append(connections.acquire(self.connect)))
+        waiting.start()
+        threading.Timer(0.05, connections.release, (first,)).start()
+        waiting.join()
+        self.assertEqual(borrowed, [first])
+        stats = connections.stats()
+        self.assertEqual((stats['waits'], stats['timeouts'], stats['created']), (2, 1, 1))
+        self.assertGreater(stats['wait_time'], 0)
+
+    def test_failed_connect_frees_its_slot(self):
+        connections = ConnectionPool(max_size=1, timeout=0)
+        with self.assertRaises(sqlite3.OperationalError):
+            connections.acquire(lambda: sqlite3.connect('/nonexistent/directory/db.sqlite3'))
+        self.assertIsNotNone(connections.acquire(self.connect))
+
+    def test_health_check_and_recycling(self):
+        connections = ConnectionPool(max_size=1, check_interval=0)
+        first = connections.acquire(self.connect)
+        connections.release(first)
+        self.assertIs(connections.acquire(self.connect), first)
+        connections.release(first)
+
+        # The server closed the connection while it was idle.
+        first.close()
+        second = connections.acquire(self.connect)
+        self.assertIsNot(second, first)
+        stats = connections.stats()
+        self.assertEqual((stats['checks'], stats['failed_checks'], stats['closed']), (2, 1, 1))
+
+        # A connection left in a broken state is not kept.
+        connections.release(second, discard=True)
+        self.assertEqual(connections.stats()['size'], 0)
+
+        connections = ConnectionPool(max_size=1, max_lifetime=0)
+        first = connections.acquire(self.connect)
+        connections.release(first)
+        self.assertEqual(connections.stats()['idle'], 0)
+        self.assertIsNot(connections.acquire(self.connect), first)
+
+    def test_release_rolls_back(self):
+        connections = ConnectionPool(max_size=1)
+        connection = connections.acquire(self.connect)
+        connection.execute('CREATE TABLE item (id INTEGER)')
+        connection.commit()
+        connection.execute('INSERT INTO item VALUES (1)')
+        connections.release(connection)
+        self.assertEqual(connection.execute('SELECT COUNT(*) FROM item').fetchone(), (0,))
+
+    def test_fork_forgets_the_parent_connections(self):
+        connections = ConnectionPool(max_size=1)
+        first = connections.acquire(self.connect)
+        connections.release(first)
+        with mock.patch('wall_app.db.pool.os.getpid', return_value=os.getpid() + 1):
+            second = connections.acquire(self.connect)
+        self.assertIsNot(second, first)
+        # The connection of the parent was not closed.
+        self.assertEqual(first.execute('SELECT 1').fetchone(), (1,))
+
+    def test_fork_leaves_lent_connections_alone(self):
+        connections = ConnectionPool(max_size=2)
+        first = connections.acquire(self.connect)
+        second = connections.acquire(self.connect)
+        first.execute('CREATE TABLE item (id INTEGER)')
+        first.commit()
+        first.execute('INSERT INTO item VALUES (1)')
+        with mock.patch('wall_app.db.pool.os.getpid', return_value=os.getpid() + 1):
+            # The child gives back the connections it inherited while the parent was using them.
+            connections.release(first)
+            connections.release(second)
+            self.assertEqual(connections.stats()['size'], 0)
+        # Neither rolled back nor closed.
+        self.assertEqual(first.execute('SELECT COUNT(*) FROM item').fetchone(), (1,))
+        self.assertEqual(second.execute('SELECT 1').fetchone(), (1,))
+
+
+class TestPooledBackend(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.connections = ConnectionHandler({
+            'default': {
+                'ENGINE': 'wall_app.db.backends.sqlite3',
+                'NAME': os.path.join(directory.name, 'pooled.sqlite3'),
+                'POOL': {'MAX_SIZE': 1, 'TIMEOUT': 0.05},
+            },
+        })
+        self.addCleanup(pool.close_pools, 'default')
+
+    def test_connections_are_reused(self):
+        connection = self.connections['default']
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        raw = connection.connection
+        connection.close()
+        self.assertIsNone(connection.connection)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        self.assertIs(connection.connection, raw)
+        connection.close()
+
+        stats = [stats for stats in pool.pool_stats()['default'] if stats['name'] == connection.settings_dict['NAME']]
+        self.assertEqual((stats[0]['created'], stats[0]['reused'], stats[0]['idle']), (1, 1, 1))
+
+    def test_full_pool_raises_operational_error(self):
+        connection = self.connections['default']
+        connection.ensure_connection()
+        errors = []
+
+        def connect():
+            # Every thread has its own DatabaseWrapper, sharing the pool of the process.
+            other = ConnectionHandler(self.connections.databases)['default']
+            try:
+                other.ensure_connection()
+            except OperationalError as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=connect)
+        thread.start()
+        thread.join()
+        self.assertEqual(len(errors), 1)
+        connection.close()
+
+
+class TestPoolStatsView(TestCase):
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.user = User.objects.create(username="member", email="member@gmail.com")
+        self.admin = User.objects.create(username="admin", email="admin@gmail.com", is_staff=True)
+
+    def test_admin_only(self):
+        request = self.factory.get(reverse('db_pool_stats'))
+        force_authenticate(request, user=self.user)
+        self.assertEqual(PoolStatsView.as_view()(request).status_code, 403)
+
+        request = self.factory.get(reverse('db_pool_stats'))
+        force_authenticate(request, user=self.admin)
+        with mock.patch('wall_app.db.views.pool_stats', return_value={'default': []}):
+            response = PoolStatsView.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["data"], {'default': []})
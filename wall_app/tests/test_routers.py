@@ -0,0 +1,156 @@
+import datetime
+import time
+
+from django.core.cache import caches
+from django.db import transaction
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.authentication import CachedJWTAuthentication, token_cache
+from users.models import RevokedToken, User
+from users.revocation import revoke_token, revoke_user_tokens, revoked_jtis
+from wall.cache import wall_detail_cache, wall_list_cache
+from wall.models import Comment, Reaction, Wall
+from wall_app.db.middleware import PIN_COOKIE, PIN_HEADER
+from wall_app.db.routers import ReplicaRouter, ReplicaSelector, selector, state
+
+
+class TestReplicaSelector(SimpleTestCase):
+
+    def test_round_robin(self):
+        replicas = ReplicaSelector()
+        self.assertEqual([replicas.choose(['a', 'b'], 'round_robin') for _ in range(4)], ['a', 'b', 'a', 'b'])
+        self.assertEqual(replicas.stats()['replicas'], {'a': {'active': 2, 'requests': 2},
+                                                        'b': {'active': 2, 'requests': 2}})
+
+    def test_least_load(self):
+        replicas = ReplicaSelector()
+        self.assertEqual(replicas.choose(['a', 'b'], 'least_load'), 'a')
+        self.assertEqual(replicas.choose(['a', 'b'], 'least_load'), 'b')
+        replicas.done('a')
+        replicas.done('b')
+        replicas.choose(['a', 'b'], 'least_load')
+        # b is idle while a serves a request, although it is the turn of a.
+        self.assertEqual(replicas.choose(['a', 'b'], 'least_load'), 'b')
+        self.assertEqual(replicas.choose(['a', 'b'], 'least_load'), 'a')
+        self.assertEqual(replicas.stats()['replicas'], {'a': {'active': 2, 'requests': 3},
+                                                        'b': {'active': 1, 'requests': 2}})
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], DATABASE_PIN_SECONDS=10)
+class TestReplicaRouting(TransactionTestCase):
+    # Reads made inside the transaction of a TestCase would all go to the primary.
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create(username="writer", email="writer@gmail.com")
+        # The replica lags behind the primary: the same wall is an older version there.
+        self.wall = Wall.objects.create(title="Primary wall", content="content")
+        Wall.objects.using('replica').create(id=self.wall.id, title="Replica wall", content="content")
+        comment = Comment.objects.create(comment_content="Primary comment", wall=self.wall, created_by=self.user)
+        Comment.objects.using('replica').bulk_create([Comment(id=comment.id, comment_content="Replica comment",
+                                                              wall_id=self.wall.id)])
+        self.detail_url = reverse('wall_details', kwargs={'pk': self.wall.id})
+        self.comments_url = reverse('wall_comments_list', kwargs={'pk': self.wall.id})
+        wall_detail_cache.clear()
+        wall_list_cache.clear()
+        selector.clear()
+
+    def tearDown(self):
+        # The flush of the test skips the replica, which is not migrated while it is one.
+        Wall.objects.using('replica').all().delete()
+        User.objects.using('replica').all().delete()
+        caches['default'].clear()
+        wall_detail_cache.clear()
+        wall_list_cache.clear()
+
+    def get_comment(self, client=None, **extra):
+        # The comments of a wall are not cached, so they show which database the request read.
+        return (client or self.client).get(self.comments_url, **extra).data["data"][0]["comment_content"]
+
+    def test_reads_go_to_the_replica(self):
+        self.assertEqual(self.get_comment(), "Replica comment")
+        self.assertEqual(selector.stats()['replicas']['replica'], {'active': 0, 'requests': 1})
+        # Outside of a request, and inside a transaction of the primary, reads go to the primary.
+        self.assertEqual(Wall.objects.get(id=self.wall.id).title, "Primary wall")
+        router = ReplicaRouter()
+        state.replica = 'replica'
+        try:
+            self.assertEqual(router.db_for_read(Wall), 'replica')
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(Wall), 'default')
+        finally:
+            state.replica = None
+        self.assertEqual(router.db_for_write(Wall), 'default')
+
+        with self.settings(DATABASE_REPLICAS=[]):
+            self.assertEqual(self.get_comment(), "Primary comment")
+
+    def test_cached_payloads_are_built_from_the_primary(self):
+        # The replica has not seen the write which invalidated the caches yet.
+        self.assertEqual(self.get_comment(), "Replica comment")
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.data["data"]["title"], "Primary wall")
+        self.assertEqual(response.data["data"]["comments"][0]["comment_content"], "Primary comment")
+        response = self.client.get(reverse('walls_list'))
+        self.assertEqual(response.data["data"][0]["title"], "Primary wall")
+        self.assertEqual(state.replica, None)
+        self.assertEqual(selector.stats()['replicas']['replica']['active'], 0)
+
+    def test_writes_pin_the_client_to_the_primary(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.put(self.detail_url, data={"content": "changed"}, format='json')
+        self.assertEqual(response.status_code, 201)
+        until = int(response[PIN_HEADER])
+        self.assertAlmostEqual(until, time.time() + 10, delta=2)
+        self.assertEqual(response.cookies[PIN_COOKIE].value, str(until))
+
+        # The client keeps the cookie, an API client can send the header instead.
+        self.assertEqual(self.get_comment(), "Primary comment")
+        self.assertEqual(self.get_comment(APIClient(), HTTP_X_DB_PIN_UNTIL=str(until)), "Primary comment")
+        self.assertEqual(selector.stats()['pinned'], 2)
+        # An expired pin, or one longer than a write would give, is ignored.
+        for value in (time.time() - 1, time.time() + 3600, "never"):
+            self.assertEqual(self.get_comment(APIClient(), HTTP_X_DB_PIN_UNTIL=str(value)), "Replica comment")
+
+        # A write which failed does not pin.
+        response = APIClient().post(reverse('walls_list'), data={}, format='json')
+        self.assertNotIn(PIN_HEADER, response)
+
+    def test_reaction_toggle_uses_the_primary(self):
+        Wall.objects.using('replica').filter(id=self.wall.id).delete()
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse('like_details', kwargs={'wall_pk': self.wall.id}))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(PIN_HEADER, response)
+        self.assertTrue(Reaction.objects.filter(wall=self.wall, user=self.user).exists())
+        self.assertEqual(selector.stats()['replicas']['replica']['active'], 0)
+
+    def test_revocations_are_read_from_the_primary(self):
+        # The replica has not seen the revocations yet.
+        User.objects.using('replica').create(id=self.user.id, username="writer", email="writer@gmail.com")
+        token = AccessToken.for_user(self.user)
+        revoke_token(token, self.user)
+        self.assertFalse(RevokedToken.objects.using('replica').exists())
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION="Bearer %s" % token)
+        revoked_jtis.clear()
+        token_cache.clear()
+        state.replica = 'replica'
+        try:
+            with self.assertRaises(AuthenticationFailed):
+                CachedJWTAuthentication().authenticate(request)
+
+            other = AccessToken.for_user(self.user)
+            other.set_exp(from_time=other.current_time - datetime.timedelta(seconds=5))
+            revoke_user_tokens(self.user.id)
+            request = APIRequestFactory().get('/', HTTP_AUTHORIZATION="Bearer %s" % other)
+            with self.assertRaises(AuthenticationFailed):
+                CachedJWTAuthentication().authenticate(request)
+        finally:
+            state.replica = None
+            revoked_jtis.clear()
+            token_cache.clear()
@@ -0,0 +1,43 @@
+import importlib
+import os
+import sys
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+SETTINGS_MODULES = ('wall_app.settings.local', 'wall_app.settings.production')
+# Environment production.py reads without defaults.
+ENVIRON = {'PSQL_HOST': 'localhost', 'PSQL_DB_NAME': 'wall', 'PSQL_DB_USER': 'wall', 'PSQL_DB_PASSWORD': 'wall'}
+# Backends whose data is only seen by the process which wrote it.
+PROCESS_CACHES = ('django.core.cache.backends.locmem.LocMemCache', 'django.core.cache.backends.dummy.DummyCache')
+
+
+class TestSettings(SimpleTestCase):
+
+    def load(self, name):
+        """
+        Function is used to import a settings module again, leaving the one already imported in place.
+        :param name: dotted name of the settings module.
+        :return: module object.
+        """
+        imported = sys.modules.pop(name, None)
+        try:
+            with mock.patch.dict(os.environ, ENVIRON):
+                return importlib.import_module(name)
+        finally:
+            if imported is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = imported
+
+    def test_caches_are_shared_without_debug(self):
+        checked = 0
+        for name in SETTINGS_MODULES:
+            module = self.load(name)
+            if module.DEBUG:
+                continue
+            checked += 1
+            for alias, cache in module.CACHES.items():
+                with self.subTest(settings=name, cache=alias):
+                    self.assertNotIn(cache['BACKEND'], PROCESS_CACHES)
+        self.assertGreater(checked, 0)
@@ -21,6 +21,8 @@ from rest_framework import permissions
 from drf_yasg import openapi
 from drf_yasg.views import get_schema_view
 
+from wall_app.db import views as db_views
+
 schema_view = get_schema_view(
     openapi.Info(
         title="Wall App API Documentation",
@@ -53,6 +55,7 @@ urlpatterns = [
     path('api/password_reset/',
          reset_pass_view.ResetPasswordRequestToken.as_view(authentication_classes=[], permission_classes=[]),
          name='reset-password-request'),
+    path('api/db/pool/', db_views.PoolStatsView.as_view(), name='db_pool_stats'),
     path('', include('users.urls')),
     path('api/wall/', include('wall.urls')),
 ]